@@ -3,6 +3,7 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
+import inspect
 import sys
 import os
 
@@ -12,16 +13,34 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from ui.components import render_header, render_sidebar
-from ui.charts import ChartFactory
+from ui.charts import ChartFactory, FigureCache
 from ui.templates import RESULT_CARD, EXPLANATION_BOX, TOP3_CARD, RISK_CARD
-from ui.export import ReportGenerator
-from core.mcdm import MultiPackageAnalyzer
+from ui.export import ReportService
+from core.mcdm import MCDM_METHODS, MultiPackageAnalyzer
 from core.models import AnalysisParams
 from utils.fuzzy import build_fuzzy_table, fuzzy_chart_premium, most_uncertain_criterion
 from config.constants import ICC_PACKAGES, PRIORITY_PROFILES
 import numpy as np
 
 
+@st.cache_resource
+def get_analyzer() -> MultiPackageAnalyzer:
+    """One analyzer (and result cache) shared by all sessions."""
+    return MultiPackageAnalyzer()
+
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    """Serialized chart figures shared by all sessions."""
+    return FigureCache()
+
+
+@st.cache_resource
+def get_report_service() -> ReportService:
+    """Background report workers and report cache shared by all sessions."""
+    return ReportService()
+
+
 def display_profile_explanation(priority_profile: str) -> None:
     """Show selected priority profile and its criteria weights."""
     weights = PRIORITY_PROFILES[priority_profile]
@@ -41,11 +60,11 @@ def display_top_recommendations(result, params) -> None:
     """Display top-3 recommendations with gold-pulse animations."""
     st.subheader("🏆 Top 3 Gợi Ý Hàng Đầu")
     
-    top3_df = result.results.head(3)
+    top3 = result.results.head(3).to_dict("records")
     cols = st.columns(3)
     medals = ["🥇", "🥈", "🥉"]
     
-    for idx, (col, (_, row)) in enumerate(zip(cols, top3_df.iterrows())):
+    for idx, (col, row) in enumerate(zip(cols, top3)):
         with col:
             card_class = "top3-card top3-card-1" if idx == 0 else "top3-card"
             title_class = "top3-title gold-pulse" if idx == 0 else "top3-title"
@@ -72,15 +91,22 @@ def display_full_results_table(result) -> None:
     st.subheader("📋 Bảng Xếp Hạng Đầy Đủ (15 Phương Án)")
     
     display_df = result.results[['rank', 'company', 'icc_package', 'category', 'estimated_cost', 'score', 'confidence']].copy()
-    display_df.columns = ['Rank', 'Company', 'ICC Package', 'Category', 'Cost', 'TOPSIS Score', 'Confidence']
+    display_df.columns = ['Rank', 'Company', 'ICC Package', 'Category', 'Cost', 'Score', 'Confidence']
     
     # Format columns
     display_df['Cost'] = display_df['Cost'].apply(lambda x: f"${x:,.0f}")
-    display_df['TOPSIS Score'] = display_df['TOPSIS Score'].apply(lambda x: f"{x:.4f}")
+    display_df['Score'] = display_df['Score'].apply(lambda x: f"{x:.4f}")
     display_df['Confidence'] = display_df['Confidence'].apply(lambda x: f"{x:.2f}")
     
     st.dataframe(display_df, use_container_width=True)
 
+    if getattr(result, 'consensus', None) is not None:
+        with st.expander("🤝 Đồng thuận đa phương pháp (hạng theo từng phương pháp)"):
+            consensus = result.consensus.rename(columns={
+                m: cls.label for m, cls in MCDM_METHODS.items()
+            } | {'company': 'Company', 'icc_package': 'ICC Package'})
+            st.dataframe(consensus.sort_values(MCDM_METHODS['copeland'].label), use_container_width=True, hide_index=True)
+
 
 def display_risk_metrics(result) -> None:
     """Display VaR/CVaR risk metrics with interpretation."""
@@ -110,84 +136,114 @@ def display_risk_metrics(result) -> None:
     st.markdown(html, unsafe_allow_html=True)
 
 
+def show_chart(result, chart: str, build, error: str, *options) -> None:
+    """Plot a chart of `result` through the shared figure cache."""
+    try:
+        fig = get_figure_cache().figure(getattr(result, 'fingerprint', None), chart, build, *options)
+        st.plotly_chart(fig, use_container_width=True)
+    except Exception as e:
+        st.warning(f"{error}: {e}")
+
+
+# expanders report their open state only in recent Streamlit releases
+LAZY_EXPANDERS = "on_change" in inspect.signature(st.expander).parameters
+
+
+def lazy_section(title: str, key: str):
+    """Expander whose content is only built once the user opens it.
+
+    On Streamlit versions without stateful expanders the content is built
+    eagerly inside a plain expander.
+    """
+    if not LAZY_EXPANDERS:
+        return st.expander(title)
+    section = st.expander(title, key=key, on_change="rerun")
+    return section if section.open else None
+
+
 def display_analysis_charts(result, params) -> None:
-    """Display 8 Plotly charts for comprehensive analysis."""
+    """Display the Plotly charts of the analysis.
+
+    The first three are shown directly; the others sit in expanders and are
+    built only when opened. Figures are cached per result fingerprint, so
+    reruns from unrelated widgets do not rebuild them.
+    """
     st.subheader("📊 Phân Tích Chi Tiết & Biểu Đồ")
     
     chart_factory = ChartFactory()
     
     # Chart 1: Weights pie chart
     st.markdown("**Trọng số tiêu chí**")
-    try:
-        weights_fig = chart_factory.create_weights_pie(result.weights)
-        st.plotly_chart(weights_fig, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Không thể hiển thị biểu đồ trọng số: {e}")
+    show_chart(result, "weights_pie", lambda: chart_factory.create_weights_pie(result.weights),
+               "Không thể hiển thị biểu đồ trọng số")
     
     # Chart 2: Cost-Benefit scatter
-    st.markdown("**Bản đồ Chi phí - Điểm TOPSIS**")
-    try:
-        cost_benefit_fig = chart_factory.create_cost_benefit_scatter(result.results)
-        st.plotly_chart(cost_benefit_fig, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Không thể hiển thị biểu đồ chi phí: {e}")
+    st.markdown(f"**Bản đồ Chi phí - Điểm {MCDM_METHODS[params.mcdm_method].label}**")
+    show_chart(result, "cost_benefit",
+               lambda: chart_factory.create_cost_benefit_scatter(result.results, params.mcdm_method),
+               "Không thể hiển thị biểu đồ chi phí")
     
     # Chart 3: Top recommendations bar
     st.markdown("**Top 5 Phương Án Được Chọn**")
-    try:
-        bar_fig = chart_factory.create_top_recommendations_bar(result.results)
-        st.plotly_chart(bar_fig, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Không thể hiển thị biểu đồ top 5: {e}")
+    show_chart(result, "top5_bar",
+               lambda: chart_factory.create_top_recommendations_bar(result.results, params.mcdm_method),
+               "Không thể hiển thị biểu đồ top 5")
     
     # Chart 4: Forecast (if available)
-    st.markdown("**Dự Báo Rủi Ro (ARIMA Trend)**")
-    if hasattr(result, 'forecast') and result.forecast is not None:
-        try:
-            forecast_fig = chart_factory.create_forecast_chart(
-                result.historical, 
-                result.forecast,
-                route=params.route,
-                selected_month=params.month
-            )
-            st.plotly_chart(forecast_fig, use_container_width=True)
-        except Exception as e:
-            st.warning(f"Không thể hiển thị dự báo: {e}")
-    else:
-        st.info("Dự báo ARIMA không khả dụng (cần statsmodels)")
+    section = lazy_section("📈 Dự Báo Rủi Ro (ARIMA Trend)", "chart_forecast")
+    if section is not None:
+        with section:
+            if getattr(result, 'forecast', None) is not None:
+                show_chart(result, "forecast", lambda: chart_factory.create_forecast_chart(
+                    result.historical,
+                    result.forecast,
+                    route=params.route,
+                    selected_month=params.month,
+                    lower=result.forecast_lower,
+                    upper=result.forecast_upper
+                ), "Không thể hiển thị dự báo")
+            else:
+                st.info("Dự báo ARIMA không khả dụng (cần statsmodels)")
     
     # Chart 5: Category comparison
-    st.markdown("**So Sánh Theo Loại Công Ty**")
-    try:
-        category_fig = chart_factory.create_category_comparison(result.results)
-        st.plotly_chart(category_fig, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Không thể hiển thị so sánh loại: {e}")
+    section = lazy_section("🏷️ So Sánh Theo Loại Công Ty", "chart_category")
+    if section is not None:
+        with section:
+            show_chart(result, "category",
+                       lambda: chart_factory.create_category_comparison(result.results, params.mcdm_method),
+                       "Không thể hiển thị so sánh loại")
     
     # Chart 6: Fuzzy heatmap (if enabled)
     if params.use_fuzzy:
-        st.markdown("**Mức Độ Không Chắc Chắn (Fuzzy AHP)**")
-        try:
-            fuzzy_fig = chart_factory.create_fuzzy_heatmap(result.results)
-            st.plotly_chart(fuzzy_fig, use_container_width=True)
-        except Exception as e:
-            st.warning(f"Không thể hiển thị Fuzzy heatmap: {e}")
+        section = lazy_section("🌀 Mức Độ Không Chắc Chắn (Fuzzy AHP)", "chart_fuzzy_heatmap")
+        if section is not None:
+            with section:
+                show_chart(result, "fuzzy_heatmap",
+                           lambda: chart_factory.create_fuzzy_heatmap(result.results, params.mcdm_method),
+                           "Không thể hiển thị Fuzzy heatmap")
     
     # Chart 7: Sensitivity spider
-    st.markdown("**Phân Tích Độ Nhạy (Spider)**")
-    try:
-        spider_fig = chart_factory.create_sensitivity_spider(result.results)
-        st.plotly_chart(spider_fig, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Không thể hiển thị biểu đồ độ nhạy: {e}")
+    section = lazy_section("🕸️ Phân Tích Độ Nhạy (Spider)", "chart_sensitivity")
+    if section is not None:
+        with section:
+            show_chart(result, "sensitivity", lambda: chart_factory.create_sensitivity_spider(result.sensitivity),
+                       "Không thể hiển thị biểu đồ độ nhạy")
     
     # Chart 8: Confidence radar
-    st.markdown("**Radar Độ Tin Cậy Mô Hình**")
-    try:
-        radar_fig = chart_factory.create_confidence_radar(result.results)
-        st.plotly_chart(radar_fig, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Không thể hiển thị radar: {e}")
+    section = lazy_section("🎯 Radar Độ Tin Cậy Mô Hình", "chart_confidence")
+    if section is not None:
+        with section:
+            show_chart(result, "confidence", lambda: chart_factory.create_confidence_radar(result.results),
+                       "Không thể hiển thị radar")
+
+    # Chart 9: Monte Carlo distribution (if MC enabled)
+    if getattr(result, 'distribution', None) is not None:
+        section = lazy_section("🎲 Phân Phối Rủi Ro Monte Carlo", "chart_distribution")
+        if section is not None:
+            with section:
+                show_chart(result, "distribution",
+                           lambda: chart_factory.create_risk_distribution_chart(result.distribution),
+                           "Không thể hiển thị phân phối Monte Carlo")
 
 
 def display_fuzzy_analysis(result, params) -> None:
@@ -213,46 +269,65 @@ def display_fuzzy_analysis(result, params) -> None:
         
         # Fuzzy visualization
         st.markdown("**Biểu Đồ Hàm Kỳ Vọng (Fuzzy Membership)**")
-        fuzzy_chart = fuzzy_chart_premium(fuzzy_table)
-        st.plotly_chart(fuzzy_chart, use_container_width=True)
+        show_chart(result, "fuzzy_membership", lambda: fuzzy_chart_premium(fuzzy_table),
+                   "Không thể hiển thị hàm kỳ vọng mờ")
+
+        if result.robustness is not None:
+            st.markdown("**Độ Ổn Định Xếp Hạng Theo Trọng Số Mờ**")
+            robust = result.robustness.to_frame().sort_values("expected_rank").head(5)
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                st.dataframe(
+                    robust.rename(columns={"option": "Phương án", "p_top1": "P(Top 1)", "expected_rank": "Hạng kỳ vọng"})
+                    .style.format({"P(Top 1)": "{:.1%}", "Hạng kỳ vọng": "{:.2f}"}),
+                    use_container_width=True, hide_index=True
+                )
+            with col2:
+                show_chart(result, "rank_probability",
+                           lambda: ChartFactory.create_rank_probability_heatmap(result.robustness),
+                           "Không thể hiển thị xác suất xếp hạng")
     except Exception as e:
         st.warning(f"Lỗi khi hiển thị Fuzzy analysis: {e}")
 
 
 def display_export_section(result, params) -> None:
-    """Display export options (PDF, Excel)."""
+    """Display export options (PDF, Excel).
+
+    Both reports start rendering in the background as soon as the results are
+    shown and are cached per result, so the download is usually ready at once.
+    """
     st.divider()
     st.subheader("📥 Xuất Báo Cáo")
     
+    service = get_report_service()
+    jobs = {fmt: service.submit(result, params, fmt) for fmt in ("pdf", "excel")}
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📄 Xuất PDF"):
+        if jobs["pdf"].done() or st.button("📄 Xuất PDF"):
             try:
-                report_gen = ReportGenerator()
-                pdf_bytes = report_gen.generate_pdf(result, params)
+                with st.spinner("⏳ Đang tạo PDF..."):
+                    pdf_bytes = jobs["pdf"].result()
                 st.download_button(
                     label="⬇️ Tải Báo Cáo PDF",
                     data=pdf_bytes,
                     file_name="RISKCAST_Report.pdf",
                     mime="application/pdf"
                 )
-                st.success("✅ PDF đã được tạo thành công!")
             except Exception as e:
                 st.error(f"❌ Lỗi tạo PDF: {e}")
     
     with col2:
-        if st.button("📊 Xuất Excel"):
+        if jobs["excel"].done() or st.button("📊 Xuất Excel"):
             try:
-                report_gen = ReportGenerator()
-                excel_bytes = report_gen.generate_excel(result, params)
+                with st.spinner("⏳ Đang tạo Excel..."):
+                    excel_bytes = jobs["excel"].result()
                 st.download_button(
                     label="⬇️ Tải Báo Cáo Excel",
                     data=excel_bytes,
                     file_name="RISKCAST_Report.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
-                st.success("✅ Excel đã được tạo thành công!")
             except Exception as e:
                 st.error(f"❌ Lỗi tạo Excel: {e}")
     
@@ -272,8 +347,7 @@ def show_analysis():
     # Analyze button
     if st.button("▶️ PHÂN TÍCH 15 PHƯƠNG ÁN", key="analyze_btn", use_container_width=True):
         with st.spinner("⏳ Đang phân tích..."):
-            analyzer = MultiPackageAnalyzer()
-            result = analyzer.run_analysis(params)
+            result = get_analyzer().run_analysis(params)
         
         # Store in session state
         st.session_state.last_result = result
@@ -55,6 +55,33 @@ COST_BENEFIT_MAP = {
     "C6: Rủi ro khí hậu": CriterionType.COST
 }
 
+# Premium loading applied to C1 and the estimated cost of large consignments
+LARGE_CARGO_THRESHOLD = 50_000
+LARGE_CARGO_LOADING = 1.1
+
+# Monte Carlo: runs above the threshold use the chunked streaming engine
+MC_CHUNK_SIZE = 100_000
+MC_STREAMING_THRESHOLD = 200_000
+MC_SKETCH_BINS = 4096
+# cached calls that return full draw matrices keep only the most recent few
+MC_DRAW_CACHE_SIZE = 4
+
+# Weight vectors sampled from the fuzzy triangles to measure ranking robustness
+FUZZY_WEIGHT_SAMPLES = 10_000
+
+# Scatter charts with more points than this are drawn with WebGL, without text labels
+CHART_WEBGL_THRESHOLD = 500
+
+# Chart payload bounds: longer series are downsampled, larger scatters are drawn
+# as a 2-D density, and Monte Carlo distributions are sent as histograms
+CHART_MAX_POINTS = 1_000
+CHART_MAX_SCATTER_POINTS = 20_000
+MC_CHART_BINS = 64
+
+# Assumed correlation of climate shocks between carriers on the same route
+# (one-factor model); there is no carrier-level loss history to estimate it.
+CARRIER_RISK_CORRELATION = 0.5
+
 SENSITIVITY_MAP = {
     "Chubb": 0.95,
     "PVI": 1.05,
@@ -1,8 +1,6 @@
+import importlib.util
 import warnings
 warnings.filterwarnings("ignore")
 
-try:
-    from statsmodels.tsa.arima.model import ARIMA
-    ARIMA_AVAILABLE = True
-except ImportError:
-    ARIMA_AVAILABLE = False
\ No newline at end of file
+# Only check that statsmodels is installed; core.forecaster imports ARIMA on first use.
+ARIMA_AVAILABLE = importlib.util.find_spec("statsmodels") is not None
@@ -0,0 +1,269 @@
+# core/cache.py
+"""Caching layer shared by the analysis engine.
+
+Inside `streamlit run` the decorated functions use `st.cache_data`; in
+headless processes (batch jobs, tests, pool workers) they use an
+in-process LRU and Streamlit is never imported.
+"""
+import copy
+import dataclasses
+import functools
+import hashlib
+import numbers
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with optional time-to-live (seconds)."""
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _freeze(value: Any) -> Hashable:
+    """Turn arguments (dicts, lists, arrays, frames) into a hashable key."""
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((repr(k), _freeze(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_freeze(v) for v in value))
+    if isinstance(value, np.ndarray):
+        digest = hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return ("ndarray", str(value.dtype), value.shape, digest)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        hashed = pd.util.hash_pandas_object(value, index=True).values
+        labels = tuple(value.columns) if isinstance(value, pd.DataFrame) else (value.name,)
+        return (type(value).__name__, labels, hashlib.sha1(hashed.tobytes()).hexdigest())
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("pickle", hashlib.sha1(pickle.dumps(value)).hexdigest())
+
+
+def make_key(*args: Any, **kwargs: Any) -> Hashable:
+    return _freeze((args, kwargs))
+
+
+def _canonical(value: Any) -> Any:
+    """Normalize values whose repr would differ for equal content (39000 vs 39000.0,
+    numpy scalars, dataclasses, dict ordering) before fingerprinting."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return (type(value).__name__, _canonical(dataclasses.asdict(value)))
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return value
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable content hash of `parts`, identical across processes and restarts."""
+    return hashlib.sha256(repr(_freeze(_canonical(parts))).encode()).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed cache for analysis results and intermediate stages.
+
+    Entries live in an in-memory LRU; when `disk_dir` is set they are also
+    pickled there so other processes and restarts can reuse them. The disk
+    tier keeps about `disk_maxsize` entries: reads refresh an entry's mtime
+    and periodic pruning removes the least recently used files. Keys are
+    `fingerprint(...)` strings.
+    """
+
+    _shared: Optional["ResultCache"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self, maxsize: int = 256, ttl: Optional[float] = None, disk_dir: Optional[str] = None,
+        disk_maxsize: int = 4096
+    ):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk_dir = disk_dir
+        self.disk_maxsize = disk_maxsize
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def shared(cls) -> "ResultCache":
+        """Process-wide instance shared by every session of the app.
+
+        The disk tier is enabled by setting RISKCAST_RESULT_CACHE_DIR.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(disk_dir=os.environ.get("RISKCAST_RESULT_CACHE_DIR") or None)
+            return cls._shared
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is _MISSING and self.disk_dir:
+            try:
+                path = self._path(key)
+                with open(path, "rb") as fh:
+                    value = pickle.load(fh)
+                os.utime(path)
+                self.memory.set(key, value)
+            except Exception:
+                value = _MISSING
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as fh:
+                    pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except OSError:
+                return
+            self._disk_writes += 1
+            if self._disk_writes % (self.disk_maxsize // 8 + 1) == 0:
+                self.prune_disk()
+
+    def prune_disk(self) -> int:
+        """Delete the least recently used disk entries beyond `disk_maxsize`; returns how many."""
+        if not self.disk_dir:
+            return 0
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.stat(path).st_mtime_ns, path))
+                    except OSError:
+                        pass  # removed by another process
+        entries.sort()
+        stale = entries[:max(0, len(entries) - self.disk_maxsize)]
+        for _, path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(stale)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], copy_result: bool = False) -> Any:
+        """Return the cached value for `key`, computing and storing it on a miss.
+
+        With `copy_result` callers get a deep copy they may mutate.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return copy.deepcopy(value) if copy_result else value
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.hits = self.misses = 0
+
+
+def streamlit_runtime():
+    """Return the `streamlit` module when running inside the app, else None.
+
+    Only looks at modules already imported so headless callers never pay
+    Streamlit's import cost.
+    """
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return None
+    try:
+        from streamlit import runtime
+        return st if runtime.exists() else None
+    except Exception:
+        return None
+
+
+def cache_data(ttl: Optional[float] = None, maxsize: int = 128) -> Callable:
+    """Drop-in replacement for `st.cache_data` that also works headless.
+
+    Cached values are returned as copies, as with `st.cache_data`, so
+    callers may mutate them freely.
+    """
+    def decorator(func: Callable) -> Callable:
+        lru = LRUCache(maxsize=maxsize, ttl=ttl)
+        st_cached = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal st_cached
+            st = streamlit_runtime()
+            if st is not None:
+                if st_cached is None:
+                    st_cached = st.cache_data(ttl=ttl, max_entries=maxsize)(func)
+                return st_cached(*args, **kwargs)
+
+            key = make_key(*args, **kwargs)
+            value = lru.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                lru.set(key, value)
+            return copy.deepcopy(value)
+
+        def clear() -> None:
+            lru.clear()
+            if st_cached is not None:
+                st_cached.clear()
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+# core/catalogue.py
+import numpy as np
+import pandas as pd
+from typing import Dict, Mapping, Optional, Union
+from .mcdm import MCDM_METHODS, get_method
+from config.constants import COST_BENEFIT_MAP, CRITERIA, LARGE_CARGO_LOADING
+
+Columns = Union[pd.DataFrame, Mapping[str, np.ndarray]]
+# Methods whose cost is linear in the number of options
+CATALOGUE_METHODS = tuple(m for m, cls in MCDM_METHODS.items() if not getattr(cls, "pairwise", False))
+
+
+class CatalogueRanking:
+    """Ranking of a large option catalogue that only materializes what is viewed.
+
+    Scores live in a NumPy array; the best `k` are found with `argpartition`
+    (O(n)) and only those rows become a DataFrame. Any other slice of the
+    ranking is built on request, and the full order is sorted once, the first
+    time a row beyond the top `k` is needed.
+    """
+
+    def __init__(self, columns: Columns, scores: np.ndarray, k: int = 50):
+        self.columns = columns
+        self.scores = np.asarray(scores, dtype=float)
+        self.k = int(min(max(k, 0), len(self.scores)))
+        self.top_index = self._top_indices(self.scores, self.k)
+        self._order: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k best scores, best first (ties keep catalogue order)."""
+        if k == 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(scores):
+            # every option tied with the k-th best competes, so ties break as in `order`
+            cut = -np.partition(-scores, k - 1)[k - 1]
+            candidates = np.flatnonzero(scores >= cut)
+        else:
+            candidates = np.arange(len(scores))
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order][:k]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @property
+    def order(self) -> np.ndarray:
+        """Full ranking (catalogue indices, best first); sorted on first use."""
+        if self._order is None:
+            self._order = np.lexsort((np.arange(len(self.scores)), -self.scores))
+        return self._order
+
+    def _materialize(self, idx: np.ndarray, first_rank: int) -> pd.DataFrame:
+        if isinstance(self.columns, pd.DataFrame):
+            frame = self.columns.iloc[idx].reset_index(drop=True)
+        else:
+            frame = pd.DataFrame({name: np.asarray(values)[idx] for name, values in self.columns.items()})
+        frame["score"] = self.scores[idx]
+        frame["rank"] = np.arange(first_rank, first_rank + len(idx))
+        frame["catalogue_index"] = idx
+        return frame
+
+    def top(self, k: Optional[int] = None) -> pd.DataFrame:
+        """The best `k` (default: the precomputed k) options as a DataFrame."""
+        k = self.k if k is None else k
+        if k <= self.k:
+            return self._materialize(self.top_index[:k], 1)
+        return self.rows(0, k)
+
+    def rows(self, start: int, stop: int) -> pd.DataFrame:
+        """Options ranked start+1 … stop (0-based, end exclusive)."""
+        start, stop = max(start, 0), min(stop, len(self.scores))
+        idx = self.top_index[start:stop] if stop <= self.k else self.order[start:stop]
+        return self._materialize(idx, start + 1)
+
+    @classmethod
+    def rank(
+        cls,
+        columns: Columns,
+        weights: pd.Series,
+        k: int = 50,
+        method: str = "topsis",
+        large_cargo: bool = False,
+        cost_benefit: Optional[Dict[str, str]] = None
+    ) -> "CatalogueRanking":
+        """Score every option of `columns` (DataFrame or name → array mapping
+        with the CRITERIA columns) and keep the best `k` ready to display.
+
+        Large-cargo loading is applied to the C1 criterion on the score matrix
+        only; `estimated_cost` in the columns is left for the caller to scale.
+        Only methods that score each option independently are accepted: the
+        pairwise ones (PROMETHEE II, Borda, Copeland) are O(n²) in the
+        catalogue size and raise a ValueError.
+        """
+        scorer = get_method(method)
+        if getattr(scorer, "pairwise", False):
+            raise ValueError(
+                f"{scorer.label} compares every pair of options and cannot rank a large catalogue; "
+                f"use one of {', '.join(CATALOGUE_METHODS)}"
+            )
+        cost_benefit = cost_benefit or {c: t.value for c, t in COST_BENEFIT_MAP.items()}
+        criteria = list(weights.index)
+        M = np.column_stack([np.asarray(columns[c], dtype=float) for c in criteria])
+        if large_cargo and CRITERIA[0] in criteria:
+            M[:, criteria.index(CRITERIA[0])] *= LARGE_CARGO_LOADING
+        is_cost = np.array([cost_benefit[c] == "cost" for c in criteria])
+        scores = scorer.score(M, weights.values.astype(float), is_cost)[0]
+        return cls(columns, scores, k)
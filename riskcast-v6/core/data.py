@@ -1,16 +1,67 @@
-import streamlit as st
-import pandas as pd
+import hashlib
 import os
+import pandas as pd
+from .cache import LRUCache
+from .risk_index import BaseRiskIndex
+from .store import ColumnarStore
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+STORE_DIR = os.environ.get("RISKCAST_STORE_DIR", os.path.join(DATA_DIR, ".store"))
 
 class DataService:
+    """CSV inputs served from a memory-mapped columnar store.
+
+    Loads are cached per data version, so editing a CSV is picked up on the
+    next call without restarting the app. Callers get shallow copies of the
+    cached frames: the numeric columns stay memory-mapped and read-only.
+    """
+    store = ColumnarStore(STORE_DIR)
+    _tables = LRUCache(maxsize=16, ttl=3600)
+    _indexes = LRUCache(maxsize=16)
+    TABLES = {
+        "historical_climate": "historical_climate.csv",
+        "company_data": "company_data.csv",
+    }
+
+    @staticmethod
+    def source(name: str) -> str:
+        return os.path.join(DATA_DIR, DataService.TABLES[name])
+
+    @staticmethod
+    def table_version(name: str) -> str:
+        return DataService.store.version(name, DataService.source(name))
+
+    @staticmethod
+    def data_version() -> str:
+        """Combined content hash of all input tables."""
+        versions = "|".join(DataService.table_version(name) for name in sorted(DataService.TABLES))
+        return hashlib.sha256(versions.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _load_table(name: str, version: str) -> pd.DataFrame:
+        frame = DataService._tables.get((name, version))
+        if frame is None:
+            frame = DataService.store.load(name, DataService.source(name))
+            DataService._tables.set((name, version), frame)
+        return frame.copy(deep=False)
+
     @staticmethod
-    @st.cache_data(ttl=3600)
     def load_historical_data() -> pd.DataFrame:
-        data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "historical_climate.csv")
-        return pd.read_csv(data_path)
+        return DataService._load_table("historical_climate", DataService.table_version("historical_climate"))
 
     @staticmethod
-    @st.cache_data
     def get_company_data() -> pd.DataFrame:
-        data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "company_data.csv")
-        return pd.read_csv(data_path).set_index("Company")
\ No newline at end of file
+        return DataService._load_table("company_data", DataService.table_version("company_data")).set_index("Company")
+
+    @staticmethod
+    def risk_index(granularity: str = "month") -> BaseRiskIndex:
+        """Base-risk index of the historical data, built once per data version.
+
+        Shared rather than copied: the index is read-only.
+        """
+        key = (DataService.table_version("historical_climate"), granularity)
+        index = DataService._indexes.get(key)
+        if index is None:
+            index = BaseRiskIndex.from_frame(DataService.load_historical_data(), granularity)
+            DataService._indexes.set(key, index)
+        return index
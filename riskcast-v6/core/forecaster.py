@@ -1,17 +1,47 @@
 # core/forecaster.py
+import hashlib
+import importlib.util
+import os
+import threading
+import warnings
 import numpy as np
 import pandas as pd
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from .cache import LRUCache
+from .sampling import norm_ppf
+from core.models import HorizonForecast
 
-# Try to import statsmodels ARIMA optionally. If not present, fall back to a simple forecaster.
-try:
-    from statsmodels.tsa.arima.model import ARIMA  # type: ignore
-    ARIMA_AVAILABLE = True
-except Exception:
-    ARIMA_AVAILABLE = False
+# statsmodels is optional and slow to import: only check that it is installed
+# here and import ARIMA on first use. Without it, fall back to a simple forecaster.
+ARIMA_AVAILABLE = importlib.util.find_spec("statsmodels") is not None
 
 
 class Forecaster:
+    @staticmethod
+    def _training_window(historical: pd.DataFrame, route: str, current_month: int) -> Tuple[str, np.ndarray]:
+        if route not in historical.columns:
+            # pick the first data column after index/identifier column
+            route = historical.columns[1] if len(historical.columns) > 1 else historical.columns[0]
+
+        full_series = historical[route].values
+        n_total = len(full_series)
+        current_month = max(1, min(current_month, n_total))
+        return route, full_series[:current_month]
+
+    @staticmethod
+    def trend_forecast(train_series: np.ndarray) -> np.ndarray:
+        """Simple trend-based one-step forecast."""
+        if len(train_series) >= 3:
+            trend = (train_series[-1] - train_series[-3]) / 2.0
+        elif len(train_series) >= 2:
+            trend = train_series[-1] - train_series[-2]
+        else:
+            trend = 0.0
+
+        next_val = np.clip(train_series[-1] + trend, 0.0, 1.0)
+        return np.array([next_val])
+
     @staticmethod
     def forecast(
         historical: pd.DataFrame,
@@ -25,19 +55,13 @@ class Forecaster:
         there is enough data; otherwise falls back to a simple trend-based
         one-step forecast.
         """
-        if route not in historical.columns:
-            # pick the first data column after index/identifier column
-            route = historical.columns[1] if len(historical.columns) > 1 else historical.columns[0]
-
-        full_series = historical[route].values
-        n_total = len(full_series)
-        current_month = max(1, min(current_month, n_total))
-        hist_series = full_series[:current_month]
+        _, hist_series = Forecaster._training_window(historical, route, current_month)
         train_series = hist_series.copy()
 
         # Try ARIMA when requested and available
         if use_arima and ARIMA_AVAILABLE and len(train_series) >= 6:
             try:
+                from statsmodels.tsa.arima.model import ARIMA  # type: ignore
                 model = ARIMA(train_series, order=(1, 1, 1))
                 fitted = model.fit()
                 fc = fitted.forecast(1)
@@ -47,13 +71,280 @@ class Forecaster:
                 # on any failure, fall through to simple forecast
                 pass
 
-        # Simple trend-based fallback forecast
-        if len(train_series) >= 3:
-            trend = (train_series[-1] - train_series[-3]) / 2.0
-        elif len(train_series) >= 2:
-            trend = train_series[-1] - train_series[-2]
+        return hist_series, Forecaster.trend_forecast(train_series)
+
+    FORECAST_METHODS = ("holt", "linear", "seasonal_naive", "arima")
+
+    @staticmethod
+    def forecast_horizon(
+        historical: pd.DataFrame,
+        current_month: int,
+        horizon: int = 3,
+        method: str = "holt",
+        level: float = 0.95,
+        routes: Optional[List[str]] = None
+    ) -> HorizonForecast:
+        """h-step forecasts with prediction intervals for all routes at once.
+
+        The closed-form methods run on the whole (months × routes) training
+        block in NumPy; "arima" goes through the shared ForecastService
+        (one cached model per route). Values are clipped to [0, 1].
+        """
+        if method not in Forecaster.FORECAST_METHODS:
+            raise ValueError(f"Unknown forecast method: {method}")
+        routes = routes or [c for c in historical.columns if c != "month"]
+        current_month = max(1, min(current_month, len(historical)))
+        Y = historical[routes].values[:current_month].astype(float)
+        z = float(norm_ppf(0.5 + level / 2))
+
+        if method == "arima":
+            point, lower, upper = ForecastService.shared().forecast_horizon(Y, routes, horizon, level)
         else:
-            trend = 0.0
+            fn = {"holt": Forecaster._holt, "linear": Forecaster._linear,
+                  "seasonal_naive": Forecaster._seasonal_naive}[method]
+            point, var = fn(Y, horizon) if len(Y) >= 3 else Forecaster._naive(Y, horizon)
+            half = z * np.sqrt(np.maximum(var, 0.0))
+            point, lower, upper = point, point - half, point + half
 
-        next_val = np.clip(train_series[-1] + trend, 0.0, 1.0)
-        return hist_series, np.array([next_val])
\ No newline at end of file
+        clip = lambda a: np.clip(a, 0.0, 1.0)
+        return HorizonForecast(routes, clip(point), clip(lower), clip(upper), level, method)
+
+    @staticmethod
+    def _naive(Y: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Random walk: last value, variance growing linearly with h."""
+        h = np.arange(1, horizon + 1)
+        sigma2 = np.diff(Y, axis=0).var(axis=0) if len(Y) >= 2 else np.zeros(Y.shape[1])
+        return np.repeat(Y[-1][:, None], horizon, axis=1), sigma2[:, None] * h
+
+    @staticmethod
+    def _holt(Y: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Holt's linear trend, smoothing parameters picked per route from a grid
+        by one-step SSE; all (grid × route) recursions run together."""
+        T, R = Y.shape
+        alpha, beta = np.meshgrid(np.linspace(0.1, 0.9, 9), np.linspace(0.05, 0.5, 10), indexing="ij")
+        alpha, beta = alpha.ravel()[:, None], beta.ravel()[:, None]
+        level = np.repeat(Y[0][None, :], len(alpha), axis=0)
+        trend = np.repeat((Y[1] - Y[0])[None, :], len(alpha), axis=0)
+        sse = np.zeros_like(level)
+        for t in range(1, T):
+            err = Y[t] - (level + trend)
+            sse += err ** 2
+            level = level + trend + alpha * err
+            trend = trend + alpha * beta * err
+
+        best, cols = sse.argmin(axis=0), np.arange(R)
+        a, b = alpha[best, 0], beta[best, 0]
+        sigma2 = sse[best, cols] / max(T - 2, 1)
+        h = np.arange(1, horizon + 1)
+        point = level[best, cols][:, None] + h * trend[best, cols][:, None]
+        # ETS(A,A,N): var_h = sigma² (1 + sum_{j<h} (alpha (1 + beta j))²)
+        c2 = (a[:, None] * (1 + b[:, None] * np.arange(horizon))) ** 2
+        c2[:, 0] = 0.0
+        return point, sigma2[:, None] * (1 + np.cumsum(c2, axis=1))
+
+    @staticmethod
+    def _linear(Y: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        """OLS linear trend per route with the usual prediction variance."""
+        T = len(Y)
+        t = np.arange(T, dtype=float)
+        X = np.column_stack([np.ones(T), t])
+        coef, *_ = np.linalg.lstsq(X, Y, rcond=None)
+        resid = Y - X @ coef
+        s2 = (resid ** 2).sum(axis=0) / max(T - 2, 1)
+        tf = T - 1 + np.arange(1, horizon + 1)
+        point = coef[0][:, None] + coef[1][:, None] * tf
+        lever = 1 + 1 / T + (tf - t.mean()) ** 2 / ((t - t.mean()) ** 2).sum()
+        return point, s2[:, None] * lever
+
+    @staticmethod
+    def _seasonal_naive(Y: np.ndarray, horizon: int, season: int = 12) -> Tuple[np.ndarray, np.ndarray]:
+        """Same month last season; plain naive when less than a season is observed."""
+        T = len(Y)
+        if T < season + 1:
+            return Forecaster._naive(Y, horizon)
+        h = np.arange(1, horizon + 1)
+        k = (h - 1) // season
+        point = Y[T - season + (h - 1) % season].T
+        sigma2 = (Y[season:] - Y[:-season]).var(axis=0)
+        return point, sigma2[:, None] * (k + 1)
+
+
+def _fit_arima_params(train_series: np.ndarray, order: Tuple[int, int, int]) -> Optional[np.ndarray]:
+    """Fit ARIMA and return its parameter vector (None on failure); runs in pool workers."""
+    try:
+        from statsmodels.tsa.arima.model import ARIMA  # type: ignore
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return np.asarray(ARIMA(train_series, order=order).fit().params)
+    except Exception:
+        return None
+
+
+class ForecastService:
+    """ARIMA forecasts served from fitted models cached per
+    (route, training window, data hash).
+
+    The hash covers only the training window, so appending a new month to
+    the history leaves earlier fits valid. When a route's full history has
+    grown by one observation since it was last seen (judged by the hash of
+    the whole series), the forecast of the newest window extends the
+    previous fit with that observation (a state-space update with the same
+    parameters, no refit). Any other window is fitted exactly, so a forecast
+    does not depend on which months were analysed before. `warm` fits many
+    routes/windows at once in a process pool.
+    """
+    _shared: Optional["ForecastService"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, order: Tuple[int, int, int] = (1, 1, 1), maxsize: int = 512):
+        self.order = order
+        self.params = LRUCache(maxsize=maxsize)
+        self.models = LRUCache(maxsize=maxsize)
+        # route -> hash of the full history last seen for it
+        self.histories = LRUCache(maxsize=maxsize)
+
+    @classmethod
+    def shared(cls) -> "ForecastService":
+        """Process-wide instance, so fits survive across analyzer instances."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def data_hash(train_series: np.ndarray) -> str:
+        return hashlib.sha1(np.ascontiguousarray(train_series, dtype=float).tobytes()).hexdigest()
+
+    def _key(self, route: str, train_series: np.ndarray) -> tuple:
+        return (route, len(train_series), self.data_hash(train_series), self.order)
+
+    def _filter(self, train_series: np.ndarray, params: np.ndarray):
+        from statsmodels.tsa.arima.model import ARIMA  # type: ignore
+        return ARIMA(train_series, order=self.order).filter(params)
+
+    def _model(self, route: str, train_series: np.ndarray, history: Optional[np.ndarray] = None):
+        """Fitted results for this window: cached, extended from the previous
+        window when `history` (the route's full series) has just grown by the
+        window's last observation, or fitted."""
+        key = self._key(route, train_series)
+        grown = False
+        if history is not None:
+            seen = self.histories.get(route)
+            grown = (
+                seen is not None and len(train_series) == len(history) > 1
+                and seen == self.data_hash(history[:-1])
+            )
+            self.histories.set(route, self.data_hash(history))
+
+        model = self.models.get(key)
+        if model is not None:
+            return model
+
+        params = self.params.get(key)
+        if params is None:
+            prev = self.models.get(self._key(route, train_series[:-1])) if grown else None
+            if prev is not None:
+                model = prev.append(train_series[-1:], refit=False)
+                self.models.set(key, model)
+                return model
+            params = _fit_arima_params(train_series, self.order)
+            if params is None:
+                return None
+            self.params.set(key, params)
+
+        model = self._filter(train_series, params)
+        self.models.set(key, model)
+        return model
+
+    def warm(
+        self,
+        historical: pd.DataFrame,
+        routes: Optional[List[str]] = None,
+        windows: Optional[List[int]] = None,
+        max_workers: Optional[int] = None,
+        use_processes: bool = True
+    ) -> int:
+        """Fit every missing (route, window) in parallel; returns the number of new fits.
+
+        Defaults to all route columns and the full history length.
+        """
+        if not ARIMA_AVAILABLE:
+            return 0
+        routes = routes or [c for c in historical.columns if c != "month"]
+        windows = windows or [len(historical)]
+        jobs = {}
+        for route in routes:
+            for window in windows:
+                route_name, train = Forecaster._training_window(historical, route, window)
+                key = self._key(route_name, train)
+                if len(train) >= 6 and key not in self.params and key not in self.models:
+                    jobs[key] = train
+
+        if not jobs:
+            return 0
+        trains = list(jobs.values())
+        max_workers = max_workers or min(len(trains), os.cpu_count() or 1)
+        if max_workers == 1:
+            fitted = [_fit_arima_params(t, self.order) for t in trains]
+        else:
+            pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            with pool_cls(max_workers=max_workers) as pool:
+                fitted = list(pool.map(_fit_arima_params, trains, [self.order] * len(trains)))
+        for key, params in zip(jobs, fitted):
+            if params is not None:
+                self.params.set(key, params)
+        return sum(p is not None for p in fitted)
+
+    def forecast(
+        self,
+        historical: pd.DataFrame,
+        route: str,
+        current_month: int,
+        use_arima: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Same contract as Forecaster.forecast, served from the model cache."""
+        route, hist_series = Forecaster._training_window(historical, route, current_month)
+        if use_arima and ARIMA_AVAILABLE and len(hist_series) >= 6:
+            try:
+                model = self._model(route, hist_series, historical[route].values)
+                if model is not None:
+                    fc_val = float(np.clip(model.forecast(1)[0], 0.0, 1.0))
+                    return hist_series, np.array([fc_val])
+            except Exception:
+                pass
+        return hist_series, Forecaster.trend_forecast(hist_series)
+
+    def forecast_horizon(
+        self, Y: np.ndarray, routes: List[str], horizon: int, level: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ARIMA h-step point forecasts and intervals for each column of Y.
+
+        Routes without a usable model (short history, failed fit, no
+        statsmodels) fall back to Holt's method.
+        """
+        point = np.empty((len(routes), horizon))
+        lower, upper = np.empty_like(point), np.empty_like(point)
+        fallback = []
+        for i, route in enumerate(routes):
+            if not ARIMA_AVAILABLE or len(Y) < 6:
+                fallback.append(i)
+                continue
+            try:
+                model = self._model(route, Y[:, i])
+                if model is None:
+                    fallback.append(i)
+                    continue
+                fc = model.get_forecast(horizon)
+                ci = np.asarray(fc.conf_int(alpha=1 - level))
+                point[i] = fc.predicted_mean
+                lower[i], upper[i] = ci[:, 0], ci[:, 1]
+            except Exception:
+                fallback.append(i)
+
+        if fallback:
+            holt = Forecaster.forecast_horizon(
+                pd.DataFrame(Y[:, fallback], columns=[routes[i] for i in fallback]),
+                len(Y), horizon, "holt", level
+            )
+            point[fallback], lower[fallback], upper[fallback] = holt.point, holt.lower, holt.upper
+        return point, lower, upper
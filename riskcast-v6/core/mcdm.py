@@ -1,114 +1,790 @@
 # core/mcdm.py
+import copy
 import pandas as pd
 import numpy as np
-from typing import Optional
-from .simulation import MonteCarloSimulator
+from dataclasses import MISSING, asdict, fields
+from typing import Dict, List, Optional, Tuple
+from .simulation import MonteCarloSimulator, StreamingAccumulator
 from .risk import RiskCalculator
-from .forecaster import Forecaster
+from .portfolio import CorrelatedRiskSimulator
+from .forecaster import Forecaster, ForecastService
 from .data import DataService
-from utils.fuzzy import apply_fuzzy
+from .cache import ResultCache, fingerprint
+from .pipeline import Pipeline, Stage
+from utils.fuzzy import TFN, apply_fuzzy
 from config.constants import (
-    PRIORITY_PROFILES, ICC_PACKAGES, COST_BENEFIT_MAP, SENSITIVITY_MAP, CRITERIA
+    PRIORITY_PROFILES, ICC_PACKAGES, COST_BENEFIT_MAP, SENSITIVITY_MAP, CRITERIA,
+    LARGE_CARGO_THRESHOLD, LARGE_CARGO_LOADING, MC_STREAMING_THRESHOLD, MC_CHART_BINS, CARRIER_RISK_CORRELATION
+)
+from core.models import (
+    AnalysisParams, AnalysisResult, HorizonForecast, RankingTable, RankRobustness, RiskDistribution,
+    TailRiskMetrics
 )
-from core.models import AnalysisParams, AnalysisResult
 
 class TOPSISAnalyzer:
     @staticmethod
     def analyze(data: pd.DataFrame, weights: pd.Series, cost_benefit) -> np.ndarray:
-        M = data[list(weights.index)].values.astype(float)
-        denom = np.sqrt((M ** 2).sum(axis=0))
+        return TOPSISAnalyzer.analyze_batch(data, weights, cost_benefit)[0]
+
+    @staticmethod
+    def separations(M: np.ndarray, is_cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vector-normalize M (..., alternatives, criteria) and return squared
+        per-criterion distances to the ideal-best and ideal-worst solutions.
+
+        With non-negative weights the weighted ideal is the weight times the
+        normalized ideal, so these terms do not depend on the weights and can
+        be shared across any number of weight vectors.
+        """
+        denom = np.sqrt((M ** 2).sum(axis=-2, keepdims=True))
         denom[denom == 0] = 1.0
         R = M / denom
-        V = R * weights.values
-        is_cost = np.array([cost_benefit[c] == "cost" for c in weights.index])
-        ideal_best = np.where(is_cost, V.min(axis=0), V.max(axis=0))
-        ideal_worst = np.where(is_cost, V.max(axis=0), V.min(axis=0))
-        d_plus = np.sqrt(((V - ideal_best) ** 2).sum(axis=1))
-        d_minus = np.sqrt(((V - ideal_worst) ** 2).sum(axis=1))
+        r_min, r_max = R.min(axis=-2, keepdims=True), R.max(axis=-2, keepdims=True)
+        ideal_best = np.where(is_cost, r_min, r_max)
+        ideal_worst = np.where(is_cost, r_max, r_min)
+        return (R - ideal_best) ** 2, (R - ideal_worst) ** 2
+
+    @staticmethod
+    def analyze_batch(
+        data,
+        weights,
+        cost_benefit,
+        criteria: Optional[List[str]] = None
+    ) -> np.ndarray:
+        """Score K weight vectors in one call; returns a (K × alternatives) matrix.
+
+        `weights` is a Series, a (K × criteria) DataFrame or an array with
+        `criteria` given. `data` is a DataFrame, an (alternatives × criteria)
+        array or a (K × alternatives × criteria) stack of decision matrices.
+        The normalization is computed once per decision matrix.
+        """
+        if isinstance(weights, pd.Series):
+            criteria = list(weights.index)
+        elif isinstance(weights, pd.DataFrame):
+            criteria = list(weights.columns)
+        elif criteria is None:
+            criteria = list(data.columns)
+        W = np.atleast_2d(np.asarray(weights, dtype=float))
+
+        if isinstance(data, pd.DataFrame):
+            M = data[criteria].values.astype(float)
+        else:
+            M = np.asarray(data, dtype=float)
+        is_cost = np.array([cost_benefit[c] == "cost" for c in criteria])
+        return TOPSISAnalyzer.scores(M, W, is_cost)
+
+    @staticmethod
+    def scores(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        """Closeness coefficients (K × alternatives) for weight rows W (K × criteria)."""
+        W = np.atleast_2d(W)
+        sep_best, sep_worst = TOPSISAnalyzer.separations(M, is_cost)
+        W2 = W ** 2
+        if M.ndim == 2:
+            d_plus = np.sqrt(W2 @ sep_best.T)
+            d_minus = np.sqrt(W2 @ sep_worst.T)
+        else:
+            W2 = np.broadcast_to(W2, (M.shape[0], W2.shape[1]))
+            d_plus = np.sqrt(np.einsum("km,knm->kn", W2, sep_best))
+            d_minus = np.sqrt(np.einsum("km,knm->kn", W2, sep_worst))
+        return d_minus / (d_plus + d_minus + 1e-12)
+
+# ---------------------------------------------------------------------------
+# MCDM method registry. Every method scores an (alternatives × criteria)
+# matrix for K weight vectors at once: score(M, W, is_cost) -> (K × alternatives),
+# higher is better. `score_range` is set on methods whose scores are bounded
+# (charts use it as the axis range). Methods with `pairwise = True` compare
+# every pair of alternatives (O(n²)) and are not offered for large catalogues.
+# ---------------------------------------------------------------------------
+MCDM_METHODS: Dict[str, type] = {}
+
+
+def register_method(name: str):
+    def decorator(cls):
+        cls.name = name
+        MCDM_METHODS[name] = cls
+        return cls
+    return decorator
+
+
+def get_method(name: str) -> type:
+    try:
+        return MCDM_METHODS[name]
+    except KeyError:
+        raise ValueError(f"Unknown MCDM method: {name}") from None
+
+
+def mcdm_scores(data, weights, cost_benefit, method: str = "topsis", criteria: Optional[List[str]] = None) -> np.ndarray:
+    """Like `TOPSISAnalyzer.analyze_batch` for any registered method."""
+    if isinstance(weights, pd.Series):
+        criteria = list(weights.index)
+    elif isinstance(weights, pd.DataFrame):
+        criteria = list(weights.columns)
+    elif criteria is None:
+        criteria = list(data.columns)
+    M = data[criteria].values.astype(float) if isinstance(data, pd.DataFrame) else np.asarray(data, dtype=float)
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    is_cost = np.array([cost_benefit[c] == "cost" for c in criteria])
+    return get_method(method).score(M, W, is_cost)
+
+
+def _minmax(M: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+    """Linear 0–1 normalization with 1 = best value of each criterion."""
+    lo, hi = M.min(axis=0), M.max(axis=0)
+    span = np.where(hi > lo, hi - lo, 1.0)
+    return np.where(is_cost, (hi - M) / span, (M - lo) / span)
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    """Rank (0 = best) of each alternative in each row of a (K × alternatives) score matrix."""
+    order = np.argsort(-scores, axis=-1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(scores.shape[-1]), axis=-1)
+    return ranks
+
+
+@register_method("topsis")
+class TOPSISMethod:
+    label = "TOPSIS"
+    score_range = (0.0, 1.0)
+
+    @staticmethod
+    def score(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        return TOPSISAnalyzer.scores(M, W, is_cost)
+
+
+@register_method("wsm")
+class WSMMethod:
+    """Weighted sum of min–max normalized criteria."""
+    label = "WSM"
+    score_range = (0.0, 1.0)
+
+    @staticmethod
+    def score(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        return np.atleast_2d(W) @ _minmax(M, is_cost).T
+
+
+@register_method("wpm")
+class WPMMethod:
+    """Weighted product of ratio-normalized criteria (x / max, or min / x for costs)."""
+    label = "WPM"
+    score_range = (0.0, 1.0)
+
+    @staticmethod
+    def score(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        eps = 1e-12
+        M = np.maximum(M, eps)
+        R = np.where(is_cost, M.min(axis=0) / M, M / M.max(axis=0))
+        return np.exp(np.atleast_2d(W) @ np.log(R).T)
+
+
+@register_method("vikor")
+class VIKORMethod:
+    """VIKOR compromise ranking; returns 1 − Q so that higher is better."""
+    label = "VIKOR"
+    score_range = (0.0, 1.0)
+    v = 0.5
+
+    @staticmethod
+    def score(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        W = np.atleast_2d(W)
+        D = 1.0 - _minmax(M, is_cost)                      # normalized regret per criterion
+        weighted = W[:, None, :] * D[None, :, :]           # (K × alternatives × criteria)
+        S, R = weighted.sum(axis=-1), weighted.max(axis=-1)
+
+        def scaled(x):
+            lo, hi = x.min(axis=1, keepdims=True), x.max(axis=1, keepdims=True)
+            return (x - lo) / np.where(hi > lo, hi - lo, 1.0)
+
+        Q = VIKORMethod.v * scaled(S) + (1 - VIKORMethod.v) * scaled(R)
+        return 1.0 - Q
+
+
+@register_method("promethee")
+class PROMETHEEMethod:
+    """PROMETHEE II net outranking flow with the linear (V-shape) preference
+    function, preference threshold = criterion range.
+
+    Net flows are linear in the weights, so the pairwise preferences are only
+    reduced to per-criterion leaving/entering sums, which are computed by
+    broadcasting over row blocks to bound memory at thousands of alternatives.
+    """
+    label = "PROMETHEE II"
+    pairwise = True
+    max_block_elements = 4_000_000
+
+    @staticmethod
+    def preference_sums(M: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        """(alternatives × criteria) leaving minus entering preference sums."""
+        n, c = M.shape
+        X = np.where(is_cost, -M, M)
+        span = X.max(axis=0) - X.min(axis=0)
+        span = np.where(span > 0, span, 1.0)
+        leaving = np.zeros((n, c))
+        entering = np.zeros((n, c))
+        block = max(1, PROMETHEEMethod.max_block_elements // max(n * c, 1))
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            P = np.clip((X[start:stop, None, :] - X[None, :, :]) / span, 0.0, 1.0)   # (b × n × c)
+            leaving[start:stop] = P.sum(axis=1)
+            entering += P.sum(axis=0)
+        return leaving - entering
+
+    @staticmethod
+    def score(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        n = M.shape[0]
+        net = PROMETHEEMethod.preference_sums(M, is_cost)
+        return np.atleast_2d(W) @ net.T / max(n - 1, 1)
+
+
+CONSENSUS_BASE_METHODS = ("topsis", "vikor", "promethee", "wsm", "wpm")
+
+
+@register_method("borda")
+class BordaConsensus:
+    """Borda count over the rankings of the base methods."""
+    label = "Borda (đồng thuận)"
+    pairwise = True
+
+    @staticmethod
+    def method_ranks(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        """(methods × K × alternatives) ranks, 0 = best."""
+        return np.stack([_ranks(get_method(m).score(M, W, is_cost)) for m in CONSENSUS_BASE_METHODS])
+
+    @staticmethod
+    def score(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        ranks = BordaConsensus.method_ranks(M, W, is_cost)
+        return (M.shape[0] - 1 - ranks).sum(axis=0) / len(CONSENSUS_BASE_METHODS)
+
+
+@register_method("copeland")
+class CopelandConsensus:
+    """Copeland rule: pairwise wins minus losses, where alternative i beats j
+    when a majority of the base methods rank it higher. Ties in the Copeland
+    score are broken by the Borda score."""
+    label = "Copeland (đồng thuận)"
+    pairwise = True
+
+    @staticmethod
+    def score(M: np.ndarray, W: np.ndarray, is_cost: np.ndarray) -> np.ndarray:
+        ranks = BordaConsensus.method_ranks(M, W, is_cost)       # (methods × K × n)
+        n_methods, K, n = ranks.shape
+        copeland = np.zeros((K, n))
+        block = max(1, PROMETHEEMethod.max_block_elements // max(n_methods * K * n, 1))
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            wins = (ranks[:, :, start:stop, None] < ranks[:, :, None, :]).sum(axis=0)   # (K × b × n)
+            losses = (ranks[:, :, start:stop, None] > ranks[:, :, None, :]).sum(axis=0)
+            copeland[:, start:stop] = (np.sign(wins - losses)).sum(axis=-1)
+        borda = (n - 1 - ranks).sum(axis=0) / (n_methods * max(n - 1, 1))
+        return copeland + borda / (n + 1)
+
+
+class FuzzyTOPSISAnalyzer:
+    """TOPSIS on triangular fuzzy numbers, for all alternatives and criteria
+    (and any leading batch dimensions) in one vectorized pass."""
+
+    @staticmethod
+    def closeness(decision: TFN, weights: TFN, is_cost) -> np.ndarray:
+        """`decision` is (..., alternatives, criteria), `weights` (..., criteria).
+
+        Normalizes linearly, weights, and measures vertex distances to the
+        per-criterion fuzzy ideal (largest high) and anti-ideal (smallest low).
+        Returns closeness coefficients (..., alternatives).
+        """
+        W = TFN(*(np.expand_dims(v, -2) for v in (weights.low, weights.mid, weights.high)))
+        V = decision.normalize(np.asarray(is_cost)) * W
+        best = TFN.crisp(V.high.max(axis=-2, keepdims=True))
+        worst = TFN.crisp(V.low.min(axis=-2, keepdims=True))
+        d_plus = V.distance(best).sum(axis=-1)
+        d_minus = V.distance(worst).sum(axis=-1)
         return d_minus / (d_plus + d_minus + 1e-12)
 
+    @staticmethod
+    def decision_matrix(
+        options: pd.DataFrame, criteria: List[str], uncertainty_pct: float,
+        std_columns: Optional[Dict[str, str]] = None
+    ) -> TFN:
+        """Fuzzify an options table: ±`uncertainty_pct` around each rating, or
+        mean ± std for criteria listed in `std_columns` (e.g. simulated C6)."""
+        std_columns = {"C6: Rủi ro khí hậu": "C6_std"} if std_columns is None else std_columns
+        M = options[criteria].values.astype(float)
+        spread = np.abs(M) * uncertainty_pct / 100.0
+        for j, crit in enumerate(criteria):
+            if std_columns.get(crit) in options.columns:
+                spread[:, j] = options[std_columns[crit]].values
+        return TFN(np.maximum(M - spread, 0.0), M, M + spread)
+
+    @staticmethod
+    def analyze(
+        options: pd.DataFrame, weights: pd.Series, cost_benefit, uncertainty_pct: float = 15.0
+    ) -> np.ndarray:
+        criteria = list(weights.index)
+        decision = FuzzyTOPSISAnalyzer.decision_matrix(options, criteria, uncertainty_pct)
+        fuzzy_weights = TFN.from_spread(weights.values, uncertainty_pct / 100.0, floor=0.0)
+        is_cost = np.array([cost_benefit[c] == "cost" for c in criteria])
+        return FuzzyTOPSISAnalyzer.closeness(decision, fuzzy_weights, is_cost)
+
+
+class OptionMatrixBuilder:
+    """Broadcast company criteria against ICC packages into one option table."""
+
+    @staticmethod
+    def build_tensor(
+        company_data: pd.DataFrame,
+        icc_packages: Dict[str, dict],
+        c6_mean: np.ndarray
+    ) -> np.ndarray:
+        """Return the (companies × packages × criteria) tensor in CRITERIA order."""
+        n_companies, n_packages = len(company_data), len(icc_packages)
+        coverage = np.array([p["coverage"] for p in icc_packages.values()], dtype=float)
+        multiplier = np.array([p["premium_multiplier"] for p in icc_packages.values()], dtype=float)
+
+        base = np.zeros((n_companies, len(CRITERIA)))
+        for j, crit in enumerate(CRITERIA):
+            if crit in company_data.columns:
+                base[:, j] = company_data[crit].to_numpy(dtype=float)
+        base[:, CRITERIA.index("C6: Rủi ro khí hậu")] = c6_mean
+
+        tensor = np.repeat(base[:, None, :], n_packages, axis=1)
+        tensor[:, :, CRITERIA.index("C1: Tỷ lệ phí")] *= multiplier
+        tensor[:, :, CRITERIA.index("C4: Hỗ trợ ICC")] *= coverage
+        return tensor
+
+    @staticmethod
+    def build(
+        company_data: pd.DataFrame,
+        icc_packages: Dict[str, dict],
+        cargo_value: float,
+        c6_mean: np.ndarray,
+        c6_std: np.ndarray
+    ) -> pd.DataFrame:
+        """Flatten the option tensor company-major, one row per (company, package)."""
+        n_companies, n_packages = len(company_data), len(icc_packages)
+        tensor = OptionMatrixBuilder.build_tensor(company_data, icc_packages, c6_mean)
+        matrix = tensor.reshape(n_companies * n_packages, len(CRITERIA))
+        coverage = np.array([p["coverage"] for p in icc_packages.values()], dtype=float)
+        premium_rate = matrix[:, CRITERIA.index("C1: Tỷ lệ phí")]
+
+        data = {
+            "company": np.repeat(company_data.index.to_numpy(), n_packages),
+            "icc_package": np.tile(np.array(list(icc_packages.keys()), dtype=object), n_companies),
+            "coverage": np.tile(coverage, n_companies),
+            "premium_rate": premium_rate.copy(),
+            "estimated_cost": cargo_value * premium_rate,
+        }
+        for j, crit in enumerate(CRITERIA):
+            data[crit] = matrix[:, j]
+        data["C6_std"] = np.repeat(np.asarray(c6_std, dtype=float), n_packages)
+        return pd.DataFrame(data)
+
 class MultiPackageAnalyzer:
-    def __init__(self):
+    # AnalysisParams fields that determine the Monte Carlo draws of a batch group
+    SIMULATION_KEYS = [
+        "route", "month", "departure_offset", "departure_arima", "use_mc", "mc_runs", "mc_workers", "mc_method"
+    ]
+    # Fields that determine the TOPSIS ranking within a simulation group
+    SCORING_KEYS = ["priority_profile", "use_fuzzy", "fuzzy_uncertainty", "large_cargo", "mcdm_method"]
+
+    def __init__(self, result_cache: Optional[ResultCache] = None):
         self.topsis = TOPSISAnalyzer()
         self.mc = MonteCarloSimulator()
         self.risk = RiskCalculator()
-        self.forecaster = Forecaster()
+        self.forecaster = ForecastService.shared()
         self.data_service = DataService()
+        self.result_cache = result_cache if result_cache is not None else ResultCache.shared()
+        self.pipeline = self._build_pipeline()
 
-    def run_analysis(self, params: AnalysisParams) -> AnalysisResult:
-        # Load historical data internally
-        historical = self.data_service.load_historical_data()
-        
-        profile_weights = PRIORITY_PROFILES[params.priority_profile]
-        weights = pd.Series(profile_weights, index=CRITERIA)
-
-        if params.use_fuzzy:
-            weights = apply_fuzzy(weights, params.fuzzy_uncertainty)
+    @staticmethod
+    def canonical_params(params: AnalysisParams) -> Dict:
+        """AnalysisParams with settings that a disabled feature ignores blanked out,
+        so e.g. toggling MC runs while MC is off still hits the cache."""
+        canonical = asdict(params)
+        if not params.use_fuzzy:
+            canonical["fuzzy_uncertainty"] = None
+        if not params.use_mc:
+            canonical.update(mc_runs=None, mc_workers=None, mc_method=None)
+        return canonical
 
-        company_data = pd.read_csv("data/company_data.csv").set_index("Company")
+    @staticmethod
+    def _base_risk(route: str, month: int) -> float:
+        return DataService.risk_index().lookup(route, month)
 
-        base_risk = float(
-            historical.loc[historical["month"] == params.month, params.route].iloc[0]
-            if params.month in historical["month"].values else 0.4
+    @staticmethod
+    def _forecast_path(
+        historical: pd.DataFrame, route: str, month: int, use_arima: bool, horizon: int
+    ) -> Tuple[str, HorizonForecast]:
+        """Forecast of the `horizon` months after `month`, with 95% intervals."""
+        route, _ = Forecaster._training_window(historical, route, month)
+        path = Forecaster.forecast_horizon(
+            historical, month, max(horizon, 1), "arima" if use_arima else "holt", routes=[route]
         )
+        return route, path
 
-        mc_mean = mc_std = np.zeros(len(company_data))
-        if params.use_mc:
-            companies, mc_mean, mc_std = self.mc.simulate(base_risk, SENSITIVITY_MAP, params.mc_runs)
-            order = [companies.index(c) for c in company_data.index]
-            mc_mean, mc_std = mc_mean[order], mc_std[order]
-
-        all_options = []
-        for company in company_data.index:
-            for icc_name, icc_data in ICC_PACKAGES.items():
-                option = company_data.loc[company].copy()
-                base_premium = option["C1: Tỷ lệ phí"]
-                option["C1: Tỷ lệ phí"] = base_premium * icc_data["premium_multiplier"]
-                option["C4: Hỗ trợ ICC"] = option["C4: Hỗ trợ ICC"] * icc_data["coverage"]
-
-                idx = list(company_data.index).index(company)
-                option["C6: Rủi ro khí hậu"] = mc_mean[idx]
-
-                all_options.append({
-                    "company": company, "icc_package": icc_name, "coverage": icc_data["coverage"],
-                    "premium_rate": option["C1: Tỷ lệ phí"],
-                    "estimated_cost": params.cargo_value * option["C1: Tỷ lệ phí"],
-                    **{k: option[k] for k in CRITERIA}, "C6_std": mc_std[idx]
-                })
+    def _departure_risk(
+        self, historical: pd.DataFrame, route: str, month: int, departure_offset: int, use_arima: bool
+    ) -> float:
+        """Forecast base climate risk `departure_offset` months after `month`."""
+        route, path = self._forecast_path(historical, route, month, use_arima, departure_offset)
+        return float(path.route(route)[0][departure_offset - 1])
+
+    @staticmethod
+    def _profile_weights(priority_profile: str, use_fuzzy: bool, fuzzy_uncertainty: float) -> pd.Series:
+        weights = pd.Series(PRIORITY_PROFILES[priority_profile], index=CRITERIA)
+        if use_fuzzy:
+            weights = apply_fuzzy(weights, fuzzy_uncertainty)
+        return weights
+
+    def _simulate_c6(
+        self, base_risk: float, use_mc: bool, mc_runs: int, company_data: pd.DataFrame,
+        mc_workers: int = 1, mc_method: str = "plain"
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[TailRiskMetrics], Optional[RiskDistribution]]:
+        """Return C6 mean, std, loss-rate tail metrics and binned distribution
+        per company (in company_data order); tail and distribution are None
+        without MC.
 
-        data_adjusted = pd.DataFrame(all_options)
-        if params.cargo_value > 50_000:
-            data_adjusted["C1: Tỷ lệ phí"] *= 1.1
-            data_adjusted["estimated_cost"] *= 1.1
+        Runs above MC_STREAMING_THRESHOLD use the chunked streaming engine,
+        split across worker processes when `mc_workers` > 1. Smaller runs
+        use `mc_method` for variance reduction.
+        """
+        if not use_mc:
+            zeros = np.zeros(len(company_data))
+            return zeros, zeros, None, None
+        companies = list(company_data.index)
+        if mc_runs > MC_STREAMING_THRESHOLD:
+            if mc_workers > 1:
+                run = self.mc.simulate_parallel(base_risk, SENSITIVITY_MAP, int(mc_runs), int(mc_workers))
+            else:
+                run = self.mc.simulate_streaming(base_risk, SENSITIVITY_MAP, int(mc_runs))
+            order = [run.companies.index(c) for c in company_data.index]
+            tail = TailRiskMetrics(var=run.tail.var[order], cvar=run.tail.cvar[order])
+            counts, edges = StreamingAccumulator.coarsen(run.histogram[order], run.bin_edges, MC_CHART_BINS)
+            return run.mean[order], run.std[order], tail, RiskDistribution(companies, counts, edges)
+        if mc_method != "plain":
+            est = self.mc.simulate_variance_reduced(base_risk, SENSITIVITY_MAP, int(mc_runs), mc_method)
+            order = [est.companies.index(c) for c in company_data.index]
+            draws = est.draws[:, order]
+            return est.mean[order], est.std[order], self.risk.tail_metrics(draws), self._distribution(companies, draws)
+        sim_companies, draws = self.mc.simulate_draws(base_risk, SENSITIVITY_MAP, int(mc_runs))
+        order = [sim_companies.index(c) for c in company_data.index]
+        draws = draws[:, order]
+        return draws.mean(axis=0), draws.std(axis=0), self.risk.tail_metrics(draws), self._distribution(companies, draws)
 
-        scores = self.topsis.analyze(
-            data_adjusted[CRITERIA], weights, {k: v.value for k, v in COST_BENEFIT_MAP.items()}
+    @staticmethod
+    def _distribution(companies: List[str], draws: np.ndarray) -> RiskDistribution:
+        """Chart-sized histogram of (n, companies) draws."""
+        acc = StreamingAccumulator(draws.shape[1], bins=MC_CHART_BINS)
+        acc.update(draws)
+        return RiskDistribution(companies, acc.histogram, acc.bin_edges)
+
+    def _option_tail_rates(
+        self, options: pd.DataFrame, tail: Optional[TailRiskMetrics], company_data: pd.DataFrame
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-option VaR/CVaR of the climate loss rate (per unit of cargo value).
+
+        `tail` holds the per-carrier metrics of the MC draws; without MC the
+        metrics fall back to the spread of the options' C6 values.
+        """
+        if tail is None:
+            var, cvar = self.risk.calculate_var_cvar(options["C6: Rủi ro khí hậu"].values, 1.0)
+            return np.full(len(options), var), np.full(len(options), cvar)
+        idx = company_data.index.get_indexer(options["company"])
+        return tail.var[idx], tail.cvar[idx]
+
+    def _score_options(
+        self, options: pd.DataFrame, weights: pd.Series, large_cargo: bool, mcdm_method: str = "topsis"
+    ) -> pd.DataFrame:
+        """Apply the large-cargo loading, score with `mcdm_method` and add rank and category."""
+        data_adjusted = options.copy()
+        if large_cargo:
+            data_adjusted["C1: Tỷ lệ phí"] *= LARGE_CARGO_LOADING
+            data_adjusted["estimated_cost"] *= LARGE_CARGO_LOADING
+
+        scores = mcdm_scores(
+            data_adjusted[CRITERIA], weights, {k: v.value for k, v in COST_BENEFIT_MAP.items()}, mcdm_method
         )
-        data_adjusted["score"] = scores
+        data_adjusted["score"] = scores[0]
         data_adjusted = data_adjusted.sort_values("score", ascending=False).reset_index(drop=True)
         data_adjusted["rank"] = data_adjusted.index + 1
 
         data_adjusted["category"] = data_adjusted["icc_package"].map({
             "ICC C": "Tiết kiệm", "ICC B": "Cân bằng", "ICC A": "An toàn"
         })
+        return data_adjusted
 
+    @staticmethod
+    def _add_confidence(ranked: pd.DataFrame) -> pd.DataFrame:
+        """Confidence from the C6 coefficient of variation, rescaled to [0.3, 1]."""
+        data_adjusted = ranked.copy()
         eps = 1e-9
         cv_c6 = data_adjusted["C6_std"].values / (data_adjusted["C6: Rủi ro khí hậu"].values + eps)
         conf = 1.0 / (1.0 + cv_c6)
         conf = 0.3 + 0.7 * (conf - conf.min()) / (np.ptp(conf) + eps)
         data_adjusted["confidence"] = conf
+        return data_adjusted
 
-        var = cvar = None
-        if params.use_var:
-            var, cvar = self.risk.calculate_var_cvar(data_adjusted["C6: Rủi ro khí hậu"].values, params.cargo_value)
+    def _rank_options(
+        self, options: pd.DataFrame, weights: pd.Series, large_cargo: bool, mcdm_method: str = "topsis"
+    ) -> pd.DataFrame:
+        """Apply the large-cargo loading, score and add rank, category and confidence."""
+        return self._add_confidence(self._score_options(options, weights, large_cargo, mcdm_method))
+
+    def _build_pipeline(self) -> Pipeline:
+        """Stages of a single-shipment analysis and the inputs each depends on.
+
+        Options are built at unit cargo value (TOPSIS is scale-invariant per
+        column), so a new cargo value only re-runs the final scaling, plus
+        scoring when it crosses the large-cargo threshold.
+        """
+        return Pipeline([
+            Stage("data", ("data_version",), self._stage_data),
+            Stage("forecast", ("data", "route", "month", "use_arima", "horizon"), self._stage_forecast),
+            Stage("base_risk", ("forecast", "route", "month", "departure_offset"), self._stage_base_risk,
+                  key_by_value=True),
+            Stage("simulation", ("data", "base_risk", "use_mc", "mc_runs", "mc_workers", "mc_method"),
+                  self._stage_simulation),
+            Stage("options", ("data", "simulation"), self._stage_options),
+            Stage("weights", ("priority_profile", "use_fuzzy", "fuzzy_uncertainty"), self._profile_weights),
+            Stage("scoring", ("options", "weights", "large_cargo", "mcdm_method"), self._score_options),
+            Stage("confidence", ("scoring",), self._add_confidence),
+            Stage("risk_metrics", ("confidence", "simulation", "data"), self._stage_risk_metrics),
+            Stage("robustness", ("confidence", "priority_profile", "use_fuzzy", "fuzzy_uncertainty", "mcdm_method"),
+                  self._stage_robustness),
+            Stage("sensitivity", ("confidence", "weights", "mcdm_method"), self._stage_sensitivity),
+            Stage("consensus", ("confidence", "weights"), self._stage_consensus),
+            Stage("result", ("confidence", "risk_metrics", "weights", "forecast", "robustness", "sensitivity",
+                             "consensus", "simulation", "cargo_value", "use_var", "forecast_horizon"),
+                  self._stage_result),
+        ], self.result_cache)
+
+    def pipeline_inputs(self, params: AnalysisParams) -> Dict:
+        inputs = self.canonical_params(params)
+        inputs.update(
+            data_version=self.data_service.data_version(),
+            horizon=max(params.forecast_horizon, params.departure_offset, 1),
+            large_cargo=params.cargo_value > LARGE_CARGO_THRESHOLD,
+        )
+        return inputs
+
+    def run_analysis(self, params: AnalysisParams) -> AnalysisResult:
+        """Rank all options for one shipment.
+
+        Runs through the staged pipeline: each stage is cached on its declared
+        inputs plus the data version, so e.g. a new priority profile or cargo
+        value reuses the forecast and Monte Carlo stages.
+        """
+        inputs = self.pipeline_inputs(params)
+        result = copy.deepcopy(self.pipeline.run("result", inputs))
+        result.fingerprint = fingerprint("result", inputs)
+        return result
+
+    def _stage_data(self, data_version: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        return self.data_service.load_historical_data(), self.data_service.get_company_data()
+
+    def _stage_forecast(self, data, route: str, month: int, use_arima: bool, horizon: int):
+        """(history, (point, lower, upper) over `horizon` months)."""
+        historical, _ = data
+        _, hist_series = Forecaster._training_window(historical, route, month)
+        resolved, path = self._forecast_path(historical, route, month, use_arima, horizon)
+        return hist_series, path.route(resolved)
+
+    def _stage_base_risk(self, forecast, route: str, month: int, departure_offset: int) -> float:
+        if departure_offset > 0:
+            return float(forecast[1][0][departure_offset - 1])
+        return self._base_risk(route, month)
 
-        hist_series, forecast = self.forecaster.forecast(historical, params.route, params.month, params.use_arima)
+    def _stage_simulation(self, data, base_risk: float, use_mc: bool, mc_runs, mc_workers, mc_method):
+        return self._simulate_c6(base_risk, use_mc, mc_runs, data[1], mc_workers, mc_method)
 
+    def _stage_options(self, data, simulation) -> pd.DataFrame:
+        mc_mean, mc_std, _, _ = simulation
+        return OptionMatrixBuilder.build(data[1], ICC_PACKAGES, 1.0, mc_mean, mc_std)
+
+    def _stage_risk_metrics(self, ranked: pd.DataFrame, simulation, data) -> Tuple[np.ndarray, np.ndarray]:
+        return self._option_tail_rates(ranked, simulation[2], data[1])
+
+    @staticmethod
+    def _stage_robustness(
+        ranked: pd.DataFrame, priority_profile: str, use_fuzzy: bool, fuzzy_uncertainty: float, mcdm_method: str
+    ) -> Optional[RankRobustness]:
+        """Rank probabilities under weights sampled from the fuzzy triangles."""
+        if not use_fuzzy:
+            return None
+        from .sensitivity import WeightRobustnessAnalyzer  # imports this module
+        weights = pd.Series(PRIORITY_PROFILES[priority_profile], index=CRITERIA)
+        return WeightRobustnessAnalyzer.analyze(ranked, weights, fuzzy_uncertainty, method=mcdm_method)
+
+    @staticmethod
+    def _stage_sensitivity(ranked: pd.DataFrame, weights: pd.Series, mcdm_method: str) -> pd.DataFrame:
+        """Weight changes per criterion at which the recommended option changes."""
+        from .sensitivity import WeightSensitivityAnalyzer  # imports this module
+        return WeightSensitivityAnalyzer.rank_reversal(ranked, weights, method=mcdm_method)
+
+    @staticmethod
+    def _stage_consensus(ranked: pd.DataFrame, weights: pd.Series) -> pd.DataFrame:
+        """Rank of every option under each base method plus the Borda and Copeland consensus."""
+        cost_benefit = {k: v.value for k, v in COST_BENEFIT_MAP.items()}
+        table = ranked[["company", "icc_package"]].copy()
+        for method in CONSENSUS_BASE_METHODS + ("borda", "copeland"):
+            table[method] = _ranks(mcdm_scores(ranked[CRITERIA], weights, cost_benefit, method))[0] + 1
+        return table
+
+    @staticmethod
+    def _stage_result(
+        ranked: pd.DataFrame, risk_metrics, weights: pd.Series, forecast, robustness, sensitivity, consensus,
+        simulation, cargo_value: float, use_var: bool, forecast_horizon: int
+    ) -> AnalysisResult:
+        hist_series, (point, lower, upper) = forecast
+        data_adjusted = ranked.copy()
+        data_adjusted["estimated_cost"] *= cargo_value
+
+        var = cvar = None
+        if use_var:
+            var_rate, cvar_rate = risk_metrics
+            data_adjusted["var"] = var_rate * cargo_value
+            data_adjusted["cvar"] = cvar_rate * cargo_value
+            # Headline figures are those of the recommended option
+            var, cvar = float(data_adjusted["var"].iloc[0]), float(data_adjusted["cvar"].iloc[0])
+
+        steps = max(forecast_horizon, 1)
         return AnalysisResult(
-            results=data_adjusted,
+            results=RankingTable(data_adjusted, criteria=CRITERIA),
             weights=weights,
-            data_adjusted=data_adjusted,
             var=var, cvar=cvar,
             historical=hist_series,
-            forecast=forecast
-        )
\ No newline at end of file
+            forecast=point[:steps],
+            forecast_lower=lower[:steps],
+            forecast_upper=upper[:steps],
+            robustness=robustness,
+            sensitivity=sensitivity,
+            consensus=consensus,
+            distribution=simulation[3]
+        )
+
+    @staticmethod
+    def _shipments_frame(shipments) -> pd.DataFrame:
+        """Normalize a list of AnalysisParams or a manifest DataFrame to one row per shipment."""
+        if isinstance(shipments, pd.DataFrame):
+            frame = shipments.copy()
+            if "shipment_id" not in frame.columns:
+                frame["shipment_id"] = frame.index
+        else:
+            frame = pd.DataFrame([asdict(p) for p in shipments])
+            frame["shipment_id"] = np.arange(len(frame))
+        if "cargo_value" not in frame.columns:
+            raise ValueError("shipments must provide a cargo_value column")
+
+        for f in fields(AnalysisParams):
+            if f.name not in frame.columns and f.default is not MISSING:
+                frame[f.name] = f.default
+        frame["large_cargo"] = frame["cargo_value"] > LARGE_CARGO_THRESHOLD
+        # The forecaster only matters to the simulation when departure is in the future
+        frame["departure_arima"] = frame["use_arima"].astype(bool) & (frame["departure_offset"] > 0)
+        frame["_order"] = np.arange(len(frame))
+        return frame.reset_index(drop=True)
+
+    def run_batch(self, shipments, top_n: Optional[int] = None) -> pd.DataFrame:
+        """Rank the options for many shipments at once.
+
+        `shipments` is a list of AnalysisParams or a DataFrame whose columns
+        are AnalysisParams fields (missing fields take their defaults; an
+        optional `shipment_id` column labels the rows). Shipments are grouped
+        by route, month and MC settings so data, draws, forecasts and tail
+        metrics are computed once per group, and TOPSIS once per distinct weighting.
+        Returns one row per (shipment, option), ordered by shipment then rank;
+        `top_n` keeps only the best options of each shipment.
+        """
+        frame = self._shipments_frame(shipments)
+        if frame.empty:
+            return pd.DataFrame()
+
+        historical = self.data_service.load_historical_data()
+        company_data = self.data_service.get_company_data()
+
+        arima = frame[frame["use_arima"].astype(bool)]
+        if len(arima):
+            self.forecaster.warm(historical, list(arima["route"].unique()), [int(m) for m in arima["month"].unique()])
+
+        frame["base_risk"] = self.data_service.risk_index().lookup_many(frame["route"], frame["month"])
+
+        blocks = []
+        for sim_key, group in frame.groupby(self.SIMULATION_KEYS, sort=False):
+            route, month, departure_offset, departure_arima, use_mc, mc_runs, mc_workers, mc_method = sim_key
+            base_risk = (
+                self._departure_risk(historical, route, month, departure_offset, departure_arima)
+                if departure_offset > 0 else float(group["base_risk"].iloc[0])
+            )
+            mc_mean, mc_std, tail, _ = self._simulate_c6(
+                base_risk, use_mc, mc_runs, company_data, mc_workers, mc_method
+            )
+            # Unit cargo value: estimated_cost carries the premium rate and is scaled per shipment
+            options = OptionMatrixBuilder.build(company_data, ICC_PACKAGES, 1.0, mc_mean, mc_std)
+
+            forecasts = {}
+            for use_arima in group["use_arima"].unique():
+                _, path = self._forecast_path(historical, route, month, bool(use_arima), 1)
+                forecasts[use_arima] = float(path.point[0, 0])
+
+            for (profile, use_fuzzy, fuzzy_pct, large_cargo, mcdm_method), sub in group.groupby(
+                self.SCORING_KEYS, sort=False
+            ):
+                weights = self._profile_weights(profile, use_fuzzy, fuzzy_pct)
+                ranked = self._rank_options(options, weights, large_cargo, mcdm_method)
+                var_rate, cvar_rate = self._option_tail_rates(ranked, tail, company_data)
+                ranked["var"], ranked["cvar"] = var_rate, cvar_rate
+                if top_n is not None:
+                    ranked = ranked.head(top_n)
+
+                n_options, n_shipments = len(ranked), len(sub)
+                block = ranked.iloc[np.tile(np.arange(n_options), n_shipments)].reset_index(drop=True)
+                cargo = np.repeat(sub["cargo_value"].to_numpy(dtype=float), n_options)
+                use_var = np.repeat(sub["use_var"].to_numpy(dtype=bool), n_options)
+                block["estimated_cost"] *= cargo
+                block["var"] = np.where(use_var, block["var"] * cargo, np.nan)
+                block["cvar"] = np.where(use_var, block["cvar"] * cargo, np.nan)
+                block["forecast_risk"] = np.repeat(sub["use_arima"].map(forecasts).to_numpy(), n_options)
+
+                meta = pd.DataFrame({
+                    "shipment_id": np.repeat(sub["shipment_id"].to_numpy(), n_options),
+                    "route": route,
+                    "month": month,
+                    "cargo_value": cargo,
+                    "priority_profile": profile,
+                    "_order": np.repeat(sub["_order"].to_numpy(), n_options),
+                })
+                blocks.append(pd.concat([meta, block], axis=1))
+
+        out = pd.concat(blocks, ignore_index=True)
+        out = out.sort_values(["_order", "rank"], kind="stable").drop(columns="_order")
+        return out.reset_index(drop=True)
+
+    def rank_catalogue(self, catalogue, params: AnalysisParams, k: int = 50):
+        """Large-catalogue mode: score an arbitrary option catalogue (DataFrame
+        or column → array mapping with the CRITERIA columns) under the weights
+        and MCDM method of `params`, materializing only the top `k` rows.
+
+        Returns a `CatalogueRanking`; `.top()` is the top-k DataFrame and
+        `.rows(start, stop)` pages lazily through the rest. Pairwise methods
+        (PROMETHEE II, Borda, Copeland) raise a ValueError.
+        """
+        from .catalogue import CatalogueRanking  # imports this module
+        weights = self._profile_weights(params.priority_profile, params.use_fuzzy, params.fuzzy_uncertainty)
+        return CatalogueRanking.rank(
+            catalogue, weights, k, params.mcdm_method, params.cargo_value > LARGE_CARGO_THRESHOLD
+        )
+
+    def portfolio_risk(
+        self,
+        manifest: pd.DataFrame,
+        n_simulations: int = 20_000,
+        confidence: float = 0.95,
+        carrier_corr=CARRIER_RISK_CORRELATION
+    ) -> TailRiskMetrics:
+        """Per-route and whole-manifest VaR/CVaR with correlated carrier and route risk.
+
+        `manifest` has route, month, company and cargo_value columns; a
+        run_batch result is accepted directly and its rank-1 options are used.
+        """
+        if "rank" in manifest.columns:
+            manifest = manifest[manifest["rank"] == 1]
+        historical = self.data_service.load_historical_data()
+        simulator = CorrelatedRiskSimulator(historical, SENSITIVITY_MAP, carrier_corr=carrier_corr)
+        return simulator.portfolio_risk(manifest, n_simulations, confidence)
@@ -1,3 +1,5 @@
+import copy
+import weakref
 from dataclasses import dataclass
 from enum import Enum
 from typing import Dict, List, Optional, Tuple
@@ -22,13 +24,234 @@ class AnalysisParams:
     use_var: bool = True
     mc_runs: int = 2000
     fuzzy_uncertainty: float = 15.0
+    mc_workers: int = 1
+    mc_method: str = "plain"
+    forecast_horizon: int = 1
+    departure_offset: int = 0
+    mcdm_method: str = "topsis"
+
+class RankingTable:
+    """Struct-of-arrays storage for a ranking table.
+
+    Criterion columns share one float64 matrix, other numeric columns are
+    vectors, and text columns (company, package, category) are stored as
+    small integer codes plus their categories. `to_frame()` rebuilds the
+    DataFrame with the original column order; the last frame built is kept
+    through a weak reference only, so it is reused while callers hold it but
+    never kept alive by the table itself (e.g. in session state).
+    """
+    __slots__ = ("columns", "criteria", "matrix", "vectors", "codes", "categories", "_view", "__weakref__")
+
+    def __init__(self, frame: pd.DataFrame, criteria: Optional[List[str]] = None, criteria_dtype=np.float64):
+        self.columns = tuple(frame.columns)
+        # criterion columns are labelled "C<n>: <name>" unless given explicitly
+        self.criteria = tuple(criteria) if criteria is not None else tuple(
+            c for c in self.columns if str(c)[:1] == "C" and ":" in str(c)
+        )
+        self.matrix = frame[list(self.criteria)].to_numpy(dtype=criteria_dtype)
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, np.ndarray] = {}
+        for col in self.columns:
+            if col in self.criteria:
+                continue
+            values = frame[col]
+            if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                self.vectors[col] = values.to_numpy()
+            else:
+                codes, uniques = pd.factorize(values, use_na_sentinel=True)
+                self.codes[col] = codes.astype(np.int8 if len(uniques) < 127 else np.int32)
+                self.categories[col] = np.asarray(uniques, dtype=object)
+        self._view = None
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.matrix, *self.vectors.values(), *self.codes.values()]
+        return sum(a.nbytes for a in arrays) + sum(len(c) * 8 for c in self.categories.values())
+
+    def column(self, name: str) -> np.ndarray:
+        """One column as an array without building a DataFrame."""
+        if name in self.vectors:
+            return self.vectors[name]
+        if name in self.codes:
+            codes = self.codes[name]
+            return np.where(codes >= 0, self.categories[name][np.maximum(codes, 0)], None)
+        return self.matrix[:, self.criteria.index(name)].astype(float)
+
+    def to_frame(self) -> pd.DataFrame:
+        frame = self._view() if self._view is not None else None
+        if frame is None:
+            frame = pd.DataFrame({name: self.column(name) for name in self.columns})
+            self._view = weakref.ref(frame)
+        return frame
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__[:-2]}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._view = None
+
+    def __deepcopy__(self, memo):
+        clone = RankingTable.__new__(RankingTable)
+        clone.__setstate__(copy.deepcopy(self.__getstate__(), memo))
+        return clone
+
 
-@dataclass
 class AnalysisResult:
-    results: pd.DataFrame
-    weights: pd.Series
-    data_adjusted: Optional[pd.DataFrame] = None
-    var: Optional[float] = None
-    cvar: Optional[float] = None
-    historical: Optional[np.ndarray] = None
-    forecast: Optional[np.ndarray] = None
\ No newline at end of file
+    """Outcome of one analysis.
+
+    The ranking is held as a compact `RankingTable`; `results` (and its alias
+    `data_adjusted`) build a pandas view only when a caller asks for one.
+    `fingerprint` identifies the inputs the result was computed from (set by
+    `MultiPackageAnalyzer.run_analysis`) and keys derived artefacts such as charts.
+    """
+    __slots__ = (
+        "table", "weights", "var", "cvar", "historical", "forecast", "forecast_lower", "forecast_upper",
+        "robustness", "sensitivity", "consensus", "distribution", "fingerprint"
+    )
+
+    def __init__(
+        self,
+        results: pd.DataFrame,
+        weights: pd.Series,
+        data_adjusted: Optional[pd.DataFrame] = None,
+        var: Optional[float] = None,
+        cvar: Optional[float] = None,
+        historical: Optional[np.ndarray] = None,
+        forecast: Optional[np.ndarray] = None,
+        forecast_lower: Optional[np.ndarray] = None,
+        forecast_upper: Optional[np.ndarray] = None,
+        robustness: Optional["RankRobustness"] = None,
+        sensitivity: Optional[pd.DataFrame] = None,
+        consensus: Optional[pd.DataFrame] = None,
+        distribution: Optional["RiskDistribution"] = None,
+        fingerprint: Optional[str] = None
+    ):
+        # `data_adjusted` is accepted for compatibility; it was always the same table as `results`
+        self.table = results if isinstance(results, RankingTable) else RankingTable(results)
+        self.weights = weights
+        self.var = var
+        self.cvar = cvar
+        self.historical = historical
+        self.forecast = forecast
+        self.forecast_lower = forecast_lower
+        self.forecast_upper = forecast_upper
+        self.robustness = robustness
+        self.sensitivity = sensitivity
+        self.consensus = consensus
+        self.distribution = distribution
+        self.fingerprint = fingerprint
+
+    @property
+    def results(self) -> pd.DataFrame:
+        return self.table.to_frame()
+
+    @property
+    def data_adjusted(self) -> pd.DataFrame:
+        return self.table.to_frame()
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot, None) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def __repr__(self) -> str:
+        return f"AnalysisResult(options={len(self.table)}, var={self.var}, cvar={self.cvar})"
+
+@dataclass
+class TailRiskMetrics:
+    """VaR/CVaR per position and for the weighted portfolio of positions."""
+    var: np.ndarray
+    cvar: np.ndarray
+    portfolio_var: Optional[float] = None
+    portfolio_cvar: Optional[float] = None
+    confidence: float = 0.95
+
+@dataclass
+class StreamingSimulationResult:
+    """Summary of a chunked Monte Carlo run; arrays are per company."""
+    companies: List[str]
+    mean: np.ndarray
+    std: np.ndarray
+    stderr: np.ndarray
+    tail: TailRiskMetrics
+    var_ci: np.ndarray
+    n_simulations: int
+    converged: bool
+    histogram: np.ndarray
+    bin_edges: np.ndarray
+
+@dataclass
+class RiskDistribution:
+    """Binned Monte Carlo distribution of the C6 loss rate, one row per company."""
+    companies: List[str]
+    counts: np.ndarray
+    bin_edges: np.ndarray
+
+    @property
+    def centers(self) -> np.ndarray:
+        return 0.5 * (self.bin_edges[:-1] + self.bin_edges[1:])
+
+    @property
+    def density(self) -> np.ndarray:
+        """Counts normalized to a probability density per company."""
+        totals = np.maximum(self.counts.sum(axis=1, keepdims=True), 1)
+        return self.counts / (totals * np.diff(self.bin_edges))
+
+@dataclass
+class VarianceReducedEstimate:
+    """C6 estimate from a variance-reduced Monte Carlo run; arrays are per company.
+
+    `effective_sample_size` is the number of plain i.i.d. draws that would
+    give the same standard error for the mean.
+    """
+    companies: List[str]
+    mean: np.ndarray
+    std: np.ndarray
+    stderr: np.ndarray
+    effective_sample_size: np.ndarray
+    n_simulations: int
+    method: str
+    draws: Optional[np.ndarray] = None
+
+@dataclass
+class HorizonForecast:
+    """h-step forecasts for several routes; arrays are (routes × horizon)."""
+    routes: List[str]
+    point: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    level: float
+    method: str
+
+    def route(self, name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        i = self.routes.index(name)
+        return self.point[i], self.lower[i], self.upper[i]
+
+@dataclass
+class RankRobustness:
+    """Rank distribution of each option under weights sampled from the fuzzy
+    triangles; `rank_probabilities[i, r]` is P(option i is ranked r + 1)."""
+    options: List[str]
+    rank_probabilities: np.ndarray
+    n_samples: int
+
+    @property
+    def top1(self) -> np.ndarray:
+        return self.rank_probabilities[:, 0]
+
+    @property
+    def expected_rank(self) -> np.ndarray:
+        return self.rank_probabilities @ np.arange(1, self.rank_probabilities.shape[1] + 1)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "option": self.options, "p_top1": self.top1, "expected_rank": self.expected_rank
+        })
@@ -0,0 +1,83 @@
+# core/pipeline.py
+"""Incremental evaluation of a DAG of analysis stages.
+
+Each stage declares its inputs: names of other stages or of run
+parameters. A stage's cache key is the fingerprint of its name, the
+parameter values it reads and the keys of its upstream stages, so
+changing one parameter only invalidates the stages downstream of it.
+Stages with `key_by_value` pass their output (rather than their key) to
+downstream keys; a cheap stage whose value did not change then stops the
+invalidation from spreading (early cutoff).
+"""
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import ResultCache, fingerprint
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    inputs: Tuple[str, ...]
+    func: Callable[..., Any]
+    key_by_value: bool = False
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[Stage], cache: Optional[ResultCache] = None):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in stage.inputs or stage.name in self.stages:
+                raise ValueError(f"Invalid stage definition: {stage.name}")
+            self.stages[stage.name] = stage
+        self.cache = cache if cache is not None else ResultCache()
+        self._runs = threading.local()
+
+    @property
+    def computed(self) -> List[str]:
+        """Stages actually executed by the calling thread's last `run`."""
+        return getattr(self._runs, "computed", [])
+
+    def run(self, target: str, params: Dict[str, Any]) -> Any:
+        """Value of `target` for `params`, recomputing only invalidated stages.
+
+        Safe to call from several threads at once; each thread sees its own
+        `computed`.
+        """
+        computed: List[str] = []
+        self._runs.computed = computed
+        keys: Dict[str, str] = {}
+        values: Dict[str, Any] = {}
+        visiting = set()
+
+        def value(name: str) -> Any:
+            if name not in self.stages:
+                if name not in params:
+                    raise KeyError(f"Missing pipeline input: {name}")
+                return params[name]
+            if name not in values:
+                stage = self.stages[name]
+                values[name] = self.cache.get_or_compute(key(name), lambda: self._compute(stage, value, computed))
+            return values[name]
+
+        def token(name: str) -> Any:
+            if name in self.stages and not self.stages[name].key_by_value:
+                return ("stage", key(name))
+            return value(name)
+
+        def key(name: str) -> str:
+            if name not in keys:
+                if name in visiting:
+                    raise ValueError(f"Pipeline stages form a cycle through {name}")
+                visiting.add(name)
+                keys[name] = fingerprint(name, [token(i) for i in self.stages[name].inputs])
+            return keys[name]
+
+        return value(target)
+
+    @staticmethod
+    def _compute(stage: Stage, value: Callable[[str], Any], computed: List[str]) -> Any:
+        result = stage.func(*[value(i) for i in stage.inputs])
+        computed.append(stage.name)
+        return result
@@ -0,0 +1,141 @@
+# core/portfolio.py
+"""Correlated climate-risk simulation across carriers and routes."""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+from core.models import TailRiskMetrics
+from .risk import RiskCalculator
+from .risk_index import BaseRiskIndex
+from config.constants import CARRIER_RISK_CORRELATION, MC_CHUNK_SIZE, SENSITIVITY_MAP
+
+
+def nearest_correlation_factor(corr: np.ndarray) -> np.ndarray:
+    """Cholesky factor of `corr` after flooring negative eigenvalues (estimated
+    correlation matrices from short histories are often not quite PSD)."""
+    corr = np.asarray(corr, dtype=float)
+    vals, vecs = np.linalg.eigh((corr + corr.T) / 2)
+    fixed = (vecs * np.maximum(vals, 1e-10)) @ vecs.T
+    d = np.sqrt(np.diag(fixed))
+    return np.linalg.cholesky(fixed / np.outer(d, d))
+
+
+class CorrelatedRiskSimulator:
+    """Joint simulation of climate loss rates for every (route, carrier) pair.
+
+    Latent shocks have correlation route_corr ⊗ carrier_corr: route shocks
+    are correlated through the Cholesky factor of `route_corr` (by default
+    estimated from month-over-month changes in historical_climate.csv) and
+    carriers through a one-factor model (scalar `carrier_corr`) or a full
+    Cholesky factor (matrix). Rates are then mu + sigma * z clipped to
+    [0, 1], with the same mu/sigma as MonteCarloSimulator.
+    """
+
+    def __init__(
+        self,
+        historical: pd.DataFrame,
+        sensitivity_map: Dict[str, float] = SENSITIVITY_MAP,
+        carrier_corr: Union[float, np.ndarray, None] = CARRIER_RISK_CORRELATION,
+        route_corr: Optional[np.ndarray] = None,
+        seed: int = 2025
+    ):
+        self.risk_index = BaseRiskIndex.from_frame(historical)
+        self.routes: List[str] = list(self.risk_index.routes)
+        self.companies: List[str] = list(sensitivity_map.keys())
+        self.sensitivity = np.array([sensitivity_map[c] for c in self.companies], dtype=float)
+        if route_corr is None:
+            route_corr = self.route_correlation(historical)
+        self.route_factor = nearest_correlation_factor(route_corr)
+        self.carrier_corr = carrier_corr
+        if carrier_corr is not None and np.ndim(carrier_corr) == 2:
+            self.carrier_factor = nearest_correlation_factor(carrier_corr)
+        self.seed = seed
+
+    @staticmethod
+    def route_correlation(historical: pd.DataFrame, method: str = "diff") -> np.ndarray:
+        """Correlation of route risk shocks: month-over-month changes ("diff")
+        or raw levels ("levels", dominated by the shared seasonality)."""
+        series = historical.drop(columns=["month", "year", "week", "date"], errors="ignore")
+        if method == "diff":
+            series = series.diff().dropna()
+        corr = np.nan_to_num(series.corr().values, nan=0.0)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def latent(self, rng: np.random.Generator, n: int, carriers: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n × routes × carriers) standard-normal shocks with the Kronecker correlation.
+
+        With the one-factor carrier model only the requested `carriers` are
+        drawn, so the cost does not grow with the size of the catalogue.
+        """
+        rho = self.carrier_corr
+        if carriers is None or (rho is not None and np.ndim(rho) == 2):
+            n_c = len(self.companies)
+        else:
+            n_c = len(carriers)
+        eps = rng.standard_normal((n, len(self.routes), n_c))
+        if rho is not None and np.ndim(rho) == 0:
+            common = rng.standard_normal((n, len(self.routes), 1))
+            eps = np.sqrt(rho) * common + np.sqrt(1.0 - rho) * eps
+        elif rho is not None:
+            eps = eps @ self.carrier_factor.T
+            if carriers is not None:
+                eps = eps[:, :, carriers]
+        return np.einsum("ij,njc->nic", self.route_factor, eps)
+
+    def _cell_params(self, route_idx: np.ndarray, month: np.ndarray, company_idx: np.ndarray):
+        base = self.risk_index.take(route_idx, self.risk_index.period_positions(month))
+        mu = base * self.sensitivity[company_idx]
+        return mu, np.maximum(0.03, mu * 0.12)
+
+    def simulate(self, month: int, n_simulations: int) -> np.ndarray:
+        """Correlated loss rates for every (route, carrier) in `month`: (n × routes × carriers)."""
+        rng = np.random.default_rng(self.seed)
+        r_idx, c_idx = np.meshgrid(np.arange(len(self.routes)), np.arange(len(self.companies)), indexing="ij")
+        mu, sigma = self._cell_params(r_idx.ravel(), np.full(r_idx.size, month), c_idx.ravel())
+        z = self.latent(rng, n_simulations).reshape(n_simulations, -1)
+        rates = np.clip(mu + sigma * z, 0.0, 1.0)
+        return rates.reshape(n_simulations, len(self.routes), len(self.companies))
+
+    def route_losses(
+        self, manifest: pd.DataFrame, n_simulations: int, chunk_size: int = MC_CHUNK_SIZE
+    ) -> np.ndarray:
+        """Simulated loss per scenario and route for a mixed-route manifest: (n × routes).
+
+        `manifest` needs route, month, company and cargo_value columns (e.g. the
+        top-ranked rows of MultiPackageAnalyzer.run_batch). Shipments sharing a
+        (route, month, company) cell share one rate, so the work scales with
+        the number of distinct cells rather than shipments.
+        """
+        route_idx = pd.Index(self.routes).get_indexer(manifest["route"])
+        company_idx = pd.Index(self.companies).get_indexer(manifest["company"])
+        if (route_idx < 0).any() or (company_idx < 0).any():
+            raise ValueError("manifest contains unknown routes or companies")
+
+        cells = pd.DataFrame({
+            "route": route_idx, "month": manifest["month"].to_numpy(), "company": company_idx,
+            "exposure": manifest["cargo_value"].to_numpy(dtype=float)
+        }).groupby(["route", "month", "company"], as_index=False)["exposure"].sum()
+        r, m, c = (cells[k].to_numpy() for k in ("route", "month", "company"))
+        mu, sigma = self._cell_params(r, m, c)
+        exposure_by_route = np.zeros((len(cells), len(self.routes)))
+        exposure_by_route[np.arange(len(cells)), r] = cells["exposure"].to_numpy()
+
+        carriers, c_local = np.unique(c, return_inverse=True)
+        # Bound the latent block to a few million elements however many carriers are used
+        chunk_size = max(1, min(chunk_size, 4_000_000 // (len(self.routes) * len(carriers))))
+
+        rng = np.random.default_rng(self.seed)
+        losses = np.empty((n_simulations, len(self.routes)))
+        for start in range(0, n_simulations, chunk_size):
+            n = min(chunk_size, n_simulations - start)
+            z = self.latent(rng, n, carriers)[:, r, c_local]
+            rates = np.clip(mu + sigma * z, 0.0, 1.0)
+            losses[start:start + n] = rates @ exposure_by_route
+        return losses
+
+    def portfolio_risk(
+        self, manifest: pd.DataFrame, n_simulations: int = 20_000, confidence: float = 0.95
+    ) -> TailRiskMetrics:
+        """Per-route and whole-manifest VaR/CVaR in one pass over the simulated losses."""
+        losses = self.route_losses(manifest, n_simulations)
+        return RiskCalculator.tail_metrics(losses, confidence, weights=np.ones(len(self.routes)))
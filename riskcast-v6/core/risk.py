@@ -1,6 +1,7 @@
 # core/risk.py
 import numpy as np
 from typing import Tuple, Optional
+from core.models import TailRiskMetrics
 
 class RiskCalculator:
     @staticmethod
@@ -15,4 +16,43 @@ class RiskCalculator:
         var = float(np.percentile(losses, confidence * 100))
         tail_losses = losses[losses >= var]
         cvar = float(tail_losses.mean()) if len(tail_losses) > 0 else var
-        return var, cvar
\ No newline at end of file
+        return var, cvar
+
+    @staticmethod
+    def tail_metrics(
+        losses: np.ndarray,
+        confidence: float = 0.95,
+        weights: Optional[np.ndarray] = None
+    ) -> TailRiskMetrics:
+        """Empirical VaR/CVaR of an (n_scenarios × positions) loss matrix.
+
+        Each column is a position; when `weights` is given, the portfolio
+        loss `losses @ weights` is evaluated in the same pass. Uses a single
+        np.partition at the VaR order statistic instead of sorting: VaR is
+        the ceil(confidence · n)-th smallest loss and CVaR the mean of the
+        losses from there up.
+        """
+        losses = np.asarray(losses, dtype=float)
+        if losses.ndim == 1:
+            losses = losses[:, None]
+        n = losses.shape[0]
+        if n == 0:
+            zeros = np.zeros(losses.shape[1])
+            return TailRiskMetrics(var=zeros, cvar=zeros.copy(), confidence=confidence)
+
+        columns = losses
+        if weights is not None:
+            columns = np.column_stack([losses, losses @ np.asarray(weights, dtype=float)])
+
+        k = min(max(int(np.ceil(confidence * n)) - 1, 0), n - 1)
+        part = np.partition(columns, k, axis=0)
+        var = part[k]
+        cvar = part[k:].mean(axis=0)
+
+        if weights is None:
+            return TailRiskMetrics(var=var, cvar=cvar, confidence=confidence)
+        return TailRiskMetrics(
+            var=var[:-1], cvar=cvar[:-1],
+            portfolio_var=float(var[-1]), portfolio_cvar=float(cvar[-1]),
+            confidence=confidence
+        )
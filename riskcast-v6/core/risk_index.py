@@ -0,0 +1,86 @@
+# core/risk_index.py
+import numpy as np
+import pandas as pd
+from typing import Dict, Hashable, List, Sequence
+
+DEFAULT_BASE_RISK = 0.4
+GRANULARITIES = ("month", "year_month", "week", "day")
+
+
+class BaseRiskIndex:
+    """Dense (route × period) table of base climate risk.
+
+    Route and period labels map to array positions through dictionaries, so a
+    single lookup is two dict hits and an array read, and a whole batch is one
+    `get_indexer` plus fancy indexing. Periods are month numbers by default;
+    histories with `year`/`week`/`date` columns can be indexed by
+    (year, month), (ISO year, week) or by day. Coarser granularities average
+    the finer observations. Unknown routes or periods return `default`.
+    """
+
+    def __init__(self, values: np.ndarray, routes: Sequence[str], periods: Sequence[Hashable],
+                 granularity: str = "month", default: float = DEFAULT_BASE_RISK):
+        self.values = np.asarray(values, dtype=float)
+        self.values.setflags(write=False)
+        self.routes: Dict[str, int] = {r: i for i, r in enumerate(routes)}
+        self.periods: Dict[Hashable, int] = {p: j for j, p in enumerate(periods)}
+        self._route_index = pd.Index(list(routes))
+        self._period_index = pd.Index(list(periods), tupleize_cols=False)
+        self.granularity = granularity
+        self.default = default
+
+    @staticmethod
+    def period_keys(historical: pd.DataFrame, granularity: str = "month") -> List[Hashable]:
+        """Period label of every row of `historical` at the requested granularity."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if "date" in historical.columns:
+            dates = pd.to_datetime(historical["date"])
+            iso = dates.dt.isocalendar()
+            parts = {"year": dates.dt.year, "month": dates.dt.month, "week": iso.week,
+                     "iso_year": iso.year, "day": dates.dt.date}
+        else:
+            parts = {c: historical[c] for c in ("year", "month", "week") if c in historical.columns}
+            parts["iso_year"] = parts.get("year")
+        needed = {"month": ["month"], "year_month": ["year", "month"],
+                  "week": ["iso_year", "week"], "day": ["day"]}[granularity]
+        missing = [p for p in needed if parts.get(p) is None]
+        if missing:
+            raise ValueError(f"historical data has no {'/'.join(missing)} column for {granularity} lookups")
+        if len(needed) == 1:
+            return [k.item() if hasattr(k, "item") else k for k in parts[needed[0]]]
+        return list(zip(*(np.asarray(parts[p], dtype=int).tolist() for p in needed)))
+
+    @classmethod
+    def from_frame(cls, historical: pd.DataFrame, granularity: str = "month",
+                   default: float = DEFAULT_BASE_RISK) -> "BaseRiskIndex":
+        routes = [c for c in historical.columns if c not in ("month", "year", "week", "date")]
+        keys = cls.period_keys(historical, granularity)
+        table = historical[routes].groupby(pd.Index(keys, tupleize_cols=False), sort=True).mean()
+        return cls(table.values.T, routes, list(table.index), granularity, default)
+
+    def lookup(self, route: str, period: Hashable) -> float:
+        i, j = self.routes.get(route), self.periods.get(period)
+        if i is None or j is None:
+            return self.default
+        return float(self.values[i, j])
+
+    def period_positions(self, periods: Sequence[Hashable]) -> np.ndarray:
+        """Column positions of `periods`; -1 where a period is unknown."""
+        return self._period_index.get_indexer(pd.Index(list(periods), tupleize_cols=False))
+
+    def positions(self, routes: Sequence[str], periods: Sequence[Hashable]):
+        """Array positions for paired labels; -1 where a label is unknown."""
+        return self._route_index.get_indexer(list(routes)), self.period_positions(periods)
+
+    def take(self, route_pos: np.ndarray, period_pos: np.ndarray) -> np.ndarray:
+        """Vectorized read by position; negative positions give `default`."""
+        route_pos, period_pos = np.asarray(route_pos), np.asarray(period_pos)
+        ok = (route_pos >= 0) & (period_pos >= 0)
+        out = np.full(np.broadcast(route_pos, period_pos).shape, self.default)
+        out[ok] = self.values[np.broadcast_to(route_pos, ok.shape)[ok], np.broadcast_to(period_pos, ok.shape)[ok]]
+        return out
+
+    def lookup_many(self, routes: Sequence[str], periods: Sequence[Hashable]) -> np.ndarray:
+        """Base risk for each (route, period) pair, e.g. a whole shipment manifest."""
+        return self.take(*self.positions(routes, periods))
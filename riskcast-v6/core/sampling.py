@@ -0,0 +1,99 @@
+# core/sampling.py
+"""Low-discrepancy sequences and normal-distribution helpers for the simulators."""
+import importlib.util
+import math
+import numpy as np
+from typing import Optional
+
+# scipy (pulled in by statsmodels) provides Sobol sequences and a fast ndtri;
+# it is imported on first use and NumPy fallbacks are used without it.
+SCIPY_AVAILABLE = importlib.util.find_spec("scipy") is not None
+
+_ACKLAM_A = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+             1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00]
+_ACKLAM_B = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+             6.680131188771972e+01, -1.328068155288572e+01]
+_ACKLAM_C = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+             -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00]
+_ACKLAM_D = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+             3.754408661907416e+00]
+
+
+def norm_ppf(u: np.ndarray) -> np.ndarray:
+    """Inverse standard-normal CDF (scipy's ndtri, else Acklam's rational approximation)."""
+    u = np.clip(np.asarray(u, dtype=float), 1e-12, 1 - 1e-12)
+    if SCIPY_AVAILABLE:
+        from scipy.special import ndtri
+        return ndtri(u)
+
+    a, b, c, d = _ACKLAM_A, _ACKLAM_B, _ACKLAM_C, _ACKLAM_D
+    z = np.empty_like(u)
+    low, high = u < 0.02425, u > 1 - 0.02425
+    mid = ~(low | high)
+
+    q = u[mid] - 0.5
+    r = q * q
+    z[mid] = (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r + a[5]) * q / \
+             (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1)
+    for mask, sign, p in ((low, 1.0, u[low]), (high, -1.0, 1 - u[high])):
+        q = np.sqrt(-2 * np.log(p))
+        z[mask] = sign * (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / \
+                  ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1)
+    return z
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=float)
+    return 0.5 * (1.0 + np.vectorize(math.erf, otypes=[float])(x / math.sqrt(2.0)))
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=float)
+    return np.exp(-0.5 * x ** 2) / math.sqrt(2 * math.pi)
+
+
+def clipped_normal_mean(mu: np.ndarray, sigma: np.ndarray, lo: float = 0.0, hi: float = 1.0) -> np.ndarray:
+    """Closed-form E[clip(X, lo, hi)] for X ~ N(mu, sigma²)."""
+    mu, sigma = np.asarray(mu, dtype=float), np.asarray(sigma, dtype=float)
+    a, b = (lo - mu) / sigma, (hi - mu) / sigma
+    inside = mu * (norm_cdf(b) - norm_cdf(a)) + sigma * (norm_pdf(a) - norm_pdf(b))
+    return lo * norm_cdf(a) + inside + hi * (1 - norm_cdf(b))
+
+
+def _first_primes(n: int) -> list:
+    primes, candidate = [], 2
+    while len(primes) < n:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def halton(n: int, dims: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """First n points of the Halton sequence in [0, 1)^dims, with a random
+    Cranley–Patterson shift when `rng` is given."""
+    points = np.empty((n, dims))
+    index = np.arange(1, n + 1)
+    for d, base in enumerate(_first_primes(dims)):
+        i = index.copy()
+        f, r = 1.0, np.zeros(n)
+        while np.any(i > 0):
+            f /= base
+            r += f * (i % base)
+            i //= base
+        points[:, d] = r
+    if rng is not None:
+        points = (points + rng.random(dims)) % 1.0
+    return points
+
+
+def sobol(n: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """n scrambled Sobol points in [0, 1)^dims (n is rounded up to a power of two).
+
+    Falls back to a shifted Halton sequence when scipy is not installed.
+    """
+    m = max(int(np.ceil(np.log2(max(n, 1)))), 0)
+    if not SCIPY_AVAILABLE:
+        return halton(2 ** m, dims, rng)
+    from scipy.stats import qmc
+    return qmc.Sobol(d=dims, scramble=True, seed=rng).random_base2(m)
@@ -0,0 +1,155 @@
+# core/sensitivity.py
+import numpy as np
+import pandas as pd
+from typing import Optional
+from .mcdm import mcdm_scores
+from utils.fuzzy import TFN
+from config.constants import COST_BENEFIT_MAP, CRITERIA, FUZZY_WEIGHT_SAMPLES
+from core.models import RankRobustness
+
+
+class WeightRobustnessAnalyzer:
+    """How stable is the ranking when the criteria weights are only known as
+    fuzzy triangles? Samples weight vectors, scores them all in one batched
+    call of the MCDM method and tabulates the resulting ranks."""
+
+    @staticmethod
+    def sample_weights(
+        weights: pd.Series, uncertainty_pct: float, n_samples: int = FUZZY_WEIGHT_SAMPLES, seed: int = 2025
+    ) -> np.ndarray:
+        """(n_samples × criteria) weights drawn independently from each
+        criterion's triangle (same bounds as `apply_fuzzy`), rows normalized to 1."""
+        tri = TFN.from_spread(weights.values, uncertainty_pct / 100.0, floor=1e-9, cap=0.9999)
+        low, mid, high = tri.low, tri.mid, np.maximum(tri.high, tri.low)
+        width = high - low
+        u = np.random.default_rng(seed).random((n_samples, len(weights)))
+        # inverse CDF of the triangular distribution; degenerate triangles give `mid`
+        with np.errstate(divide="ignore", invalid="ignore"):
+            split = np.where(width > 0, (mid - low) / width, 0.0)
+        left = low + np.sqrt(u * width * (mid - low))
+        right = high - np.sqrt((1 - u) * width * (high - mid))
+        W = np.where(u < split, left, right)
+        W = np.where(width > 0, W, mid)
+        return W / W.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def rank_probabilities(scores: np.ndarray) -> np.ndarray:
+        """(options × ranks) frequencies from a (samples × options) score matrix."""
+        n, m = scores.shape
+        order = np.argsort(-scores, axis=1, kind="stable")
+        counts = np.bincount((order * m + np.arange(m)).ravel(), minlength=m * m)
+        return counts.reshape(m, m) / n
+
+    @staticmethod
+    def analyze(
+        options: pd.DataFrame,
+        weights: pd.Series,
+        uncertainty_pct: float,
+        n_samples: int = FUZZY_WEIGHT_SAMPLES,
+        seed: int = 2025,
+        labels: Optional[pd.Series] = None,
+        method: str = "topsis"
+    ) -> RankRobustness:
+        """Rank-probability distribution of every option in `options`.
+
+        `weights` are the crisp profile weights at the centre of the triangles.
+        Options are labelled "company — package" unless `labels` is given.
+        """
+        W = WeightRobustnessAnalyzer.sample_weights(weights[CRITERIA], uncertainty_pct, n_samples, seed)
+        cost_benefit = {k: v.value for k, v in COST_BENEFIT_MAP.items()}
+        scores = mcdm_scores(options[CRITERIA], W, cost_benefit, method, criteria=CRITERIA)
+        if labels is None:
+            labels = options["company"].astype(str) + " — " + options["icc_package"].astype(str)
+        return RankRobustness(
+            options=list(labels),
+            rank_probabilities=WeightRobustnessAnalyzer.rank_probabilities(scores),
+            n_samples=n_samples
+        )
+
+
+class WeightSensitivityAnalyzer:
+    """Smallest change of each criterion weight that changes the top-ranked option.
+
+    Moving weight j by delta rescales the other weights proportionally so the
+    vector still sums to 1. For every criterion and direction a grid of
+    deltas is scored in one batched call (the normalization is shared),
+    then the first reversal on the grid is refined by bisection, again
+    batched across all criteria and directions.
+    """
+
+    @staticmethod
+    def perturb(weights: np.ndarray, j: np.ndarray, delta: np.ndarray) -> np.ndarray:
+        """Rows of `weights` with w_j moved by delta and the rest rescaled."""
+        w_j = weights[j]
+        scale = (1 - w_j - delta) / np.maximum(1 - w_j, 1e-12)
+        W = weights[None, :] * scale[:, None]
+        W[np.arange(len(j)), j] = w_j + delta
+        return W
+
+    @staticmethod
+    def rank_reversal(
+        options: pd.DataFrame,
+        weights: pd.Series,
+        grid: int = 50,
+        tol: float = 1e-4,
+        labels: Optional[pd.Series] = None,
+        method: str = "topsis"
+    ) -> pd.DataFrame:
+        """One row per criterion with the weight increase and decrease (absolute
+        weight units) at which the top option changes and the option that
+        takes over; NaN when no reversal is possible in that direction.
+        `critical_change` is the smaller change as a fraction of the current
+        weight (0.12 = a 12% change)."""
+        criteria = list(weights.index)
+        w = weights.values.astype(float)
+        w = w / w.sum()
+        n = len(w)
+        cost_benefit = {k: v.value for k, v in COST_BENEFIT_MAP.items()}
+        X = options[criteria]
+        if labels is None:
+            labels = options["company"].astype(str) + " — " + options["icc_package"].astype(str)
+        labels = np.asarray(labels)
+
+        def top(j, delta):
+            W = WeightSensitivityAnalyzer.perturb(w, j, delta)
+            return mcdm_scores(X, W, cost_benefit, method, criteria=criteria).argmax(axis=1)
+
+        base = int(top(np.array([0]), np.array([0.0]))[0])
+
+        # (criterion, direction) pairs and the largest feasible move for each
+        pair_j = np.repeat(np.arange(n), 2)
+        sign = np.tile([1.0, -1.0], n)
+        reach = np.where(sign > 0, 1 - w[pair_j], w[pair_j])
+        steps = np.arange(1, grid + 1) / grid
+
+        winners = top(np.repeat(pair_j, grid), np.repeat(sign * reach, grid) * np.tile(steps, 2 * n))
+        changed = (winners != base).reshape(2 * n, grid)
+        found = changed.any(axis=1)
+        first = changed.argmax(axis=1)
+
+        lo = np.where(first > 0, steps[first - 1], 0.0) * reach
+        hi = steps[first] * reach
+        new_top = winners.reshape(2 * n, grid)[np.arange(2 * n), first]
+        idx = np.flatnonzero(found)
+        while idx.size and np.max(hi[idx] - lo[idx]) > tol:
+            mid = (lo[idx] + hi[idx]) / 2
+            winner = top(pair_j[idx], sign[idx] * mid)
+            flipped = winner != base
+            hi[idx] = np.where(flipped, mid, hi[idx])
+            lo[idx] = np.where(flipped, lo[idx], mid)
+            new_top[idx] = np.where(flipped, winner, new_top[idx])
+
+        threshold = np.where(found, hi, np.nan).reshape(n, 2)
+        takeover = np.where(found, labels[new_top], None).reshape(n, 2)
+        critical = np.nanmin(np.where(np.isnan(threshold), np.inf, threshold), axis=1)
+        critical = np.where(np.isinf(critical), np.nan, critical)
+        return pd.DataFrame({
+            "criterion": criteria,
+            "weight": w,
+            "increase": threshold[:, 0],
+            "increase_new_top": takeover[:, 0],
+            "decrease": threshold[:, 1],
+            "decrease_new_top": takeover[:, 1],
+            "critical_change": critical / w,
+            "top_option": labels[base],
+        })
@@ -1,20 +1,339 @@
 # core/simulation.py
+import os
 import numpy as np
-from typing import Dict, Tuple, List
-import streamlit as st
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Tuple, List, Optional
+from .cache import cache_data
+from core.models import StreamingSimulationResult, TailRiskMetrics, VarianceReducedEstimate
+from .sampling import SCIPY_AVAILABLE, clipped_normal_mean, halton, norm_ppf, sobol
+from config.constants import MC_CHUNK_SIZE, MC_DRAW_CACHE_SIZE, MC_SKETCH_BINS
+
+
+class StreamingAccumulator:
+    """Online per-column statistics for draws on a bounded range [lo, hi].
+
+    Mean and variance are merged chunk by chunk (Welford/Chan), and a
+    fixed-bin histogram serves as the quantile sketch, so memory does not
+    grow with the number of draws. Quantiles are exact up to the bin width.
+    """
+
+    def __init__(self, n_columns: int, bins: int = MC_SKETCH_BINS, lo: float = 0.0, hi: float = 1.0):
+        self.bins, self.lo, self.hi = bins, lo, hi
+        self.count = 0
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.histogram = np.zeros((n_columns, bins), dtype=np.int64)
+
+    @property
+    def bin_edges(self) -> np.ndarray:
+        return np.linspace(self.lo, self.hi, self.bins + 1)
+
+    def _merge_moments(self, n_b: int, mean_b: np.ndarray, m2_b: np.ndarray) -> None:
+        n_new = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n_new)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (self.count * n_b / n_new)
+        self.count = n_new
+
+    def update(self, block: np.ndarray) -> None:
+        n_b, n_columns = block.shape
+        if n_b == 0:
+            return
+        mean_b = block.mean(axis=0)
+        self._merge_moments(n_b, mean_b, ((block - mean_b) ** 2).sum(axis=0))
+
+        idx = ((block - self.lo) * (self.bins / (self.hi - self.lo))).astype(np.int64)
+        np.clip(idx, 0, self.bins - 1, out=idx)
+        idx += np.arange(n_columns) * self.bins
+        self.histogram += np.bincount(idx.ravel(), minlength=n_columns * self.bins).reshape(n_columns, self.bins)
+
+    def merge(self, other: "StreamingAccumulator") -> "StreamingAccumulator":
+        if other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.histogram += other.histogram
+        return self
+
+    @staticmethod
+    def coarsen(histogram: np.ndarray, bin_edges: np.ndarray, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Sum a (columns, fine bins) histogram into `bins` wider bins (for charts)."""
+        fine = histogram.shape[1]
+        if bins >= fine:
+            return histogram.copy(), bin_edges.copy()
+        cuts = np.linspace(0, fine, bins + 1).astype(np.intp)
+        return np.add.reduceat(histogram, cuts[:-1], axis=1), bin_edges[cuts]
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.m2 / max(self.count, 1))
+
+    @property
+    def stderr(self) -> np.ndarray:
+        return self.std / np.sqrt(max(self.count, 1))
+
+    def _value_at_rank(self, rank: np.ndarray) -> np.ndarray:
+        """Value of the rank-th smallest draw (1-based) per column, interpolated in its bin."""
+        cum = self.histogram.cumsum(axis=1)
+        rank = np.broadcast_to(np.asarray(rank, dtype=float), (len(cum),))
+        b = (cum < rank[:, None]).sum(axis=1).clip(0, self.bins - 1)
+        rows = np.arange(len(cum))
+        below = cum[rows, b] - self.histogram[rows, b]
+        frac = (rank - below) / np.maximum(self.histogram[rows, b], 1)
+        width = (self.hi - self.lo) / self.bins
+        return self.lo + (b + np.clip(frac, 0.0, 1.0)) * width
+
+    def quantile(self, q: float) -> np.ndarray:
+        return self._value_at_rank(max(np.ceil(q * self.count), 1))
+
+    def quantile_ci(self, q: float, z: float = 1.96) -> np.ndarray:
+        """Distribution-free CI of the q-quantile from binomial order-statistic ranks; shape (2, columns)."""
+        half = z * np.sqrt(self.count * q * (1 - q))
+        lo_rank = min(max(np.floor(self.count * q - half), 1), self.count)
+        hi_rank = min(max(np.ceil(self.count * q + half), 1), self.count)
+        return np.vstack([self._value_at_rank(lo_rank), self._value_at_rank(hi_rank)])
+
+    def tail_metrics(self, confidence: float = 0.95) -> TailRiskMetrics:
+        """VaR/CVaR from the sketch, with draws inside a bin at the bin centre."""
+        rank = max(np.ceil(confidence * self.count), 1)
+        var = self._value_at_rank(rank)
+        cum = self.histogram.cumsum(axis=1)
+        b = (cum < rank).sum(axis=1).clip(0, self.bins - 1)
+        rows = np.arange(len(cum))
+        centers = 0.5 * (self.bin_edges[:-1] + self.bin_edges[1:])
+        weighted = (self.histogram * centers).cumsum(axis=1)
+        above = weighted[:, -1] - weighted[rows, b]
+        in_bin = cum[rows, b] - (rank - 1)
+        cvar = (in_bin * centers[b] + above) / (self.count - rank + 1)
+        return TailRiskMetrics(var=var, cvar=np.maximum(cvar, var), confidence=confidence)
+
+
+def _stream_worker(
+    mu: np.ndarray, sigma: np.ndarray, n_simulations: int, seed_seq: np.random.SeedSequence, chunk_size: int
+) -> StreamingAccumulator:
+    """Accumulate `n_simulations` clipped draws from one independent child stream."""
+    rng = np.random.default_rng(seed_seq)
+    acc = StreamingAccumulator(len(mu))
+    while acc.count < n_simulations:
+        size = min(chunk_size, n_simulations - acc.count)
+        block = rng.normal(loc=mu, scale=sigma, size=(size, len(mu)))
+        acc.update(np.clip(block, 0.0, 1.0, out=block))
+    return acc
+
 
 class MonteCarloSimulator:
     @staticmethod
-    @st.cache_data(ttl=600)
-    def simulate(
+    def _params(base_risk: float, sensitivity_map: Dict[str, float]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        companies = list(sensitivity_map.keys())
+        mu = np.array([base_risk * sensitivity_map[c] for c in companies])
+        sigma = np.maximum(0.03, mu * 0.12)
+        return companies, mu, sigma
+
+    @staticmethod
+    def _draw(
         base_risk: float,
         sensitivity_map: Dict[str, float],
         n_simulations: int
-    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    ) -> Tuple[List[str], np.ndarray]:
         rng = np.random.default_rng(2025)
-        companies = list(sensitivity_map.keys())
-        mu = np.array([base_risk * sensitivity_map[c] for c in companies])
-        sigma = np.maximum(0.03, mu * 0.12)
+        companies, mu, sigma = MonteCarloSimulator._params(base_risk, sensitivity_map)
         sims = rng.normal(loc=mu, scale=sigma, size=(n_simulations, len(companies)))
-        sims = np.clip(sims, 0.0, 1.0)
-        return companies, sims.mean(axis=0), sims.std(axis=0)
\ No newline at end of file
+        return companies, np.clip(sims, 0.0, 1.0)
+
+    @staticmethod
+    @cache_data(ttl=600)
+    def simulate(
+        base_risk: float,
+        sensitivity_map: Dict[str, float],
+        n_simulations: int
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        companies, sims = MonteCarloSimulator._draw(base_risk, sensitivity_map, n_simulations)
+        return companies, sims.mean(axis=0), sims.std(axis=0)
+
+    @staticmethod
+    @cache_data(ttl=600, maxsize=MC_DRAW_CACHE_SIZE)
+    def simulate_draws(
+        base_risk: float,
+        sensitivity_map: Dict[str, float],
+        n_simulations: int
+    ) -> Tuple[List[str], np.ndarray]:
+        """Return (companies, draws) keeping the full (n_simulations × companies)
+        climate-loss-rate matrix for tail metrics."""
+        return MonteCarloSimulator._draw(base_risk, sensitivity_map, n_simulations)
+
+    @staticmethod
+    @cache_data(ttl=600)
+    def simulate_streaming(
+        base_risk: float,
+        sensitivity_map: Dict[str, float],
+        n_simulations: int,
+        chunk_size: int = MC_CHUNK_SIZE,
+        confidence: float = 0.95,
+        mean_tol: Optional[float] = None,
+        quantile_tol: Optional[float] = None,
+        seed: int = 2025
+    ) -> StreamingSimulationResult:
+        """Run up to `n_simulations` draws in blocks of `chunk_size` in bounded memory.
+
+        After each block the standard error of the mean and the CI of the
+        `confidence`-quantile are checked; the run stops early once every
+        company is within `mean_tol` / `quantile_tol` (when given).
+        """
+        rng = np.random.default_rng(seed)
+        companies, mu, sigma = MonteCarloSimulator._params(base_risk, sensitivity_map)
+        acc = StreamingAccumulator(len(companies))
+        converged = False
+        while acc.count < n_simulations:
+            size = min(chunk_size, n_simulations - acc.count)
+            block = rng.normal(loc=mu, scale=sigma, size=(size, len(companies)))
+            acc.update(np.clip(block, 0.0, 1.0, out=block))
+            if mean_tol is None and quantile_tol is None:
+                continue
+            converged = MonteCarloSimulator._converged(acc, confidence, mean_tol, quantile_tol)
+            if converged:
+                break
+        return MonteCarloSimulator._summarize(acc, companies, confidence, converged)
+
+    @staticmethod
+    def _converged(
+        acc: StreamingAccumulator, confidence: float, mean_tol: Optional[float], quantile_tol: Optional[float]
+    ) -> bool:
+        ok = True
+        if mean_tol is not None:
+            ok &= bool(np.all(acc.stderr <= mean_tol))
+        if quantile_tol is not None:
+            ci = acc.quantile_ci(confidence)
+            ok &= bool(np.all((ci[1] - ci[0]) / 2 <= quantile_tol))
+        return ok
+
+    @staticmethod
+    def _summarize(
+        acc: StreamingAccumulator, companies: List[str], confidence: float, converged: bool
+    ) -> StreamingSimulationResult:
+        return StreamingSimulationResult(
+            companies=companies,
+            mean=acc.mean.copy(),
+            std=acc.std,
+            stderr=acc.stderr,
+            tail=acc.tail_metrics(confidence),
+            var_ci=acc.quantile_ci(confidence),
+            n_simulations=acc.count,
+            converged=converged,
+            histogram=acc.histogram.copy(),
+            bin_edges=acc.bin_edges
+        )
+
+    @staticmethod
+    @cache_data(ttl=600)
+    def simulate_parallel(
+        base_risk: float,
+        sensitivity_map: Dict[str, float],
+        n_simulations: int,
+        n_workers: Optional[int] = None,
+        seed: int = 2025,
+        chunk_size: int = MC_CHUNK_SIZE,
+        confidence: float = 0.95,
+        use_processes: bool = True
+    ) -> StreamingSimulationResult:
+        """Streaming simulation split across `n_workers` processes (or threads).
+
+        Each worker draws its share from an independent child stream from
+        `SeedSequence(seed).spawn(n_workers)`, and the accumulators are merged
+        in worker order, so results are bit-for-bit reproducible for a given
+        seed and worker count regardless of scheduling.
+        """
+        n_workers = max(1, min(n_workers or os.cpu_count() or 1, n_simulations))
+        companies, mu, sigma = MonteCarloSimulator._params(base_risk, sensitivity_map)
+        children = np.random.SeedSequence(seed).spawn(n_workers)
+        shares = np.full(n_workers, n_simulations // n_workers)
+        shares[: n_simulations % n_workers] += 1
+
+        if n_workers == 1:
+            parts = [_stream_worker(mu, sigma, int(shares[0]), children[0], chunk_size)]
+        else:
+            pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            with pool_cls(max_workers=n_workers) as pool:
+                parts = list(pool.map(
+                    _stream_worker,
+                    [mu] * n_workers, [sigma] * n_workers, [int(n) for n in shares],
+                    children, [chunk_size] * n_workers
+                ))
+
+        acc = StreamingAccumulator(len(companies))
+        for part in parts:
+            acc.merge(part)
+        return MonteCarloSimulator._summarize(acc, companies, confidence, converged=False)
+
+    MC_METHODS = ("plain", "antithetic", "sobol", "halton", "control_variate")
+
+    @staticmethod
+    @cache_data(ttl=600, maxsize=MC_DRAW_CACHE_SIZE)
+    def simulate_variance_reduced(
+        base_risk: float,
+        sensitivity_map: Dict[str, float],
+        n_simulations: int,
+        method: str = "antithetic",
+        seed: int = 2025,
+        replicates: int = 8
+    ) -> VarianceReducedEstimate:
+        """Estimate the C6 mean/std with a variance-reduction strategy.
+
+        - "antithetic": draws come in (z, -z) pairs; the standard error
+          uses the pair averages.
+        - "sobol" / "halton": randomized quasi-Monte Carlo, inverse-normal
+          transform of `replicates` independently scrambled/shifted point
+          sets; the standard error comes from the replicate means.
+        - "control_variate": regresses the clipped draw on the unclipped
+          normal draw, whose mean mu is known exactly.
+        - "plain": i.i.d. draws, for reference.
+        """
+        if method not in MonteCarloSimulator.MC_METHODS:
+            raise ValueError(f"Unknown MC method: {method}")
+        rng = np.random.default_rng(seed)
+        companies, mu, sigma = MonteCarloSimulator._params(base_risk, sensitivity_map)
+        dims = len(companies)
+
+        if method in ("sobol", "halton"):
+            if method == "sobol" and not SCIPY_AVAILABLE:
+                method = "halton"
+            per_rep = int(np.ceil(n_simulations / replicates))
+            sampler = sobol if method == "sobol" else halton
+            z = np.stack([norm_ppf(sampler(per_rep, dims, rng)) for _ in range(replicates)])
+            draws = np.clip(mu + sigma * z, 0.0, 1.0)
+            rep_means = draws.mean(axis=1)
+            draws = draws.reshape(-1, dims)
+            mean = rep_means.mean(axis=0)
+            stderr = rep_means.std(axis=0, ddof=1) / np.sqrt(replicates)
+        elif method == "antithetic":
+            half = int(np.ceil(n_simulations / 2))
+            z = rng.standard_normal((half, dims))
+            pairs = np.clip(mu + sigma * np.stack([z, -z]), 0.0, 1.0)
+            draws = pairs.reshape(-1, dims)
+            pair_means = pairs.mean(axis=0)
+            mean = pair_means.mean(axis=0)
+            stderr = pair_means.std(axis=0, ddof=1) / np.sqrt(half)
+        else:
+            z = rng.standard_normal((n_simulations, dims))
+            raw = mu + sigma * z
+            draws = np.clip(raw, 0.0, 1.0)
+            mean = draws.mean(axis=0)
+            stderr = draws.std(axis=0, ddof=1) / np.sqrt(n_simulations)
+            if method == "control_variate":
+                cov = ((draws - mean) * (raw - raw.mean(axis=0))).mean(axis=0)
+                var_raw = raw.var(axis=0)
+                beta = cov / np.maximum(var_raw, 1e-18)
+                mean = mean - beta * (raw.mean(axis=0) - mu)
+                rho2 = np.clip(cov ** 2 / np.maximum(var_raw * draws.var(axis=0), 1e-18), 0.0, 1.0 - 1e-12)
+                stderr = stderr * np.sqrt(1.0 - rho2)
+
+        n = len(draws)
+        std = draws.std(axis=0)
+        ess = np.where(stderr > 0, std ** 2 / np.maximum(stderr, 1e-300) ** 2, np.inf)
+        return VarianceReducedEstimate(
+            companies=companies, mean=mean, std=std, stderr=stderr,
+            effective_sample_size=ess, n_simulations=n, method=method, draws=draws
+        )
+
+    @staticmethod
+    def analytic_mean(base_risk: float, sensitivity_map: Dict[str, float]) -> np.ndarray:
+        """Exact C6 mean per company (the draws are clipped normals), for validation."""
+        _, mu, sigma = MonteCarloSimulator._params(base_risk, sensitivity_map)
+        return clipped_normal_mean(mu, sigma)
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from core.cache import LRUCache, cache_data
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_cache_data_memoizes_unhashable_arguments_and_returns_copies():
+    calls = []
+
+    @cache_data(maxsize=4)
+    def scaled(values, factors):
+        calls.append(1)
+        return np.asarray(values) * factors["k"]
+
+    first = scaled(np.arange(3), {"k": 2})
+    first[0] = 99
+    second = scaled(np.arange(3), {"k": 2})
+    assert len(calls) == 1
+    assert list(second) == [0, 2, 4]
+    scaled(np.arange(3), {"k": 3})
+    assert len(calls) == 2
+
+
+def test_core_imports_without_streamlit():
+    code = "import sys, core.mcdm; assert 'streamlit' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_fingerprint_is_canonical():
+    from core.cache import fingerprint
+
+    assert fingerprint({"a": 1, "b": 39000}) == fingerprint({"b": 39000.0, "a": np.int64(1)})
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+
+def test_result_cache_disk_tier_survives_a_new_instance(tmp_path):
+    from core.cache import ResultCache
+
+    ResultCache(disk_dir=str(tmp_path)).set("k", {"var": 1.5})
+    fresh = ResultCache(disk_dir=str(tmp_path))
+    assert fresh.get_or_compute("k", lambda: None) == {"var": 1.5}
+    assert fresh.hits == 1
+
+
+def test_result_cache_disk_tier_evicts_least_recently_used(tmp_path):
+    from core.cache import ResultCache
+
+    cache = ResultCache(disk_dir=str(tmp_path))
+    for i in range(5):
+        cache.set(f"k{i}", i)
+        os.utime(cache._path(f"k{i}"), ns=(i, i))
+    assert ResultCache(disk_dir=str(tmp_path)).get("k0") == 0  # refreshes k0
+
+    cache.disk_maxsize = 3
+    assert cache.prune_disk() == 2
+    assert [os.path.exists(cache._path(f"k{i}")) for i in range(5)] == [True, False, False, True, True]
+
+    small = ResultCache(disk_dir=str(tmp_path / "small"), disk_maxsize=2)
+    for i in range(10):
+        small.set(f"s{i}", i)
+    assert sum(len(files) for _, _, files in os.walk(tmp_path / "small")) <= 2
+
+
+def test_analysis_cache_reuses_simulation_when_only_scoring_changes():
+    from core.cache import ResultCache
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    analyzer = MultiPackageAnalyzer(ResultCache())
+    params = AnalysisParams(cargo_value=39_000, use_arima=False, mc_runs=500)
+    first = analyzer.run_analysis(params)
+    first.results.drop(index=first.results.index, inplace=True)  # callers get copies
+
+    again = analyzer.run_analysis(AnalysisParams(cargo_value=39_000.0, use_arima=False, mc_runs=500))
+    assert len(again.results) == 15
+
+    assert analyzer.pipeline.computed == []
+
+    analyzer.run_analysis(AnalysisParams(cargo_value=60_000, use_arima=False, mc_runs=500,
+                                         priority_profile="🛡️ An toàn tối đa"))
+    assert "simulation" not in analyzer.pipeline.computed
+    assert "forecast" not in analyzer.pipeline.computed
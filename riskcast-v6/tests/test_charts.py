@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.cache import ResultCache
+from ui.charts import ChartFactory, FigureCache
+from config.constants import CHART_WEBGL_THRESHOLD
+
+
+def test_figure_cache_rebuilds_only_for_new_results_or_charts():
+    weights = pd.Series([0.6, 0.4], index=["C1: Tỷ lệ phí", "C2: Thời gian xử lý"])
+    calls = []
+
+    def build():
+        calls.append(1)
+        return ChartFactory.create_weights_pie(weights)
+
+    figures = FigureCache(cache=ResultCache())
+    first = figures.figure("result-a", "weights_pie", build)
+    again = figures.figure("result-a", "weights_pie", build)
+    assert len(calls) == 1
+    assert again.to_plotly_json() == first.to_plotly_json()
+
+    figures.figure("result-b", "weights_pie", build)
+    figures.figure("result-a", "weights_pie", build, "option")
+    figures.figure(None, "weights_pie", build)
+    assert len(calls) == 4
+
+
+def _results(n):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "company": rng.choice(["PVI", "Chubb", "MIC"], n),
+        "icc_package": rng.choice(["ICC A", "ICC B", "ICC C"], n),
+        "category": rng.choice(["Tiết kiệm", "An toàn"], n),
+        "estimated_cost": rng.uniform(500, 3000, n),
+        "score": rng.uniform(0, 1, n),
+        "confidence": rng.uniform(0, 1, n),
+    })
+
+
+def test_charts_are_built_from_column_arrays():
+    results = _results(15)
+    category = ChartFactory.create_category_comparison(results)
+    expected = results[results["category"] == "An toàn"]["score"].mean()
+    assert list(category.data[0].y) == pytest.approx([
+        results[results["category"] == "Tiết kiệm"]["score"].mean(), 0.0, expected
+    ])
+
+    radar = ChartFactory.create_confidence_radar(results)
+    assert len(radar.data) == 1 and list(radar.data[0].y) == pytest.approx(results["confidence"].head(5))
+
+    small = ChartFactory.create_cost_benefit_scatter(results)
+    assert [t.type for t in small.data] == ["scatter"] * 3
+    assert sum(len(t.x) for t in small.data) == 15
+
+
+def test_large_scatters_use_webgl():
+    from core.catalogue import CatalogueRanking
+
+    results = _results(CHART_WEBGL_THRESHOLD + 1)
+    fig = ChartFactory.create_cost_benefit_scatter(results)
+    assert {t.type for t in fig.data} == {"scattergl"} and fig.data[0].mode == "markers"
+
+    ranking = CatalogueRanking(results, results["score"].to_numpy(), k=10)
+    catalogue = ChartFactory.create_catalogue_scatter(ranking)
+    assert len(catalogue.data[0].x) == len(results)
+    assert list(catalogue.data[1].text) == list(results["company"].to_numpy()[ranking.top_index])
+
+
+def test_chart_payloads_are_bounded():
+    from core.simulation import StreamingAccumulator
+    from core.models import RiskDistribution
+    from config.constants import CHART_MAX_POINTS
+
+    history = np.random.default_rng(2).uniform(0, 1, 5 * 365)
+    fig = ChartFactory.create_forecast_chart(history, np.array([0.5, 0.6]), lower=np.array([0.4, 0.4]),
+                                             upper=np.array([0.7, 0.8]))
+    assert len(fig.data[0].x) <= CHART_MAX_POINTS
+    assert fig.data[0].y.max() == pytest.approx(history.max())
+
+    acc = StreamingAccumulator(2)
+    acc.update(np.random.default_rng(3).beta(2, 5, (100_000, 2)))
+    counts, edges = StreamingAccumulator.coarsen(acc.histogram, acc.bin_edges, 64)
+    assert counts.shape == (2, 64) and len(edges) == 65 and counts.sum() == 200_000
+    dist = RiskDistribution(["PVI", "MIC"], counts, edges)
+    assert np.sum(dist.density * np.diff(edges), axis=1) == pytest.approx([1.0, 1.0])
+    chart = ChartFactory.create_risk_distribution_chart(dist)
+    assert [len(t.x) for t in chart.data] == [64, 64]
+
+
+def test_score_axes_follow_the_mcdm_method():
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    result = MultiPackageAnalyzer(ResultCache()).run_analysis(
+        AnalysisParams(cargo_value=40_000, use_arima=False, mc_runs=500, mcdm_method="promethee")
+    )
+    scores = result.results["score"]
+    assert scores.min() < 0
+
+    scatter = ChartFactory.create_cost_benefit_scatter(result.results, "promethee")
+    assert scatter.layout.yaxis.range is None and "PROMETHEE II" in scatter.layout.yaxis.title.text
+    bar = ChartFactory.create_top_recommendations_bar(result.results, "promethee")
+    assert bar.layout.xaxis.range is None
+    category = ChartFactory.create_category_comparison(result.results, "promethee")
+    assert category.layout.yaxis.range is None
+
+    topsis = ChartFactory.create_cost_benefit_scatter(result.results)
+    assert tuple(topsis.layout.yaxis.range) == (0, 1) and "TOPSIS" in topsis.layout.yaxis.title.text
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from utils.downsample import downsample_indices, lttb_indices, minmax_indices
+
+
+def _series(n=20_000):
+    rng = np.random.default_rng(1)
+    y = np.sin(np.linspace(0, 20, n)) + rng.normal(0, 0.05, n)
+    y[12_345] = 5.0  # isolated spike
+    return np.arange(n, dtype=float), y
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsampling_is_bounded_and_keeps_extremes(method):
+    x, y = _series()
+    keep = downsample_indices(x, y, 500, method)
+    assert len(keep) <= 500
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 12_345 in keep
+    assert y[keep].min() == pytest.approx(y.min(), abs=0.2)
+
+
+def test_short_series_are_untouched():
+    x, y = np.arange(12.0), np.linspace(0, 1, 12)
+    assert np.array_equal(lttb_indices(x, y, 100), np.arange(12))
+    assert np.array_equal(minmax_indices(y, 100), np.arange(12))
+    with pytest.raises(ValueError):
+        downsample_indices(x, y, 5, "random")
@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+from core.cache import ResultCache
+
+
+def _analysis():
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    params = AnalysisParams(cargo_value=40_000, use_arima=False, mc_runs=500)
+    return MultiPackageAnalyzer(ResultCache()).run_analysis(params), params
+
+
+def test_pdf_accepts_vietnamese_text_and_reads_result_columns():
+    from ui.export import ReportGenerator, _ReportPDF
+
+    pdf = _ReportPDF()
+    pdf.set_font("Arial", size=10)
+    assert pdf.normalize_text("💰 Tiết kiệm — Đà Nẵng") == "Tiet kiem - Da Nang"
+
+    result, params = _analysis()
+    assert ReportGenerator().generate_pdf(result, params).startswith(b"%PDF")
+
+
+def test_reports_are_cached_per_result():
+    from ui.export import ReportService
+
+    result, params = _analysis()
+    service = ReportService(max_workers=1, cache=ResultCache())
+    first = service.get(result, params, "excel")
+    assert service.submit(result, params, "excel").done()
+    assert service.get(result, params, "excel") is first
+    assert service.cache.hits >= 2
+
+
+def test_batch_writes_one_report_per_shipment(tmp_path):
+    from ui.export import ReportService
+
+    manifest = pd.DataFrame({
+        "shipment_id": ["B-2", "A/1", "C-3"],
+        "cargo_value": [20_000, 60_000, 30_000],
+        "route": ["VN - EU", "VN - US", "VN - EU"],
+        "month": [9, 3, 9],
+        "use_arima": False,
+        "mc_runs": 500,
+    })
+    written = ReportService.write_batch(manifest, str(tmp_path), ("pdf", "excel"), n_workers=2,
+                                        chunk_size=1, use_processes=False)
+    assert list(written["shipment_id"]) == ["B-2", "B-2", "A/1", "A/1", "C-3", "C-3"]
+    assert all(os.path.getsize(p) > 0 for p in written["path"])
+    assert os.path.basename(written["path"][2]) == "RISKCAST_A_1.pdf"
+
+
+def test_batch_rejects_shipment_ids_sharing_a_file_name(tmp_path):
+    from ui.export import ReportService
+
+    manifest = pd.DataFrame({"shipment_id": ["A/1", "A_1"], "cargo_value": [20_000, 60_000], "use_arima": False})
+    with pytest.raises(ValueError, match="Duplicate shipment_id"):
+        ReportService.write_batch(manifest, str(tmp_path), use_processes=False)
+    assert not os.listdir(tmp_path)
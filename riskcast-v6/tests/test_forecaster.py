@@ -0,0 +1,73 @@
+import numpy as np
+
+from core.data import DataService
+from core.forecaster import Forecaster, ForecastService
+
+
+def test_forecast_service_matches_refit_and_reuses_models():
+    historical = DataService.load_historical_data()
+    service = ForecastService()
+    assert service.warm(historical, ["VN - EU", "Domestic"], [8, 9], max_workers=1) == 4
+
+    for route in ("VN - EU", "Domestic"):
+        hist, expected = Forecaster.forecast(historical, route, 9)
+        served_hist, served = service.forecast(historical, route, 9)
+        assert np.array_equal(hist, served_hist)
+        assert np.allclose(served, expected, atol=1e-6)
+    assert service.warm(historical, ["VN - EU"], [9]) == 0
+
+
+def test_forecast_service_extends_fit_only_when_history_grows():
+    historical = DataService.load_historical_data()
+    service = ForecastService()
+    service.forecast(historical.iloc[:9], "VN - US", 9)
+    _, extended = service.forecast(historical.iloc[:10], "VN - US", 10)
+
+    assert len(service.params) == 1  # the new month reused the month-9 parameters
+    _, refit = Forecaster.forecast(historical, "VN - US", 10)
+    assert abs(extended[0] - refit[0]) < 0.05
+
+
+def test_forecast_does_not_depend_on_months_analysed_before():
+    historical = DataService.load_historical_data()
+    _, fresh = ForecastService().forecast(historical, "VN - EU", 9)
+
+    service = ForecastService()
+    for month in (6, 7, 8):
+        service.forecast(historical, "VN - EU", month)
+    _, after = service.forecast(historical, "VN - EU", 9)
+    assert after[0] == fresh[0]
+
+
+def test_forecast_horizon_intervals_widen_and_stay_in_range():
+    historical = DataService.load_historical_data()
+    for method in Forecaster.FORECAST_METHODS:
+        path = Forecaster.forecast_horizon(historical, 9, 4, method)
+        assert path.point.shape == (len(path.routes), 4)
+        assert np.all((path.lower <= path.point) & (path.point <= path.upper))
+        assert np.all((path.lower >= 0) & (path.upper <= 1))
+    # unclipped Holt intervals grow with the horizon
+    _, var = Forecaster._holt(historical[path.routes].values[:9], 4)
+    assert np.all(np.diff(var, axis=1) >= 0)
+
+
+def test_forecast_horizon_arima_matches_one_step_forecast():
+    historical = DataService.load_historical_data()
+    path = Forecaster.forecast_horizon(historical, 9, 3, "arima", routes=["VN - EU"])
+    _, one_step = ForecastService.shared().forecast(historical, "VN - EU", 9)
+    assert abs(path.point[0, 0] - one_step[0]) < 1e-6
+
+
+def test_forecast_horizon_falls_back_to_holt_when_arima_forecast_fails(monkeypatch):
+    class Broken:
+        def get_forecast(self, horizon):
+            raise np.linalg.LinAlgError("singular")
+
+    historical = DataService.load_historical_data()
+    service = ForecastService()
+    monkeypatch.setattr(service, "_model", lambda route, train, history=None: Broken())
+    routes = ["VN - EU"]
+    Y = historical[routes].values[:9].astype(float)
+    point, lower, upper = service.forecast_horizon(Y, routes, 3, 0.95)
+    holt = Forecaster.forecast_horizon(historical, 9, 3, "holt", routes=routes)
+    np.testing.assert_allclose(point, holt.point)
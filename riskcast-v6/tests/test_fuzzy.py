@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from core.mcdm import FuzzyTOPSISAnalyzer
+from utils.fuzzy import TFN, build_fuzzy_table, most_uncertain_criterion
+
+
+def test_tfn_arithmetic_and_defuzzification():
+    a = TFN([1.0, 2.0], [2.0, 3.0], [3.0, 5.0])
+    b = TFN.crisp(2.0)
+    assert np.allclose((a + b).mid, [4.0, 5.0])
+    assert np.allclose((a - a).low, [-2.0, -3.0])
+    assert np.allclose((a * b).high, [6.0, 10.0])
+    assert np.allclose((a / b).centroid(), a.centroid() / 2)
+    assert np.allclose(a.distance(a), 0.0)
+    assert np.allclose(TFN.crisp(0.0).distance(TFN.crisp(3.0)), 3.0)
+
+    norm = TFN([[1.0, 2.0], [2.0, 4.0]], [[2.0, 3.0], [3.0, 5.0]], [[4.0, 4.0], [5.0, 6.0]]).normalize([False, True])
+    assert np.isclose(norm.high[:, 0].max(), 1.0)          # benefit: divided by max high
+    assert np.isclose(norm.high[0, 1], 1.0)                # cost: min low / low
+
+
+def test_fuzzy_table_and_uncertainty_ranking():
+    weights = pd.Series([0.5, 0.3, 0.2], index=["C1", "C2", "C3"])
+    table = build_fuzzy_table(weights, 100)
+    assert table["Low"].tolist() == [0.0, 0.0, 0.0] and table["High"].tolist() == [1.0, 0.6, 0.4]
+    crit, spreads = most_uncertain_criterion(weights, 10)
+    assert crit == "C1" and np.isclose(spreads["C3"], 0.04)
+
+
+def test_fuzzy_topsis_ranks_dominant_option_first_and_batches_weights():
+    M = np.array([[0.2, 9.0], [0.4, 5.0], [0.3, 7.0]])   # cost, benefit
+    decision = TFN(M * 0.9, M, M * 1.1)
+    is_cost = np.array([True, False])
+    scores = FuzzyTOPSISAnalyzer.closeness(decision, TFN.from_spread([0.5, 0.5], 0.1), is_cost)
+    assert scores.argmax() == 0 and scores.argmin() == 1
+
+    W = np.array([[0.9, 0.1], [0.1, 0.9], [0.5, 0.5]])
+    batched = FuzzyTOPSISAnalyzer.closeness(decision, TFN.from_spread(W, 0.1), is_cost)
+    assert batched.shape == (3, 3)
+    for k in range(3):
+        assert np.allclose(batched[k], FuzzyTOPSISAnalyzer.closeness(decision, TFN.from_spread(W[k], 0.1), is_cost))
@@ -0,0 +1,256 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.mcdm import OptionMatrixBuilder
+from config.constants import CRITERIA, ICC_PACKAGES
+
+
+def _company_data():
+    return pd.DataFrame(
+        {
+            "C1: Tỷ lệ phí": [0.42, 0.36],
+            "C2: Thời gian xử lý": [12, 10],
+            "C3: Tỷ lệ tổn thất": [0.07, 0.09],
+            "C4: Hỗ trợ ICC": [9, 8],
+            "C5: Chăm sóc KH": [9, 8],
+        },
+        index=pd.Index(["Chubb", "PVI"], name="Company"),
+    )
+
+
+def test_option_matrix_matches_row_by_row_construction():
+    company_data = _company_data()
+    c6_mean = np.array([0.7, 0.8])
+    c6_std = np.array([0.08, 0.09])
+    options = OptionMatrixBuilder.build(company_data, ICC_PACKAGES, 10_000, c6_mean, c6_std)
+
+    assert list(options.columns) == [
+        "company", "icc_package", "coverage", "premium_rate", "estimated_cost", *CRITERIA, "C6_std"
+    ]
+    assert len(options) == len(company_data) * len(ICC_PACKAGES)
+
+    for i, company in enumerate(company_data.index):
+        for j, (icc_name, icc) in enumerate(ICC_PACKAGES.items()):
+            row = options.iloc[i * len(ICC_PACKAGES) + j]
+            premium = company_data.loc[company, "C1: Tỷ lệ phí"] * icc["premium_multiplier"]
+            assert row["company"] == company and row["icc_package"] == icc_name
+            assert np.isclose(row["premium_rate"], premium)
+            assert np.isclose(row["estimated_cost"], 10_000 * premium)
+            assert np.isclose(row["C4: Hỗ trợ ICC"], company_data.loc[company, "C4: Hỗ trợ ICC"] * icc["coverage"])
+            assert np.isclose(row["C6: Rủi ro khí hậu"], c6_mean[i])
+            assert np.isclose(row["C6_std"], c6_std[i])
+
+
+def _reference_topsis(M, w, is_cost):
+    R = M / np.sqrt((M ** 2).sum(axis=0))
+    V = R * w
+    best = np.where(is_cost, V.min(axis=0), V.max(axis=0))
+    worst = np.where(is_cost, V.max(axis=0), V.min(axis=0))
+    d_plus = np.sqrt(((V - best) ** 2).sum(axis=1))
+    d_minus = np.sqrt(((V - worst) ** 2).sum(axis=1))
+    return d_minus / (d_plus + d_minus + 1e-12)
+
+
+def test_topsis_batch_matches_per_vector_scores():
+    from core.mcdm import TOPSISAnalyzer
+    from config.constants import COST_BENEFIT_MAP, PRIORITY_PROFILES
+
+    cost_benefit = {k: v.value for k, v in COST_BENEFIT_MAP.items()}
+    is_cost = np.array([cost_benefit[c] == "cost" for c in CRITERIA])
+    rng = np.random.default_rng(0)
+    M = rng.uniform(0.1, 1.0, size=(15, len(CRITERIA)))
+    data = pd.DataFrame(M, columns=CRITERIA)
+    profiles = pd.DataFrame(PRIORITY_PROFILES).T[CRITERIA]
+
+    scores = TOPSISAnalyzer.analyze_batch(data, profiles, cost_benefit)
+    assert scores.shape == (len(PRIORITY_PROFILES), 15)
+    for k, w in enumerate(profiles.values):
+        assert np.allclose(scores[k], _reference_topsis(M, w, is_cost))
+    assert np.allclose(TOPSISAnalyzer.analyze(data, profiles.iloc[0], cost_benefit), scores[0])
+
+    stack = rng.uniform(0.1, 1.0, size=(4, 15, len(CRITERIA)))
+    w = profiles.values[1]
+    stacked = TOPSISAnalyzer.analyze_batch(stack, w, cost_benefit, criteria=CRITERIA)
+    for k in range(len(stack)):
+        assert np.allclose(stacked[k], _reference_topsis(stack[k], w, is_cost))
+
+
+def test_run_batch_matches_single_analysis():
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    shipments = [
+        AnalysisParams(cargo_value=20_000, route="VN - EU", month=9, use_arima=False, mc_runs=500),
+        AnalysisParams(cargo_value=80_000, route="VN - EU", month=9, use_arima=False, mc_runs=500),
+        AnalysisParams(cargo_value=30_000, route="Domestic", month=2, use_arima=False, mc_runs=500,
+                       priority_profile="🛡️ An toàn tối đa"),
+    ]
+    analyzer = MultiPackageAnalyzer()
+    batch = analyzer.run_batch(shipments)
+
+    assert list(batch["shipment_id"].unique()) == [0, 1, 2]
+    for i, params in enumerate(shipments):
+        single = analyzer.run_analysis(params)
+        rows = batch[batch["shipment_id"] == i].reset_index(drop=True)
+        pd.testing.assert_frame_equal(rows[single.results.columns], single.results, check_dtype=False)
+        assert np.isclose(rows["var"].iloc[0], single.var)
+        assert np.isclose(rows["forecast_risk"].iloc[0], single.forecast[0])
+
+    top = analyzer.run_batch(pd.DataFrame({"cargo_value": [10_000, 60_000], "use_arima": False}), top_n=3)
+    assert len(top) == 6 and list(top["rank"]) == [1, 2, 3, 1, 2, 3]
+
+
+def test_departure_offset_uses_forecast_base_risk():
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    analyzer = MultiPackageAnalyzer()
+    params = AnalysisParams(
+        cargo_value=39_000, route="VN - EU", month=6, use_arima=False,
+        use_mc=False, forecast_horizon=3, departure_offset=2
+    )
+    result = analyzer.run_analysis(params)
+    assert len(result.forecast) == len(result.forecast_lower) == 3
+
+    batch = analyzer.run_batch([params])
+    assert list(batch["company"]) == list(result.results["company"])
+    assert np.allclose(batch["C6: Rủi ro khí hậu"], result.results["C6: Rủi ro khí hậu"])
+
+
+@pytest.mark.parametrize("use_arima", [False, True])
+def test_first_forecast_step_does_not_depend_on_the_horizon(use_arima):
+    from core.cache import ResultCache
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    analyzer = MultiPackageAnalyzer(ResultCache())
+    results = [
+        analyzer.run_analysis(AnalysisParams(cargo_value=39_000, month=3, use_arima=use_arima,
+                                             use_mc=False, forecast_horizon=h))
+        for h in (1, 2)
+    ]
+    one, two = results
+    assert one.forecast[0] == pytest.approx(two.forecast[0])
+    assert one.forecast_lower[0] <= one.forecast[0] <= one.forecast_upper[0]
+    assert one.forecast_lower[0] == pytest.approx(two.forecast_lower[0])
+
+    batch = analyzer.run_batch([AnalysisParams(cargo_value=39_000, month=3, use_arima=use_arima, use_mc=False)])
+    assert batch["forecast_risk"].iloc[0] == pytest.approx(one.forecast[0])
+
+
+def test_registered_methods_share_the_batched_interface():
+    from core.mcdm import MCDM_METHODS, get_method
+
+    rng = np.random.default_rng(3)
+    M = rng.uniform(1, 10, size=(8, 4))
+    M[0] = [1, 10, 10, 1]                      # dominant for costs at 0 and 3
+    is_cost = np.array([True, False, False, True])
+    W = rng.dirichlet(np.ones(4), size=5)
+    for name in MCDM_METHODS:
+        scores = get_method(name).score(M, W, is_cost)
+        assert scores.shape == (5, 8)
+        assert (scores.argmax(axis=1) == 0).all(), name
+
+
+def test_promethee_flows_match_pairwise_definition():
+    from core.mcdm import PROMETHEEMethod
+
+    rng = np.random.default_rng(4)
+    M = rng.random((30, 3))
+    is_cost = np.array([False, True, False])
+    w = np.array([0.5, 0.3, 0.2])
+    X = np.where(is_cost, -M, M)
+    span = X.max(axis=0) - X.min(axis=0)
+    pi = np.zeros((30, 30))
+    for i in range(30):
+        for j in range(30):
+            pi[i, j] = (w * np.clip((X[i] - X[j]) / span, 0, 1)).sum()
+    expected = (pi.sum(axis=1) - pi.sum(axis=0)) / 29
+
+    PROMETHEEMethod.max_block_elements, saved = 100, PROMETHEEMethod.max_block_elements
+    try:
+        assert np.allclose(PROMETHEEMethod.score(M, w, is_cost)[0], expected)
+    finally:
+        PROMETHEEMethod.max_block_elements = saved
+
+
+def test_analysis_and_batch_agree_for_other_methods():
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    analyzer = MultiPackageAnalyzer()
+    params = AnalysisParams(cargo_value=39_000, use_arima=False, mc_runs=500, mcdm_method="vikor")
+    result = analyzer.run_analysis(params)
+    batch = analyzer.run_batch([params])
+    assert list(batch["company"] + batch["icc_package"]) == list(result.results["company"] + result.results["icc_package"])
+    assert set(result.consensus.columns) >= {"topsis", "vikor", "promethee", "borda", "copeland"}
+
+
+def test_catalogue_ranking_materializes_top_k_and_pages_lazily():
+    from core.catalogue import CatalogueRanking
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    rng = np.random.default_rng(5)
+    n = 5_000
+    catalogue = {"company": np.arange(n).astype(str)}
+    for c in CRITERIA:
+        catalogue[c] = rng.uniform(0.1, 10, n)
+
+    ranking = MultiPackageAnalyzer().rank_catalogue(catalogue, AnalysisParams(cargo_value=80_000), k=10)
+    expected = np.lexsort((np.arange(n), -ranking.scores))
+    top = ranking.top()
+    assert len(top) == 10 and ranking._order is None          # no full sort yet
+    assert np.array_equal(top["catalogue_index"], expected[:10])
+    page = ranking.rows(40, 45)
+    assert np.array_equal(page["catalogue_index"], expected[40:45]) and list(page["rank"]) == [41, 42, 43, 44, 45]
+
+    tied = CatalogueRanking({"id": np.arange(4)}, np.array([1.0, 2.0, 2.0, 0.5]), k=2)
+    assert list(tied.top()["id"]) == [1, 2]
+
+
+def test_catalogue_top_k_breaks_ties_at_the_cut_by_catalogue_order():
+    from core.catalogue import CatalogueRanking
+
+    rng = np.random.default_rng(11)
+    scores = rng.choice([0.2, 0.5, 0.8], size=1_000)  # many duplicates around every cut
+    for k in (1, 7, 100, 333, 999):
+        ranking = CatalogueRanking({"id": np.arange(len(scores))}, scores, k=k)
+        assert np.array_equal(ranking.top_index, ranking.order[:k])
+
+
+def test_catalogue_mode_rejects_pairwise_methods():
+    from core.catalogue import CATALOGUE_METHODS
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    assert set(CATALOGUE_METHODS) == {"topsis", "wsm", "wpm", "vikor"}
+    catalogue = {c: np.linspace(1, 2, 50) for c in CRITERIA}
+    analyzer = MultiPackageAnalyzer()
+    for method in ("promethee", "borda", "copeland"):
+        with pytest.raises(ValueError, match="catalogue"):
+            analyzer.rank_catalogue(catalogue, AnalysisParams(cargo_value=1_000, mcdm_method=method))
+    for method in CATALOGUE_METHODS:
+        ranking = analyzer.rank_catalogue(catalogue, AnalysisParams(cargo_value=1_000, mcdm_method=method), k=5)
+        assert len(ranking.top()) == 5
+
+
+@pytest.mark.parametrize("mc_method", ["plain", "antithetic"])
+def test_mc_distribution_labels_follow_company_data_order(mc_method):
+    from core.cache import ResultCache
+    from core.data import DataService
+    from core.mcdm import MultiPackageAnalyzer
+
+    analyzer = MultiPackageAnalyzer(ResultCache())
+    company_data = DataService.get_company_data()
+    runs = {}
+    for data in (company_data, company_data.iloc[::-1]):
+        mean, _, _, dist = analyzer._simulate_c6(0.6, True, 2_000, data, mc_method=mc_method)
+        assert dist.companies == list(data.index)
+        runs[tuple(data.index)] = (dict(zip(data.index, mean)), dict(zip(dist.companies, dist.counts)))
+
+    (mean_a, counts_a), (mean_b, counts_b) = runs.values()
+    for company in company_data.index:
+        assert mean_a[company] == pytest.approx(mean_b[company])
+        np.testing.assert_array_equal(counts_a[company], counts_b[company])
@@ -0,0 +1,44 @@
+import copy
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from core.models import AnalysisParams, AnalysisResult, RankingTable
+
+
+def _frame():
+    return pd.DataFrame({
+        "company": ["PVI", "Chubb", "PVI"],
+        "icc_package": ["ICC C", "ICC C", "ICC A"],
+        "C1: Tỷ lệ phí": [0.36, 0.42, 0.396],
+        "C6: Rủi ro khí hậu": [0.71, 0.64, 0.71],
+        "score": [0.9, 0.8, 0.1],
+        "rank": [1, 2, 3],
+    })
+
+
+def test_ranking_table_round_trips_and_is_compact():
+    frame = _frame()
+    table = RankingTable(frame)
+    assert table.criteria == ("C1: Tỷ lệ phí", "C6: Rủi ro khí hậu")
+    assert table.matrix.dtype == np.float64 and table.codes["company"].dtype == np.int8
+    pd.testing.assert_frame_equal(table.to_frame(), frame, check_exact=True)
+    assert table.nbytes < frame.memory_usage(deep=True).sum()
+
+
+def test_analysis_result_builds_views_lazily_and_survives_copies():
+    result = AnalysisResult(results=_frame(), weights=pd.Series({"C1": 1.0}), var=1.0)
+    view = result.results
+    assert result.data_adjusted is view                 # reused while a caller holds it
+    assert not hasattr(result, "__dict__")
+
+    for clone in (copy.deepcopy(result), pickle.loads(pickle.dumps(result))):
+        assert clone.var == 1.0
+        pd.testing.assert_frame_equal(clone.results, view)
+
+
+def test_analysis_params_keep_their_positional_order():
+    params = AnalysisParams(40_000, "", "VN - US", "Sea", 3, "💰 Tiết kiệm chi phí",
+                            True, False, True, True, 500, 25.0)
+    assert params.fuzzy_uncertainty == 25.0 and params.mc_workers == 1
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from core.cache import ResultCache
+from core.pipeline import Pipeline, Stage
+
+
+def _pipeline():
+    return Pipeline([
+        Stage("parity", ("n",), lambda n: n % 2, key_by_value=True),
+        Stage("label", ("parity", "prefix"), lambda p, prefix: f"{prefix}{'odd' if p else 'even'}"),
+        Stage("shout", ("label",), str.upper),
+    ], ResultCache())
+
+
+def test_only_invalidated_stages_recompute():
+    pipeline = _pipeline()
+    assert pipeline.run("shout", {"n": 3, "prefix": "x-"}) == "X-ODD"
+    assert pipeline.computed == ["parity", "label", "shout"]
+
+    # same parity: the value-keyed stage stops the invalidation
+    assert pipeline.run("shout", {"n": 5, "prefix": "x-"}) == "X-ODD"
+    assert pipeline.computed == ["parity"]
+
+    assert pipeline.run("shout", {"n": 5, "prefix": "y-"}) == "Y-ODD"
+    assert pipeline.computed == ["label", "shout"]
+
+
+def test_concurrent_runs_report_their_own_stages():
+    barrier = threading.Barrier(2)
+
+    def slow(n):
+        barrier.wait(timeout=5)  # both runs are in flight at once
+        return n
+
+    pipeline = Pipeline([Stage("slow", ("n",), slow), Stage("double", ("slow",), lambda v: 2 * v)], ResultCache())
+    seen = {}
+
+    def run(n):
+        assert pipeline.run("double", {"n": n}) == 2 * n
+        seen[n] = pipeline.computed
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {1: ["slow", "double"], 2: ["slow", "double"]}
+
+
+def test_missing_input_and_cycles_are_reported():
+    with pytest.raises(KeyError):
+        _pipeline().run("shout", {"n": 1})
+    cyclic = Pipeline([Stage("a", ("b",), int), Stage("b", ("a",), int)])
+    with pytest.raises(ValueError):
+        cyclic.run("a", {})
+
+
+def test_cargo_value_change_only_rescales_costs():
+    from core.mcdm import MultiPackageAnalyzer
+    from core.models import AnalysisParams
+
+    analyzer = MultiPackageAnalyzer(ResultCache())
+    small = analyzer.run_analysis(AnalysisParams(cargo_value=20_000, use_arima=False, mc_runs=500))
+    larger = analyzer.run_analysis(AnalysisParams(cargo_value=40_000, use_arima=False, mc_runs=500))
+    assert analyzer.pipeline.computed == ["result"]
+    assert (larger.results["estimated_cost"] == 2 * small.results["estimated_cost"]).all()
+    assert small.fingerprint and small.fingerprint != larger.fingerprint
@@ -0,0 +1,22 @@
+import numpy as np
+
+from core.risk import RiskCalculator
+
+
+def test_tail_metrics_match_sorted_reference():
+    rng = np.random.default_rng(7)
+    losses = rng.lognormal(size=(10_001, 4))
+    weights = np.array([0.1, 0.2, 0.3, 0.4])
+    tail = RiskCalculator.tail_metrics(losses, confidence=0.95, weights=weights)
+
+    def reference(x):
+        ordered = np.sort(x)
+        k = int(np.ceil(0.95 * len(x))) - 1
+        return ordered[k], ordered[k:].mean()
+
+    for j in range(losses.shape[1]):
+        var, cvar = reference(losses[:, j])
+        assert np.isclose(tail.var[j], var) and np.isclose(tail.cvar[j], cvar)
+    var, cvar = reference(losses @ weights)
+    assert np.isclose(tail.portfolio_var, var) and np.isclose(tail.portfolio_cvar, cvar)
+    assert np.all(tail.cvar >= tail.var)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from core.data import DataService
+from core.risk_index import BaseRiskIndex
+
+
+def test_month_index_matches_table_and_defaults_unknown_labels():
+    historical = DataService.load_historical_data()
+    index = DataService.risk_index()
+    assert DataService.risk_index() is index  # built once per data version
+
+    expected = historical.loc[historical["month"] == 9, "VN - US"].iloc[0]
+    assert index.lookup("VN - US", 9) == expected
+    assert index.lookup("VN - US", 13) == index.lookup("Mars", 9) == 0.4
+
+    looked_up = index.lookup_many(["VN - EU", "Domestic", "Mars", "VN - EU"], [1, 12, 5, 14])
+    assert np.allclose(looked_up, [
+        historical.loc[0, "VN - EU"], historical.loc[11, "Domestic"], 0.4, 0.4
+    ])
+
+
+def test_daily_history_supports_finer_and_coarser_periods():
+    dates = pd.date_range("2023-12-25", "2024-01-14", freq="D")
+    daily = pd.DataFrame({"date": dates, "VN - EU": np.linspace(0.1, 0.3, len(dates))})
+
+    by_day = BaseRiskIndex.from_frame(daily, "day")
+    assert by_day.lookup("VN - EU", dates[3].date()) == daily["VN - EU"][3]
+
+    by_week = BaseRiskIndex.from_frame(daily, "week")
+    assert by_week.lookup("VN - EU", (2024, 1)) == daily["VN - EU"][7:14].mean()
+
+    by_month = BaseRiskIndex.from_frame(daily, "year_month")
+    assert np.allclose(
+        by_month.lookup_many(["VN - EU", "VN - EU"], [(2023, 12), (2024, 1)]),
+        [daily["VN - EU"][:7].mean(), daily["VN - EU"][7:].mean()]
+    )
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.mcdm import MultiPackageAnalyzer
+from core.models import AnalysisParams
+from core.sensitivity import WeightRobustnessAnalyzer, WeightSensitivityAnalyzer
+from config.constants import COST_BENEFIT_MAP, CRITERIA, PRIORITY_PROFILES
+
+PROFILE = "⚖️ Cân bằng"
+
+
+def _ranked_options():
+    result = MultiPackageAnalyzer().run_analysis(
+        AnalysisParams(cargo_value=39_000, use_arima=False, mc_runs=500, priority_profile=PROFILE)
+    )
+    return result, pd.Series(PRIORITY_PROFILES[PROFILE], index=CRITERIA)
+
+
+def test_sampled_weights_stay_in_their_triangles():
+    weights = pd.Series(PRIORITY_PROFILES[PROFILE], index=CRITERIA)
+    raw = WeightRobustnessAnalyzer.sample_weights(weights, 20, n_samples=5_000)
+    assert np.allclose(raw.sum(axis=1), 1.0)
+    assert np.allclose(raw.mean(axis=0), weights / weights.sum(), atol=0.01)
+    fixed = WeightRobustnessAnalyzer.sample_weights(weights, 0, n_samples=10)
+    assert np.allclose(fixed, weights / weights.sum())
+
+
+def test_rank_probabilities_are_distributions_and_match_crisp_ranking():
+    result, weights = _ranked_options()
+    crisp = WeightRobustnessAnalyzer.analyze(result.results, weights, 0, n_samples=50)
+    assert np.allclose(crisp.rank_probabilities, np.eye(len(result.results)))
+
+    start = time.perf_counter()
+    fuzzy = WeightRobustnessAnalyzer.analyze(result.results, weights, 25, n_samples=10_000)
+    assert time.perf_counter() - start < 1.0
+    assert np.allclose(fuzzy.rank_probabilities.sum(axis=0), 1.0)
+    assert np.allclose(fuzzy.rank_probabilities.sum(axis=1), 1.0)
+    assert result.robustness is not None and len(result.robustness.top1) == len(result.results)
+
+
+def test_rank_reversal_thresholds_bracket_the_change_of_top_option():
+    from core.mcdm import TOPSISAnalyzer
+
+    result, _ = _ranked_options()
+    table = result.sensitivity
+    assert list(table["criterion"]) == list(result.weights.index)
+    assert table[["increase", "decrease"]].notna().any(axis=1).any()
+    smaller = table[["increase", "decrease"]].min(axis=1)
+    np.testing.assert_allclose(table["critical_change"], smaller / table["weight"])
+
+    cost_benefit = {k: v.value for k, v in COST_BENEFIT_MAP.items()}
+    w = result.weights.values / result.weights.sum()
+    X = result.results[list(result.weights.index)]
+    for j, row in table.iterrows():
+        for col, sign in (("increase", 1.0), ("decrease", -1.0)):
+            if np.isnan(row[col]):
+                continue
+            deltas = sign * np.array([row[col] - 1e-3, row[col]])
+            W = WeightSensitivityAnalyzer.perturb(w, np.array([j, j]), deltas)
+            tops = TOPSISAnalyzer.analyze_batch(X, W, cost_benefit).argmax(axis=1)
+            assert tops[0] == 0 and tops[1] != 0
@@ -0,0 +1,77 @@
+import numpy as np
+
+from core.risk import RiskCalculator
+from core.simulation import MonteCarloSimulator
+from config.constants import SENSITIVITY_MAP
+
+
+def test_streaming_matches_in_memory_draws():
+    companies, draws = MonteCarloSimulator.simulate_draws(0.6, SENSITIVITY_MAP, 50_000)
+    run = MonteCarloSimulator.simulate_streaming(0.6, SENSITIVITY_MAP, 50_000, chunk_size=7_000)
+
+    assert run.companies == companies and run.n_simulations == 50_000
+    assert np.allclose(run.mean, draws.mean(axis=0))
+    assert np.allclose(run.std, draws.std(axis=0))
+    exact = RiskCalculator.tail_metrics(draws)
+    bin_width = 1.0 / run.histogram.shape[1]
+    assert np.all(np.abs(run.tail.var - exact.var) <= bin_width)
+    assert np.all(np.abs(run.tail.cvar - exact.cvar) <= bin_width)
+    assert np.all((run.var_ci[0] <= run.tail.var) & (run.tail.var <= run.var_ci[1]))
+
+
+def test_streaming_stops_early_once_converged():
+    run = MonteCarloSimulator.simulate_streaming(
+        0.6, SENSITIVITY_MAP, 5_000_000, chunk_size=20_000, mean_tol=1e-3, quantile_tol=5e-3
+    )
+    assert run.converged
+    assert run.n_simulations < 5_000_000
+    assert np.all(run.stderr <= 1e-3)
+
+
+def test_parallel_runs_are_reproducible_per_seed_and_worker_count():
+    kwargs = dict(n_simulations=40_001, n_workers=3, seed=11, chunk_size=5_000)
+    threads = MonteCarloSimulator.simulate_parallel(0.5, SENSITIVITY_MAP, use_processes=False, **kwargs)
+    processes = MonteCarloSimulator.simulate_parallel(0.5, SENSITIVITY_MAP, use_processes=True, **kwargs)
+
+    assert threads.n_simulations == 40_001
+    assert np.array_equal(threads.mean, processes.mean)
+    assert np.array_equal(threads.histogram, processes.histogram)
+    assert np.array_equal(threads.tail.var, processes.tail.var)
+
+    other_seed = MonteCarloSimulator.simulate_parallel(0.5, SENSITIVITY_MAP, use_processes=False, **{**kwargs, "seed": 12})
+    assert not np.array_equal(threads.mean, other_seed.mean)
+
+
+def test_variance_reduction_beats_plain_draws():
+    exact = MonteCarloSimulator.analytic_mean(0.75, SENSITIVITY_MAP)
+    plain = MonteCarloSimulator.simulate_variance_reduced(0.75, SENSITIVITY_MAP, 4_000, method="plain")
+    for method in ("antithetic", "sobol", "halton", "control_variate"):
+        est = MonteCarloSimulator.simulate_variance_reduced(0.75, SENSITIVITY_MAP, 4_000, method=method)
+        assert np.all(est.effective_sample_size > 5 * plain.effective_sample_size), method
+        assert np.all(np.abs(est.mean - exact) < 4 * est.stderr + 1e-6), method
+        assert est.draws.shape[1] == len(SENSITIVITY_MAP)
+
+
+def test_correlated_simulation_widens_portfolio_tail():
+    import pandas as pd
+    from core.data import DataService
+    from core.portfolio import CorrelatedRiskSimulator
+
+    historical = DataService.load_historical_data()
+    correlated = CorrelatedRiskSimulator(historical, carrier_corr=0.6)
+    rates = correlated.simulate(month=9, n_simulations=50_000)
+    assert rates.shape == (50_000, len(correlated.routes), len(SENSITIVITY_MAP))
+    flat = rates.reshape(len(rates), -1)
+    assert np.corrcoef(flat[:, 0], flat[:, 1])[0, 1] > 0.5
+
+    manifest = pd.DataFrame({
+        "route": ["VN - EU", "VN - US", "VN - China", "Domestic"] * 5,
+        "month": [7, 8, 9, 10] * 5,
+        "company": list(SENSITIVITY_MAP) * 4,
+        "cargo_value": 50_000.0,
+    })
+    independent = CorrelatedRiskSimulator(historical, carrier_corr=None, route_corr=np.eye(len(correlated.routes)))
+    corr_risk = correlated.portfolio_risk(manifest, n_simulations=40_000)
+    ind_risk = independent.portfolio_risk(manifest, n_simulations=40_000)
+    assert corr_risk.portfolio_var > ind_risk.portfolio_var
+    assert corr_risk.portfolio_cvar >= corr_risk.portfolio_var
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.data import DataService
+from core.store import ColumnarStore
+
+
+def test_store_round_trips_the_csv_inputs(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    for name in DataService.TABLES:
+        source = DataService.source(name)
+        loaded = store.load(name, source)
+        pd.testing.assert_frame_equal(loaded.copy(), pd.read_csv(source))
+        assert isinstance(store.arrays(name, source)[loaded.columns[1]], np.memmap)
+
+
+def _memmap_backed(values):
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = getattr(values, "base", None)
+    return False
+
+
+def test_loaded_frames_are_not_copied_out_of_the_store():
+    historical = DataService.load_historical_data()
+    for col in historical.select_dtypes("number").columns:
+        assert _memmap_backed(historical[col].to_numpy())
+
+
+def test_store_detects_changes_by_mtime_then_hash(tmp_path):
+    source = tmp_path / "rates.csv"
+    source.write_text("route,risk\nA,0.1\nB,0.2\n")
+    store = ColumnarStore(str(tmp_path / "store"))
+    version = store.version("rates", str(source))
+
+    # touched but identical: same version, no rebuild
+    built = store.schema("rates")["dir"]
+    os.utime(source, ns=(0, 1_000_000_000))
+    assert store.version("rates", str(source)) == version
+    assert store.schema("rates")["dir"] == built
+
+    # changed: rebuilt into a new directory, the old one is removed
+    source.write_text("route,risk\nA,0.1\nB,0.3\n")
+    assert store.version("rates", str(source)) != version
+    assert store.load("rates", str(source))["risk"].tolist() == [0.1, 0.3]
+    assert store.schema("rates")["dir"] != built
+    assert not (tmp_path / "store" / built).exists()
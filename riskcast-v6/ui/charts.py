@@ -1,12 +1,54 @@
 # ui/charts.py
+import json
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Any, Callable, Dict, Optional
+from core.cache import ResultCache, fingerprint
+from core.mcdm import get_method
+from config.constants import CHART_MAX_POINTS, CHART_MAX_SCATTER_POINTS, CHART_WEBGL_THRESHOLD
+from utils.downsample import downsample_indices
+
+
+class FigureCache:
+    """Serialized figures keyed by result fingerprint and chart type.
+
+    Stores the figure JSON (the payload sent to the browser). A hit is
+    restored without Plotly's property validation, which together with
+    building the traces is where most of the rendering time goes; the
+    JSON was validated when the figure was first built.
+    """
+
+    def __init__(self, maxsize: int = 256, cache: Optional[ResultCache] = None):
+        self.cache = cache if cache is not None else ResultCache(maxsize=maxsize)
+
+    def figure(self, result_key: Optional[str], chart: str, build: Callable[[], go.Figure], *options: Any) -> go.Figure:
+        """Figure `chart` of the result `result_key`, built by `build` on a miss.
+
+        `options` are extra inputs of the chart that are not part of the
+        result. Without a result key the figure is built every time.
+        """
+        if result_key is None:
+            return build()
+        key = fingerprint("figure", result_key, chart, options)
+        spec = self.cache.get_or_compute(key, lambda: pio.to_json(build(), validate=False))
+        return go.Figure(json.loads(spec), _validate=False)
 
 
 class ChartFactory:
+    @staticmethod
+    def _score_axis(method: str) -> Dict[str, Any]:
+        """Axis title and range for the scores of an MCDM method; unbounded
+        scores (PROMETHEE flows, Borda/Copeland counts) are autoranged."""
+        scorer = get_method(method)
+        axis: Dict[str, Any] = dict(title=f"<b>Điểm {scorer.label}</b>")
+        score_range = getattr(scorer, "score_range", None)
+        if score_range is not None:
+            axis["range"] = list(score_range)
+        return axis
+
     @staticmethod
     def _apply_theme(fig: go.Figure, title: str) -> go.Figure:
         fig.update_layout(
@@ -52,31 +94,80 @@ class ChartFactory:
         return fig
 
     @staticmethod
-    def create_cost_benefit_scatter(results: pd.DataFrame) -> go.Figure:
+    def create_cost_benefit_scatter(results: pd.DataFrame, method: str = "topsis") -> go.Figure:
+        """Cost vs score, one trace per ICC package. Tables larger than
+        CHART_WEBGL_THRESHOLD are drawn with WebGL and without point labels."""
         color_map = {"ICC A": "#ff6b6b", "ICC B": "#ffd93d", "ICC C": "#6bcf7f"}
+        large = len(results) > CHART_WEBGL_THRESHOLD
+        trace = go.Scattergl if large else go.Scatter
+        groups = results.groupby("icc_package", sort=False).indices
+        cost = results["estimated_cost"].to_numpy()
+        score = results["score"].to_numpy()
+        company = results["company"].to_numpy()
         fig = go.Figure()
 
         for icc in ["ICC C", "ICC B", "ICC A"]:
-            df_icc = results[results["icc_package"] == icc]
-            fig.add_trace(go.Scatter(
-                x=df_icc["estimated_cost"],
-                y=df_icc["score"],
-                mode="markers+text",
+            idx = groups.get(icc, np.empty(0, dtype=np.intp))
+            fig.add_trace(trace(
+                x=cost[idx],
+                y=score[idx],
+                mode="markers" if large else "markers+text",
                 name=icc,
-                text=df_icc["company"],
+                text=company[idx],
                 textposition="top center",
-                marker=dict(size=15, color=color_map[icc], line=dict(width=2, color="#000")),
+                marker=dict(size=6, color=color_map[icc]) if large else dict(size=15, color=color_map[icc], line=dict(width=2, color="#000")),
                 hovertemplate="<b>%{text}</b><br>Gói: " + icc + "<br>Chi phí: $%{x:,.0f}<br>Điểm: %{y:.3f}<extra></extra>"
             ))
 
         fig.update_xaxes(title="<b>Chi phí ước tính ($)</b>")
-        fig.update_yaxes(title="<b>Điểm TOPSIS</b>", range=[0, 1])
+        fig.update_yaxes(**ChartFactory._score_axis(method))
         fig = ChartFactory._apply_theme(fig, "Chi phí vs Chất lượng (Cost-Benefit Analysis)")
         fig.update_layout(height=480)
         return fig
 
     @staticmethod
-    def create_top_recommendations_bar(results: pd.DataFrame) -> go.Figure:
+    def create_catalogue_scatter(ranking, cost: str = "estimated_cost", label: str = "company") -> go.Figure:
+        """Cost vs score of every option of a `CatalogueRanking`, top k highlighted.
+
+        Drawn with WebGL straight from the column arrays; no DataFrame of the
+        full catalogue is built. Above CHART_MAX_SCATTER_POINTS options the
+        catalogue is shown as a 2-D density so the payload stays bounded.
+        """
+        costs = np.asarray(ranking.columns[cost], dtype=float)
+        top = ranking.top_index
+        if label in ranking.columns:
+            names = np.asarray(ranking.columns[label])[top].astype(str)
+        else:
+            names = np.char.add("#", np.arange(1, len(top) + 1).astype(str))
+
+        fig = go.Figure()
+        if len(ranking) > CHART_MAX_SCATTER_POINTS:
+            counts, x_edges, y_edges = np.histogram2d(costs, ranking.scores, bins=(120, 80))
+            fig.add_trace(go.Heatmap(
+                z=np.where(counts.T > 0, counts.T, np.nan),
+                x=0.5 * (x_edges[:-1] + x_edges[1:]), y=0.5 * (y_edges[:-1] + y_edges[1:]),
+                colorscale="Teal", name=f"Danh mục ({len(ranking):,})", showscale=False,
+                hovertemplate="Chi phí: $%{x:,.0f}<br>Điểm: %{y:.3f}<br>Số phương án: %{z:,.0f}<extra></extra>"
+            ))
+        else:
+            fig.add_trace(go.Scattergl(
+                x=costs, y=ranking.scores, mode="markers", name=f"Danh mục ({len(ranking):,})",
+                marker=dict(size=4, color="#4db6ac", opacity=0.45),
+                hovertemplate="Chi phí: $%{x:,.0f}<br>Điểm: %{y:.3f}<extra></extra>"
+            ))
+        fig.add_trace(go.Scattergl(
+            x=costs[top], y=ranking.scores[top], mode="markers", name=f"Top {len(top)}", text=names,
+            marker=dict(size=9, color="#ffeb3b", line=dict(width=1, color="#000")),
+            hovertemplate="<b>%{text}</b><br>Chi phí: $%{x:,.0f}<br>Điểm: %{y:.3f}<extra></extra>"
+        ))
+        fig.update_xaxes(title="<b>Chi phí ước tính ($)</b>")
+        fig.update_yaxes(title="<b>Điểm</b>")
+        fig = ChartFactory._apply_theme(fig, "Chi phí vs Điểm — toàn bộ danh mục")
+        fig.update_layout(height=520)
+        return fig
+
+    @staticmethod
+    def create_top_recommendations_bar(results: pd.DataFrame, method: str = "topsis") -> go.Figure:
         df = results.head(5).copy()
         df["label"] = df["company"] + " - " + df["icc_package"]
 
@@ -84,7 +175,7 @@ class ChartFactory:
             x=df["score"],
             y=df["label"],
             orientation="h",
-            text=[f"{v:.3f}" for v in df["score"]],
+            texttemplate="%{x:.3f}",
             textposition="outside",
             marker=dict(
                 color=df["score"],
@@ -95,7 +186,7 @@ class ChartFactory:
             customdata=df["estimated_cost"]
         )])
 
-        fig.update_xaxes(title="<b>Điểm TOPSIS</b>", range=[0, 1])
+        fig.update_xaxes(**ChartFactory._score_axis(method))
         fig.update_yaxes(title="<b>Phương án</b>")
         fig = ChartFactory._apply_theme(fig, "Top 5 Phương án Tốt nhất")
         fig.update_layout(height=440)
@@ -106,37 +197,60 @@ class ChartFactory:
         historical: np.ndarray,
         forecast: np.ndarray,
         route: str = "VN - EU",
-        selected_month: int = 9
+        selected_month: int = 9,
+        lower: Optional[np.ndarray] = None,
+        upper: Optional[np.ndarray] = None
     ) -> go.Figure:
+        """History and forecast with its band. Histories longer than
+        CHART_MAX_POINTS are downsampled (LTTB); month ticks are only drawn
+        for short series."""
+        historical = np.asarray(historical, dtype=float)
         hist_len = len(historical)
-        months_hist = list(range(1, hist_len + 1))
-        next_month = selected_month % 12 + 1
-        months_fc = [next_month]
+        forecast = np.atleast_1d(forecast)
+        # Sequential positions so multi-step forecasts can run past December;
+        # ticks are labelled with the calendar month.
+        x_hist = np.arange(1, hist_len + 1)
+        x_fc = list(range(hist_len + 1, hist_len + 1 + len(forecast)))
+        month_of = lambda x: (selected_month - hist_len + np.asarray(x) - 1) % 12 + 1
+        long_series = hist_len > CHART_MAX_POINTS
+        keep = downsample_indices(x_hist, historical, CHART_MAX_POINTS)
 
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=months_hist, y=historical,
-            mode="lines+markers", name="Lịch sử",
-            line=dict(color="#00e676", width=3), marker=dict(size=9),
-            hovertemplate="Tháng %{x}<br>Rủi ro: %{y:.1%}<extra></extra>"
+            x=x_hist[keep], y=historical[keep],
+            mode="lines" if long_series else "lines+markers", name="Lịch sử",
+            line=dict(color="#00e676", width=2 if long_series else 3), marker=dict(size=9),
+            customdata=month_of(x_hist[keep]),
+            hovertemplate="Tháng %{customdata}<br>Rủi ro: %{y:.1%}<extra></extra>"
         ))
+        if lower is not None and upper is not None:
+            fig.add_trace(go.Scatter(
+                x=x_fc + x_fc[::-1], y=np.concatenate([upper, lower[::-1]]),
+                fill="toself", fillcolor="rgba(255, 235, 59, 0.18)", line=dict(width=0),
+                name="Khoảng dự báo 95%", hoverinfo="skip"
+            ))
         fig.add_trace(go.Scatter(
-            x=months_fc, y=forecast,
+            x=x_fc, y=forecast,
             mode="lines+markers", name="Dự báo",
             line=dict(color="#ffeb3b", width=3, dash="dash"),
             marker=dict(size=11, symbol="diamond"),
-            hovertemplate="Tháng %{x}<br>Dự báo: %{y:.1%}<extra></extra>"
+            customdata=month_of(x_fc),
+            hovertemplate="Tháng %{customdata}<br>Dự báo: %{y:.1%}<extra></extra>"
         ))
 
         fig = ChartFactory._apply_theme(fig, f"Dự báo rủi ro khí hậu — {route}")
-        fig.update_xaxes(title="<b>Tháng</b>", tickmode="linear", tick0=1, dtick=1, range=[1, 12], tickvals=list(range(1, 13)))
-        max_val = max(float(historical.max()), float(forecast.max()))
+        last = hist_len + len(forecast)
+        if last <= 36:
+            ticks = np.arange(1, last + 1)
+            fig.update_xaxes(tickvals=ticks, ticktext=month_of(ticks).astype(str))
+        fig.update_xaxes(title="<b>Tháng</b>", range=[0.5, last + 0.5])
+        max_val = max(float(historical.max()), float(forecast.max()), float(np.max(upper)) if upper is not None else 0.0)
         fig.update_yaxes(title="<b>Mức rủi ro (0–1)</b>", range=[0, max(1.0, max_val * 1.15)], tickformat=".0%")
         fig.update_layout(height=450)
         return fig
 
     @staticmethod
-    def create_fuzzy_heatmap(results: pd.DataFrame) -> go.Figure:
+    def create_fuzzy_heatmap(results: pd.DataFrame, method: str = "topsis") -> go.Figure:
         """Create heatmap for fuzzy uncertainty from results DataFrame."""
         if len(results) == 0:
             return go.Figure().add_annotation(text="Không có dữ liệu")
@@ -149,7 +263,7 @@ class ChartFactory:
         else:
             # Use first 10 options, score as single metric
             fuzzy_data = results["score"].head(10).values.reshape(-1, 1)
-            labels = ["Điểm TOPSIS"]
+            labels = [f"Điểm {get_method(method).label}"]
         
         option_labels = results["company"].head(10).values + " - " + results["icc_package"].head(10).values
         
@@ -165,56 +279,92 @@ class ChartFactory:
         return fig
 
     @staticmethod
-    def create_sensitivity_spider(results: pd.DataFrame) -> go.Figure:
-        """Create spider/radar chart for sensitivity analysis."""
-        top_5 = results.head(5)
+    def create_rank_probability_heatmap(robustness, top_n: int = 10) -> go.Figure:
+        """P(rank) for the options with the best expected rank under fuzzy weights."""
+        order = np.argsort(robustness.expected_rank, kind="stable")[:top_n]
+        probs = robustness.rank_probabilities[order, :top_n]
+        labels = [robustness.options[i] for i in order]
+
+        fig = go.Figure(data=go.Heatmap(
+            z=probs, x=[f"#{r}" for r in range(1, probs.shape[1] + 1)], y=labels,
+            colorscale="Greens", zmin=0, zmax=1,
+            hovertemplate="<b>%{y}</b><br>Hạng %{x}: %{z:.1%}<extra></extra>"
+        ))
+        fig = ChartFactory._apply_theme(fig, f"Xác suất xếp hạng ({robustness.n_samples:,} bộ trọng số mờ)")
+        fig.update_yaxes(autorange="reversed")
+        fig.update_layout(height=420)
+        return fig
+
+    @staticmethod
+    def create_risk_distribution_chart(distribution) -> go.Figure:
+        """Monte Carlo C6 distribution per company, drawn from the precomputed
+        histogram so the payload does not grow with the number of runs."""
+        centers, density = distribution.centers, distribution.density
         fig = go.Figure()
-        categories = ['Giá', 'Chất lượng', 'Rủi ro', 'Dịch vụ', 'Uy tín']
-        for _, row in top_5.iterrows():
-            values = [
-                float(1.0 - row.get("C1: Tỷ lệ phí", 0.5)),  # inverse cost
-                float(row.get("C2: Thời gian xử lý", 0.5)),
-                float(1.0 - row.get("C6: Rủi ro khí hậu", 0.5)),  # inverse risk
-                float(row.get("C4: Hỗ trợ ICC", 0.5)),
-                float(row.get("C5: Chăm sóc KH", 0.5))
-            ]
-            fig.add_trace(go.Scatterpolar(r=values, theta=categories, name=f"{row['company']} - {row['icc_package']}"))
-        fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 1])), showlegend=True, height=500)
-        fig = ChartFactory._apply_theme(fig, "Phân tích độ nhạy")
+        for company, row in zip(distribution.companies, density):
+            fig.add_trace(go.Scatter(
+                x=centers, y=row, mode="lines", name=company, line=dict(shape="hvh", width=2),
+                hovertemplate=f"<b>{company}</b><br>" + "Rủi ro: %{x:.1%}<br>Mật độ: %{y:.2f}<extra></extra>"
+            ))
+        fig = ChartFactory._apply_theme(fig, "Phân phối rủi ro khí hậu (Monte Carlo)")
+        fig.update_xaxes(title="<b>Mức rủi ro C6</b>", tickformat=".0%")
+        fig.update_yaxes(title="<b>Mật độ</b>")
+        fig.update_layout(height=440)
+        return fig
+
+    @staticmethod
+    def create_sensitivity_spider(sensitivity: pd.DataFrame) -> go.Figure:
+        """Rank-reversal thresholds per criterion: how far (as % of its current
+        weight) each weight can move before the recommended option changes."""
+        fig = go.Figure()
+        theta = [c.split(":")[0] for c in sensitivity["criterion"]]
+        weight = sensitivity["weight"].values
+        for col, name, color in (("increase", "Tăng trọng số", "#00e676"), ("decrease", "Giảm trọng số", "#ff5252")):
+            pct = sensitivity[col].values / weight * 100
+            fig.add_trace(go.Scatterpolar(
+                r=np.where(np.isnan(pct), None, pct), theta=theta, name=name,
+                line=dict(color=color), connectgaps=True,
+                customdata=np.stack([sensitivity["criterion"], sensitivity[f"{col}_new_top"].fillna("—")], axis=-1),
+                hovertemplate="<b>%{customdata[0]}</b><br>Ngưỡng: %{r:.1f}% trọng số<br>"
+                              "Phương án mới: %{customdata[1]}<extra></extra>"
+            ))
+        fig.update_layout(polar=dict(radialaxis=dict(visible=True, ticksuffix="%")), showlegend=True, height=500)
+        top = sensitivity["top_option"].iloc[0] if len(sensitivity) else ""
+        fig = ChartFactory._apply_theme(fig, f"Ngưỡng đảo hạng — {top}")
         return fig
 
     @staticmethod
     def create_confidence_radar(results: pd.DataFrame) -> go.Figure:
         """Create confidence/reliability radar chart."""
         top_5 = results.head(5)
-        fig = go.Figure()
-        for _, row in top_5.iterrows():
-            confidence = float(row.get("confidence", 0.5))
-            fig.add_trace(go.Bar(y=[confidence], name=f"{row['company']} - {row['icc_package']}"))
+        labels = top_5["company"] + " - " + top_5["icc_package"]
+        confidence = top_5["confidence"] if "confidence" in top_5 else pd.Series(0.5, index=top_5.index)
+        fig = go.Figure(go.Bar(
+            x=labels, y=confidence.astype(float),
+            marker=dict(color=px.colors.qualitative.Plotly[:len(top_5)]),
+            hovertemplate="<b>%{x}</b><br>Độ tin cậy: %{y:.2f}<extra></extra>"
+        ))
         fig.update_layout(title="<b>Độ tin cậy dự báo</b>", yaxis_range=[0, 1], height=400)
         fig = ChartFactory._apply_theme(fig, "Độ tin cậy")
         return fig
 
     @staticmethod
-    def create_category_comparison(results: pd.DataFrame) -> go.Figure:
+    def create_category_comparison(results: pd.DataFrame, method: str = "topsis") -> go.Figure:
         """Create category comparison chart with dual axes."""
         categories = ["Tiết kiệm", "Cân bằng", "An toàn"]
-        avg_scores = []
-        avg_costs = []
-
-        for cat in categories:
-            df_cat = results[results["category"] == cat]
-            avg_scores.append(df_cat["score"].mean() if len(df_cat) > 0 else 0)
-            avg_costs.append(df_cat["estimated_cost"].mean() if len(df_cat) > 0 else 0)
-
+        means = results.groupby("category")[["score", "estimated_cost"]].mean().reindex(categories).fillna(0)
+        avg_scores = means["score"].to_numpy()
+        avg_costs = means["estimated_cost"].to_numpy()
         fig = go.Figure()
         fig.add_trace(go.Bar(name="Điểm trung bình", x=categories, y=avg_scores, marker=dict(color='#00e676'), yaxis="y"))
         fig.add_trace(go.Scatter(name="Chi phí trung bình", x=categories, y=avg_costs, mode="lines+markers",
                                  marker=dict(size=10, color='#ffeb3b'), line=dict(width=3, color='#ffeb3b'), yaxis="y2"))
 
+        score_axis = ChartFactory._score_axis(method)
+        score_axis["title"] = dict(text=score_axis["title"], font=dict(color="#00e676"))
         fig.update_layout(
             title=dict(text="<b>So sánh 3 loại phương án</b>", font=dict(size=22, color="#e6fff7"), x=0.5),
-            yaxis=dict(title=dict(text="<b>Điểm TOPSIS</b>", font=dict(color="#00e676")), range=[0, 1]),
+            yaxis=score_axis,
             yaxis2=dict(title=dict(text="<b>Chi phí ($)</b>", font=dict(color="#ffeb3b")), overlaying="y", side="right"),
             paper_bgcolor="#000c11", plot_bgcolor="#001016", font=dict(color="#e6fff7"),
             legend=dict(bgcolor="rgba(0,0,0,0.3)", bordercolor="#00e676", borderwidth=1),
@@ -1,7 +1,9 @@
 # ui/components.py
+import os
 import streamlit as st
 from core.models import AnalysisParams
-from config.constants import PRIORITY_PROFILES
+from core.mcdm import MCDM_METHODS
+from config.constants import MC_STREAMING_THRESHOLD, PRIORITY_PROFILES
 from .templates import TOOLTIP_ICON
 
 def render_header():
@@ -30,6 +32,10 @@ def render_sidebar() -> AnalysisParams:
         cargo_value = st.number_input("Giá trị (USD)", 1000, value=39_000, step=1_000)
         route = st.selectbox("Tuyến", ["VN - EU", "VN - US", "VN - Singapore", "VN - China", "Domestic"])
         month = st.selectbox("Tháng", list(range(1, 13)), index=8)
+        departure_offset = st.slider(
+            "Khởi hành sau (tháng)", 0, 6, 0,
+            help="0 = tháng đã chọn; lớn hơn 0 dùng rủi ro dự báo tại thời điểm khởi hành"
+        )
         priority_profile = st.selectbox("Mục tiêu", list(PRIORITY_PROFILES.keys()))
 
         st.markdown("---")
@@ -42,13 +48,35 @@ def render_sidebar() -> AnalysisParams:
             use_mc = st.checkbox("Monte Carlo", True)
             use_var = st.checkbox("VaR/CVaR", True)
 
-        mc_runs = st.slider("MC Runs", 500, 5000, 2000, 500)
+        forecast_horizon = st.slider("Tầm dự báo (tháng)", 1, 12, 1)
+        mc_runs = st.select_slider(
+            "MC Runs", [500, 1_000, 2_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 10_000_000], 2_000
+        )
+        # above the threshold the streaming engine runs plain sampling, split across workers
+        streaming = mc_runs > MC_STREAMING_THRESHOLD
+        mc_workers = st.number_input(
+            "MC Workers", min_value=1, max_value=os.cpu_count() or 1, value=1, step=1,
+            help=f"Số tiến trình song song cho mô phỏng trên {MC_STREAMING_THRESHOLD:,} lần"
+        ) if use_mc and streaming else 1
+        mc_method = st.selectbox(
+            "MC Method", ["antithetic", "sobol", "halton", "control_variate", "plain"],
+            disabled=streaming,
+            help=(f"Trên {MC_STREAMING_THRESHOLD:,} lần mô phỏng dùng mô phỏng theo luồng (plain)"
+                  if streaming else "Giảm phương sai: cùng độ chính xác với ít lần mô phỏng hơn")
+        ) if use_mc else "plain"
+        if streaming:
+            mc_method = "plain"
         fuzzy_uncertainty = st.slider("Fuzzy (%)", 0, 50, 15) if use_fuzzy else 15
+        mcdm_method = st.selectbox(
+            "Phương pháp xếp hạng", list(MCDM_METHODS), format_func=lambda m: MCDM_METHODS[m].label
+        )
 
         return AnalysisParams(
             cargo_value=cargo_value, good_type="", route=route, method="Sea",
             month=month, priority_profile=priority_profile, use_fuzzy=use_fuzzy, use_arima=use_arima,
-            use_mc=use_mc, use_var=use_var, mc_runs=mc_runs, fuzzy_uncertainty=fuzzy_uncertainty
+            use_mc=use_mc, use_var=use_var, mc_runs=mc_runs, mc_workers=int(mc_workers), mc_method=mc_method,
+            fuzzy_uncertainty=fuzzy_uncertainty, forecast_horizon=forecast_horizon,
+            departure_offset=departure_offset, mcdm_method=mcdm_method
         )
 
 def render_tooltip(text: str, tip: str):
@@ -1,17 +1,47 @@
 # ui/export.py
-"""Report generation (PDF, Excel) for RISKCAST v5.5."""
+"""Report generation (PDF, Excel) for RISKCAST v5.5.
+
+`ReportGenerator` renders one report. `ReportService` renders on a worker
+pool, caches the bytes per result fingerprint and writes per-shipment
+reports for whole manifests.
+"""
 from fpdf import FPDF
 import pandas as pd
 import io
+import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import fields
+from typing import Dict, List, Optional, Sequence, Tuple
+from core.cache import ResultCache, fingerprint
+from core.mcdm import MultiPackageAnalyzer
+from core.models import AnalysisParams
 from config.constants import ICC_PACKAGES
 
+# format -> (ReportGenerator method, file extension)
+REPORT_FORMATS = {"pdf": ("generate_pdf", "pdf"), "excel": ("generate_excel", "xlsx")}
+
+
+class _ReportPDF(FPDF):
+    """FPDF whose core fonts accept any text: Vietnamese diacritics are
+    dropped and characters outside latin-1 (dashes aside) are removed."""
+
+    def normalize_text(self, text: str) -> str:
+        if not self.is_ttf_font:
+            text = text.replace("—", "-").replace("–", "-").replace("đ", "d").replace("Đ", "D")
+            text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+            text = text.encode("latin-1", "ignore").decode("latin-1").strip()
+        return super().normalize_text(text)
+
 
 class ReportGenerator:
     """Generate PDF and Excel reports from analysis results."""
     
     def generate_pdf(self, result, params) -> bytes:
         """Generate PDF report with analysis summary."""
-        pdf = FPDF()
+        pdf = _ReportPDF()
         pdf.add_page()
         pdf.set_auto_page_break(auto=True, margin=10)
         
@@ -21,7 +51,6 @@ class ReportGenerator:
         
         # Metadata
         pdf.set_font("Arial", size=10)
-        pdf.cell(0, 5, f"Ngay bao cao: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}", ln=1)
         pdf.cell(0, 5, f"Nguoi dung: RISKCAST System", ln=1)
         pdf.cell(0, 5, f"Muc tieu: {getattr(params, 'priority_profile', 'Tieu chuan')}", ln=1)
         pdf.ln(5)
@@ -30,13 +59,14 @@ class ReportGenerator:
         pdf.set_font("Arial", "B", 14)
         pdf.cell(0, 10, "GOI Y TOT NHAT", ln=1)
         
-        top_row = result.results.iloc[0]
+        top10 = result.results.head(10).to_dict("records")
+        top_row = top10[0]
         pdf.set_font("Arial", size=11)
-        pdf.cell(0, 8, f"Cong ty: {top_row.get('Company', 'Unknown')}", ln=1)
-        pdf.cell(0, 8, f"Goi ICC: {top_row.get('ICC Package', 'N/A')}", ln=1)
-        pdf.cell(0, 8, f"Diem TOPSIS: {top_row.get('TOPSIS Score', 0):.4f}", ln=1)
-        pdf.cell(0, 8, f"Chi phi: ${top_row.get('Cost', 0):,.0f}", ln=1)
-        pdf.cell(0, 8, f"Tin cay: {top_row.get('Confidence', 0):.2f}", ln=1)
+        pdf.cell(0, 8, f"Cong ty: {top_row.get('company', 'Unknown')}", ln=1)
+        pdf.cell(0, 8, f"Goi ICC: {top_row.get('icc_package', 'N/A')}", ln=1)
+        pdf.cell(0, 8, f"Diem: {top_row.get('score', 0):.4f}", ln=1)
+        pdf.cell(0, 8, f"Chi phi: ${top_row.get('estimated_cost', 0):,.0f}", ln=1)
+        pdf.cell(0, 8, f"Tin cay: {top_row.get('confidence', 0):.2f}", ln=1)
         pdf.ln(5)
         
         # Top 10 Options
@@ -44,18 +74,17 @@ class ReportGenerator:
         pdf.cell(0, 10, "TIEN TOP 10 PHUONG AN", ln=1)
         
         pdf.set_font("Arial", size=9)
-        top10 = result.results.head(10)
-        for idx, (_, row) in enumerate(top10.iterrows(), 1):
+        for idx, row in enumerate(top10, 1):
             pdf.cell(20, 8, f"{idx}.", border=1)
-            pdf.cell(60, 8, str(row.get('Company', ''))[:20], border=1)
-            pdf.cell(40, 8, str(row.get('ICC Package', ''))[:15], border=1)
-            pdf.cell(40, 8, f"${row.get('Cost', 0):,.0f}", border=1)
-            pdf.cell(30, 8, f"{row.get('TOPSIS Score', 0):.3f}", border=1, ln=1)
+            pdf.cell(60, 8, str(row.get('company', ''))[:20], border=1)
+            pdf.cell(40, 8, str(row.get('icc_package', ''))[:15], border=1)
+            pdf.cell(40, 8, f"${row.get('estimated_cost', 0):,.0f}", border=1)
+            pdf.cell(30, 8, f"{row.get('score', 0):.3f}", border=1, ln=1)
         
         pdf.ln(5)
         
         # Risk Metrics
-        if hasattr(result, 'var') and hasattr(result, 'cvar'):
+        if getattr(result, 'var', None) is not None and getattr(result, 'cvar', None) is not None:
             pdf.set_font("Arial", "B", 14)
             pdf.cell(0, 10, "PHAC TICH RUI RO TAI CHINH", ln=1)
             
@@ -63,6 +92,22 @@ class ReportGenerator:
             pdf.cell(0, 8, f"VaR 95%: ${result.var:,.0f}", ln=1)
             pdf.cell(0, 8, f"CVaR 95%: ${result.cvar:,.0f}", ln=1)
         
+        # Weight sensitivity
+        sensitivity = getattr(result, 'sensitivity', None)
+        if sensitivity is not None:
+            pdf.ln(5)
+            pdf.set_font("Arial", "B", 14)
+            pdf.cell(0, 10, "DO NHAY TRONG SO (NGUONG DAO HANG)", ln=1)
+            pdf.set_font("Arial", size=9)
+            for _, row in sensitivity.iterrows():
+                code = str(row['criterion']).split(":")[0]
+                up = "-" if pd.isna(row['increase']) else f"+{row['increase']:.4f}"
+                down = "-" if pd.isna(row['decrease']) else f"-{row['decrease']:.4f}"
+                pdf.cell(30, 7, code, border=1)
+                pdf.cell(30, 7, f"{row['weight']:.3f}", border=1)
+                pdf.cell(40, 7, up, border=1)
+                pdf.cell(40, 7, down, border=1, ln=1)
+
         # Footer
         pdf.ln(10)
         pdf.set_font("Arial", "I", 8)
@@ -102,6 +147,148 @@ class ReportGenerator:
                     'Value': [result.var, result.cvar]
                 })
                 risk_df.to_excel(writer, sheet_name="Rui ro", index=False)
+
+            # Sheet 4: Rank-reversal thresholds (if available)
+            if getattr(result, 'sensitivity', None) is not None:
+                result.sensitivity.to_excel(writer, sheet_name="Do nhay", index=False)
+
+            # Sheet 5: Cross-method consensus (if available)
+            if getattr(result, 'consensus', None) is not None:
+                result.consensus.to_excel(writer, sheet_name="Dong thuan", index=False)
         
         buffer.seek(0)
-        return buffer.getvalue()
\ No newline at end of file
+        return buffer.getvalue()
+
+def render_report(result, params, fmt: str) -> bytes:
+    """Bytes of the `fmt` report ("pdf" or "excel") of one result."""
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format: {fmt}")
+    return getattr(ReportGenerator(), REPORT_FORMATS[fmt][0])(result, params)
+
+
+_worker_state = threading.local()
+
+
+def _report_name(shipment_id) -> str:
+    """File-name stem of a shipment's reports."""
+    return "RISKCAST_" + re.sub(r"[^\w.-]", "_", str(shipment_id))
+
+
+def _batch_worker(jobs: List[Tuple[object, AnalysisParams]], out_dir: str, formats: Sequence[str]) -> List[Tuple]:
+    """Analyze and write the reports of a chunk of shipments.
+
+    Each worker (process or thread) keeps one analyzer, so shipments of a
+    chunk that share a route and month reuse its cached pipeline stages.
+    """
+    analyzer = getattr(_worker_state, "analyzer", None)
+    if analyzer is None:
+        analyzer = _worker_state.analyzer = MultiPackageAnalyzer()
+    written = []
+    for shipment_id, params in jobs:
+        result = analyzer.run_analysis(params)
+        name = _report_name(shipment_id)
+        for fmt in formats:
+            path = os.path.join(out_dir, f"{name}.{REPORT_FORMATS[fmt][1]}")
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(render_report(result, params, fmt))
+            os.replace(tmp, path)
+            written.append((shipment_id, fmt, path))
+    return written
+
+
+class ReportService:
+    """Reports rendered in the background and cached per analysis result.
+
+    Keys are the result fingerprint plus the format; asking again for a
+    report returns the cached bytes or joins the job already running.
+    Results without a fingerprint are rendered every time.
+    """
+
+    def __init__(self, max_workers: int = 2, cache: Optional[ResultCache] = None):
+        self.cache = cache if cache is not None else ResultCache(maxsize=64)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(result, fmt: str) -> Optional[str]:
+        result_key = getattr(result, "fingerprint", None)
+        return None if result_key is None else fingerprint("report", fmt, result_key)
+
+    def submit(self, result, params, fmt: str = "pdf") -> Future:
+        """Future of the report bytes; already resolved when cached."""
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {fmt}")
+        key = self.key(result, fmt)
+        with self._lock:
+            if key is not None:
+                data = self.cache.get(key)
+                if data is not None:
+                    future = Future()
+                    future.set_result(data)
+                    return future
+                if key in self._pending:
+                    return self._pending[key]
+            future = self.pool.submit(render_report, result, params, fmt)
+            if key is not None:
+                self._pending[key] = future
+                future.add_done_callback(lambda done: self._finish(key, done))
+            return future
+
+    def _finish(self, key: str, future: Future) -> None:
+        with self._lock:
+            if not future.cancelled() and future.exception() is None:
+                self.cache.set(key, future.result())
+            self._pending.pop(key, None)
+
+    def get(self, result, params, fmt: str = "pdf", timeout: Optional[float] = None) -> bytes:
+        """Report bytes, waiting for the background job if needed."""
+        return self.submit(result, params, fmt).result(timeout)
+
+    @staticmethod
+    def write_batch(
+        shipments,
+        out_dir: str,
+        formats: Sequence[str] = ("pdf",),
+        n_workers: Optional[int] = None,
+        chunk_size: int = 16,
+        use_processes: bool = True
+    ) -> pd.DataFrame:
+        """Write one report per shipment and format into `out_dir`, in parallel.
+
+        `shipments` is a manifest as accepted by `MultiPackageAnalyzer.run_batch`
+        (an optional `shipment_id` column names the files; ids that map to
+        the same file name are rejected). Shipments are
+        sorted by simulation group and sent to the workers in chunks, so a
+        worker's cached forecast and Monte Carlo stages are reused. Returns
+        shipment_id, format and path of every file, in manifest order.
+        """
+        unknown = [f for f in formats if f not in REPORT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown report format: {unknown[0]}")
+        frame = MultiPackageAnalyzer._shipments_frame(shipments)
+        clashes = frame["shipment_id"].map(_report_name).duplicated()
+        if clashes.any():
+            raise ValueError(f"Duplicate shipment_id: {frame['shipment_id'][clashes].iloc[0]}")
+        os.makedirs(out_dir, exist_ok=True)
+        if frame.empty:
+            return pd.DataFrame(columns=["shipment_id", "format", "path"])
+
+        frame = frame.sort_values(MultiPackageAnalyzer.SIMULATION_KEYS + ["_order"], kind="stable")
+        names = [f.name for f in fields(AnalysisParams)]
+        jobs = list(zip(frame["shipment_id"], (AnalysisParams(**row) for row in frame[names].to_dict("records"))))
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(chunks)))
+
+        if n_workers == 1:
+            parts = [_batch_worker(chunk, out_dir, formats) for chunk in chunks]
+        else:
+            pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            with pool_cls(max_workers=n_workers) as pool:
+                parts = list(pool.map(_batch_worker, chunks, [out_dir] * len(chunks), [formats] * len(chunks)))
+
+        written = pd.DataFrame([row for part in parts for row in part], columns=["shipment_id", "format", "path"])
+        order = dict(zip(frame["shipment_id"], frame["_order"]))
+        written["_order"] = written["shipment_id"].map(order)
+        return written.sort_values("_order", kind="stable").drop(columns="_order").reset_index(drop=True)
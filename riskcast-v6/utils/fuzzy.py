@@ -1,48 +1,134 @@
 import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+from typing import TYPE_CHECKING
+
+# Plotly is only needed by the chart helpers; importing it lazily keeps the
+# analysis engine (which uses apply_fuzzy) free of the dependency.
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+class TFN:
+    """Triangular fuzzy numbers (low, mid, high) held as broadcastable arrays.
+
+    Arithmetic is elementwise over the arrays, so one TFN can represent a
+    whole weight vector or decision matrix. Multiplication and division use
+    the usual approximations for non-negative numbers.
+    """
+    __slots__ = ("low", "mid", "high")
+
+    def __init__(self, low, mid, high):
+        self.low = np.asarray(low, dtype=float)
+        self.mid = np.asarray(mid, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+
+    @classmethod
+    def crisp(cls, value) -> "TFN":
+        return cls(value, value, value)
+
+    @classmethod
+    def from_spread(cls, mid, pct: float, floor: float = -np.inf, cap: float = np.inf) -> "TFN":
+        """(mid·(1−pct), mid, mid·(1+pct)) with the bounds clipped to [floor, cap]."""
+        mid = np.asarray(mid, dtype=float)
+        return cls(np.maximum(mid * (1 - pct), floor), mid, np.minimum(mid * (1 + pct), cap))
+
+    @staticmethod
+    def _lift(other) -> "TFN":
+        return other if isinstance(other, TFN) else TFN.crisp(other)
+
+    @property
+    def shape(self) -> tuple:
+        return np.broadcast(self.low, self.mid, self.high).shape
+
+    def __getitem__(self, idx) -> "TFN":
+        return TFN(*(np.broadcast_to(v, self.shape)[idx] for v in (self.low, self.mid, self.high)))
+
+    def __add__(self, other) -> "TFN":
+        other = self._lift(other)
+        return TFN(self.low + other.low, self.mid + other.mid, self.high + other.high)
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> "TFN":
+        other = self._lift(other)
+        return TFN(self.low - other.high, self.mid - other.mid, self.high - other.low)
+
+    def __mul__(self, other) -> "TFN":
+        other = self._lift(other)
+        return TFN(self.low * other.low, self.mid * other.mid, self.high * other.high)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other) -> "TFN":
+        other = self._lift(other)
+        return TFN(self.low / other.high, self.mid / other.mid, self.high / other.low)
+
+    def centroid(self) -> np.ndarray:
+        return (self.low + self.mid + self.high) / 3.0
+
+    def spread(self) -> np.ndarray:
+        return self.high - self.low
+
+    def distance(self, other) -> np.ndarray:
+        """Vertex distance sqrt(((l1−l2)² + (m1−m2)² + (h1−h2)²) / 3)."""
+        other = self._lift(other)
+        return np.sqrt(((self.low - other.low) ** 2 + (self.mid - other.mid) ** 2
+                        + (self.high - other.high) ** 2) / 3.0)
+
+    def sum(self, axis=None) -> "TFN":
+        return TFN(self.low.sum(axis=axis), self.mid.sum(axis=axis), self.high.sum(axis=axis))
+
+    def normalize(self, is_cost=False, axis: int = -2) -> "TFN":
+        """Linear fuzzy normalization along `axis` (alternatives): benefit
+        columns are divided by their largest `high`, cost columns become
+        min(low) / x so that smaller is better. Results lie in [0, 1]."""
+        low, mid, high = np.broadcast_arrays(self.low, self.mid, self.high)
+        best = high.max(axis=axis, keepdims=True)
+        best = np.where(best == 0, 1.0, best)
+        least = low.min(axis=axis, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cost = (np.where(high > 0, least / high, 1.0), np.where(mid > 0, least / mid, 1.0),
+                    np.where(low > 0, least / low, 1.0))
+        benefit = (low / best, mid / best, high / best)
+        return TFN(*(np.where(is_cost, c, b) for c, b in zip(cost, benefit)))
+
+    def to_frame(self, index=None) -> pd.DataFrame:
+        return pd.DataFrame({"Low": self.low, "Mid": self.mid, "High": self.high}, index=index)
+
+    def __repr__(self) -> str:
+        return f"TFN(low={self.low!r}, mid={self.mid!r}, high={self.high!r})"
+
 
 def apply_fuzzy(weights: pd.Series, uncertainty_pct: float) -> pd.Series:
-    factor = uncertainty_pct / 100.0
-    w = weights.values
-    low = np.maximum(w * (1 - factor), 1e-9)
-    high = np.minimum(w * (1 + factor), 0.9999)
-    defuzzified = (low + w + high) / 3.0
-    normalized = defuzzified / defuzzified.sum()
-    return pd.Series(normalized, index=weights.index)
+    fuzzy = TFN.from_spread(weights.values, uncertainty_pct / 100.0, floor=1e-9, cap=0.9999)
+    defuzzified = fuzzy.centroid()
+    return pd.Series(defuzzified / defuzzified.sum(), index=weights.index)
 
 def build_fuzzy_table(weights: pd.Series, fuzzy_pct: float) -> pd.DataFrame:
-    rows = []
-    factor = fuzzy_pct / 100.0
-    for crit in weights.index:
-        w = float(weights[crit])
-        low = max(w * (1 - factor), 0.0)
-        high = min(w * (1 + factor), 1.0)
-        centroid = (low + w + high) / 3.0
-        rows.append([crit, round(low, 4), round(w, 4), round(high, 4), round(centroid, 4)])
-    return pd.DataFrame(rows, columns=["Tiêu chí", "Low", "Mid", "High", "Centroid"])
+    fuzzy = TFN.from_spread(weights.values, fuzzy_pct / 100.0, floor=0.0, cap=1.0)
+    table = pd.DataFrame({
+        "Tiêu chí": weights.index,
+        "Low": fuzzy.low, "Mid": fuzzy.mid, "High": fuzzy.high, "Centroid": fuzzy.centroid(),
+    })
+    return table.round({"Low": 4, "Mid": 4, "High": 4, "Centroid": 4})
 
 def most_uncertain_criterion(weights: pd.Series, fuzzy_pct: float):
-    factor = fuzzy_pct / 100.0
-    diff_map = {}
-    for crit in weights.index:
-        w = float(weights[crit])
-        low = w * (1 - factor)
-        high = w * (1 + factor)
-        diff_map[crit] = float(high - low)
-    most_unc = max(diff_map, key=diff_map.get)
-    return most_unc, diff_map
+    spread = TFN.from_spread(weights.values, fuzzy_pct / 100.0).spread()
+    diff_map = dict(zip(weights.index, spread.tolist()))
+    return weights.index[int(np.argmax(spread))], diff_map
 
 def fuzzy_heatmap_premium(diff_map):
+    import plotly.express as px
+
     values = list(diff_map.values())
     labels = list(diff_map.keys())
     fig = px.imshow([values], x=labels, y=[""], color_continuous_scale="Greens")
     fig.update_layout(title="<b>Heatmap mức dao động Fuzzy</b>", paper_bgcolor="#001a12", plot_bgcolor="#001a12")
     return fig
 
-def fuzzy_chart_premium(fuzzy_table: pd.DataFrame) -> go.Figure:
+def fuzzy_chart_premium(fuzzy_table: pd.DataFrame) -> "go.Figure":
     """Create fuzzy membership visualization from fuzzy table."""
+    import plotly.graph_objects as go
+
     fig = go.Figure()
     
     criteria = fuzzy_table["Tiêu chí"].values